@@ -0,0 +1,81 @@
+"""Micro-benchmark for citation marker substitution.
+
+Compares the per-source ``str.replace`` loop that finalize_answer used to run
+with the single-pass CitationRegistry, for growing numbers of sources and
+report sizes.
+
+Usage:
+    python benchmarks/bench_citations.py [--sizes 50 200 500] [--report-kb 100]
+"""
+
+import argparse
+import random
+import time
+
+from agent.citations import CitationRegistry
+
+
+def make_workload(num_sources: int, report_kb: int, seed: int = 0):
+    rng = random.Random(seed)
+    sources = [
+        {
+            "title": f"Source {i}",
+            "value": f"https://site{i % 97}.example.com/articles/{i}",
+        }
+        for i in range(num_sources)
+    ]
+    registry = CitationRegistry(sources)
+    for source in sources:
+        source["short_url"] = registry.register(source["value"])
+
+    filler = "量子计算的最新进展表明纠错码的开销正在快速下降。"
+    chunks = []
+    size = 0
+    while size < report_kb * 1024:
+        source = rng.choice(sources)
+        chunk = f"{filler}[引用]({source['short_url']}) "
+        chunks.append(chunk)
+        size += len(chunk.encode("utf-8"))
+    return sources, "".join(chunks)
+
+
+def legacy_resolve(text: str, sources: list) -> str:
+    for source in sources:
+        if source["short_url"] in text:
+            text = text.replace(source["short_url"], source["value"])
+    return text
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark citation substitution")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 50, 200, 500, 1000]
+    )
+    parser.add_argument("--report-kb", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"report size: {args.report_kb} KB, best of {args.repeat}")
+    print(f"{'sources':>8} {'legacy ms':>10} {'registry ms':>12} {'speedup':>8}")
+    for num_sources in args.sizes:
+        sources, report = make_workload(num_sources, args.report_kb)
+        registry = CitationRegistry(sources)
+        legacy = timed(lambda: legacy_resolve(report, sources), args.repeat)
+        single_pass = timed(lambda: registry.resolve_markers(report), args.repeat)
+        print(
+            f"{num_sources:>8} {legacy * 1000:>10.2f} {single_pass * 1000:>12.2f} "
+            f"{legacy / single_pass:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,593 @@
+"""End-to-end benchmark for the research graph.
+
+Runs the compiled graph against stub providers with a configurable latency
+model, or against recorded fixtures in replay mode, and sweeps the number of
+initial queries and research loops. For every run it reports the wall time,
+the time spent per node, the critical path through the graph's supersteps,
+the number of LLM and search calls and the token totals. Results are written
+as JSON; pass a previous result file as ``--baseline`` to compare commits.
+``--metrics-overhead`` repeats every run with the /metrics instrumentation
+switched off and reports the difference.
+
+Usage:
+    python benchmarks/bench_graph.py [--initial-queries 1 3 5] [--loops 1 2 3]
+        [--llm-latency 0.8] [--search-latency 0.5] [--questions questions.jsonl]
+        [--providers stub|replay] [--config '{"summary_batch_size": 3}']
+        [--output results.json] [--baseline previous.json] [--metrics-overhead]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import pathlib
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+# The stub providers never reach the real APIs, but the clients want a key
+os.environ.setdefault("DEEPSEEK_API_KEY", "stub")
+os.environ.setdefault("TAVILY_API_KEY", "stub")
+
+import agent.graph  # noqa: E402
+import agent.llm  # noqa: E402
+from agent.compaction import estimate_tokens  # noqa: E402
+from agent.configuration import Configuration  # noqa: E402
+from agent.metrics import Histogram, registry  # noqa: E402
+from agent.usage import summarize_usage  # noqa: E402
+
+graph_module = sys.modules["agent.graph"]
+
+SYNTHETIC_QUESTIONS = [
+    "量子计算在2025年取得了哪些关键进展？",
+    "比较主流大语言模型推理加速技术的优缺点",
+    "全球半导体供应链近两年的主要变化是什么？",
+    "固态电池商业化面临哪些技术和成本挑战？",
+    "城市热岛效应的成因与缓解措施有哪些？",
+    "What are the trade-offs between Raft and Paxos in production systems?",
+]
+
+WORDS = (
+    "研究 数据 模型 性能 延迟 成本 市场 技术 标准 安全 能源 芯片 算法 网络 供应 需求 政策 "
+    "实验 指标 架构 部署 规模 趋势 风险 benchmark latency throughput memory cache cluster"
+).split()
+
+
+def load_questions(path, limit):
+    """Read questions from a JSONL file, or fall back to the synthetic set."""
+    if not path:
+        return SYNTHETIC_QUESTIONS[:limit] if limit else SYNTHETIC_QUESTIONS
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            for field in ("question", "query", "title", "content"):
+                if record.get(field):
+                    questions.append(record[field])
+                    break
+    return questions[:limit] if limit else questions
+
+
+def pseudo_text(seed: str, words: int) -> str:
+    rng = random.Random(hashlib.sha1(seed.encode("utf-8")).hexdigest())
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class StubProviders:
+    """Deterministic Tavily and DeepSeek stand-ins with a simple latency model.
+
+    Each call sleeps ``latency`` seconds plus ``per_token`` seconds per output
+    token, scaled by a uniform jitter, then answers with content shaped after
+    the requested structured output schema.
+    """
+
+    def __init__(self, llm_latency, llm_per_token, search_latency, jitter, seed=0):
+        self.llm_latency = llm_latency
+        self.llm_per_token = llm_per_token
+        self.search_latency = search_latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.counter = 0
+
+    async def sleep(self, seconds):
+        if seconds > 0:
+            await asyncio.sleep(
+                seconds * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+            )
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f"{prefix} {hashlib.sha1(str(self.counter).encode()).hexdigest()[:10]}"
+
+    async def search(self, query, configurable):
+        await self.sleep(self.search_latency)
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"{query} - 来源 {i + 1}",
+                    "url": f"https://{digest}.example.com/articles/{i}",
+                    "content": pseudo_text(f"{query}/{i}", 120),
+                }
+                for i in range(5)
+            ],
+        }
+
+    def structured_args(self, name, schema, prompt):
+        properties = schema.get("properties", {})
+        if name == "SearchQueryList":
+            match = re.search(r"不要产生超过 (\d+) 个查询", prompt)
+            count = int(match.group(1)) if match else 3
+            return {
+                "rationale": "覆盖问题的不同方面",
+                "query": [self.unique("查询") for _ in range(count)],
+            }
+        if name == "BatchedSearchSummaries":
+            count = len(re.findall(r"=== 查询 \d+", prompt))
+            return {
+                "summaries": [
+                    {"query_index": i + 1, "summary": self.summary(prompt, i)}
+                    for i in range(count)
+                ]
+            }
+        args = {}
+        for key, spec in properties.items():
+            kind = spec.get("type")
+            if key == "is_sufficient":
+                args[key] = False
+            elif key == "follow_up_queries":
+                args[key] = [self.unique("后续查询") for _ in range(2)]
+            elif kind in ("number", "integer"):
+                args[key] = 0.8 if kind == "number" else 1
+            elif kind == "boolean":
+                args[key] = False
+            elif kind == "array":
+                item = spec.get("items", {})
+                if item.get("type") == "object":
+                    args[key] = [
+                        {"fact": pseudo_text(key, 8), "source": "https://example.com"}
+                    ]
+                else:
+                    args[key] = [pseudo_text(f"{key}/{i}", 6) for i in range(3)]
+            else:
+                args[key] = pseudo_text(key, 60)
+        return args
+
+    def summary(self, prompt, index=0):
+        urls = re.findall(r"URL: (\S+)", prompt)[index * 5 : index * 5 + 3] or [
+            "https://example.com"
+        ]
+        sentences = [f"{pseudo_text(url, 25)} [来源]({url})。" for url in urls]
+        return "\n\n".join(sentences)
+
+    async def handle_llm(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        prompt = "\n".join(
+            str(message.get("content", "")) for message in body["messages"]
+        )
+        tools = body.get("tools")
+        if tools:
+            function = tools[0]["function"]
+            args = self.structured_args(
+                function["name"], function["parameters"], prompt
+            )
+            content = ""
+            output = json.dumps(args, ensure_ascii=False)
+            message = {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": "call_0",
+                        "type": "function",
+                        "function": {"name": function["name"], "arguments": output},
+                    }
+                ],
+            }
+        else:
+            content = output = self.summary(prompt)
+            message = {"role": "assistant", "content": content}
+
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(output),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        await self.sleep(
+            self.llm_latency + self.llm_per_token * usage["completion_tokens"]
+        )
+
+        base = {"id": "stub", "created": 0, "model": body["model"]}
+        if not body.get("stream"):
+            return httpx.Response(
+                200,
+                json={
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {"index": 0, "message": message, "finish_reason": "stop"}
+                    ],
+                    "usage": usage,
+                },
+            )
+        deltas = [{"content": piece} for piece in re.findall(r".{1,16}", content, re.S)]
+        if tools:
+            # Streamed structured calls, e.g. under the graph's messages stream mode
+            deltas = [
+                {
+                    "role": "assistant",
+                    "content": "",
+                    "tool_calls": [{"index": 0, **message["tool_calls"][0]}],
+                }
+            ]
+        events = [
+            {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta}],
+            }
+            for delta in deltas
+        ]
+        events.append(
+            {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+        )
+        stream = "".join(
+            f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in events
+        )
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=(stream + "data: [DONE]\n\n").encode(),
+        )
+
+    def install(self):
+        agent.llm.make_http_client = lambda provider, configurable, limits: (
+            httpx.AsyncClient(
+                limits=limits, transport=httpx.MockTransport(self.handle_llm)
+            )
+        )
+        graph_module.tavily_search = self.search
+
+
+class RunRecorder(BaseCallbackHandler):
+    """Times every node task and counts model calls and tokens of one run."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.started = {}
+        self.tasks = []
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self.started[run_id] = (
+                node,
+                metadata.get("langgraph_step"),
+                time.perf_counter(),
+            )
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def _finish(self, run_id):
+        entry = self.started.pop(run_id, None)
+        if entry is not None:
+            node, step, start = entry
+            self.tasks.append(
+                {"node": node, "step": step, "start": start, "end": time.perf_counter()}
+            )
+
+    def on_llm_end(self, response, **kwargs):
+        self.llm_calls += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = (
+                    getattr(
+                        getattr(generation, "message", None), "usage_metadata", None
+                    )
+                    or {}
+                )
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+
+def critical_path(tasks):
+    """Return the slowest task of every superstep, which bounds the run's latency."""
+    steps = defaultdict(list)
+    for task in tasks:
+        steps[task["step"]].append(task)
+    path = []
+    for step in sorted(steps, key=lambda s: (s is None, s)):
+        slowest = max(steps[step], key=lambda task: task["end"] - task["start"])
+        path.append(
+            {
+                "step": step,
+                "node": slowest["node"],
+                "seconds": round(slowest["end"] - slowest["start"], 4),
+                "parallel_tasks": len(steps[step]),
+            }
+        )
+    return path
+
+
+async def run_once(question, configurable):
+    recorder = RunRecorder()
+    search_calls = 0
+    search = graph_module.tavily_search
+
+    async def counted_search(query, config):
+        nonlocal search_calls
+        search_calls += 1
+        return await search(query, config)
+
+    graph_module.tavily_search = counted_search
+    config = {
+        "configurable": configurable,
+        "callbacks": [recorder],
+        "recursion_limit": 100,
+    }
+    try:
+        started = time.perf_counter()
+        # The graph of the pipeline_profile in --config
+        state = await graph_module.make_graph(config).ainvoke(
+            {"messages": [HumanMessage(content=question)]}, config
+        )
+        wall = time.perf_counter() - started
+    finally:
+        graph_module.tavily_search = search
+
+    node_seconds = defaultdict(float)
+    node_calls = defaultdict(int)
+    for task in recorder.tasks:
+        node_seconds[task["node"]] += task["end"] - task["start"]
+        node_calls[task["node"]] += 1
+    path = critical_path(recorder.tasks)
+    path_seconds = sum(entry["seconds"] for entry in path)
+    return {
+        "question": question,
+        "wall_seconds": round(wall, 4),
+        "node_seconds": {
+            node: round(seconds, 4) for node, seconds in node_seconds.items()
+        },
+        "node_calls": dict(node_calls),
+        "critical_path": path,
+        "critical_path_seconds": round(path_seconds, 4),
+        "overhead_seconds": round(wall - path_seconds, 4),
+        "llm_calls": recorder.llm_calls,
+        "search_calls": search_calls,
+        "input_tokens": recorder.input_tokens,
+        "output_tokens": recorder.output_tokens,
+        "estimated_cost": summarize_usage(
+            state.get("token_usage"), Configuration(**configurable).model_prices
+        )["cost"],
+        "skipped_stages": [
+            entry["stage"] for entry in state.get("skipped_stages") or []
+        ],
+    }
+
+
+def summarize(runs):
+    def median(key):
+        return round(statistics.median(run[key] for run in runs), 4)
+
+    return {
+        "runs": len(runs),
+        "wall_seconds_median": median("wall_seconds"),
+        "wall_seconds_max": round(max(run["wall_seconds"] for run in runs), 4),
+        "critical_path_seconds_median": median("critical_path_seconds"),
+        "llm_calls_median": median("llm_calls"),
+        "search_calls_median": median("search_calls"),
+        "input_tokens_median": median("input_tokens"),
+        "output_tokens_median": median("output_tokens"),
+    }
+
+
+def observation_cost(samples=100_000):
+    """Seconds one histogram observation takes, the unit cost of the instrumentation."""
+    histogram = Histogram("bench", "scratch histogram", ("node", "status"))
+    started = time.perf_counter()
+    for i in range(samples):
+        histogram.observe(i % 7 * 0.1, "web_research", "ok")
+    return (time.perf_counter() - started) / samples
+
+
+def metrics_overhead(runs, disabled_runs, cost):
+    """Compare runs with and without instrumentation.
+
+    Wall time differences are dominated by provider latency noise at small
+    scales, so the estimate from the observation count and unit cost is
+    reported alongside.
+    """
+    enabled = statistics.median(run["wall_seconds"] for run in runs)
+    disabled = statistics.median(run["wall_seconds"] for run in disabled_runs)
+    # One observation per node task and provider call, plus token counters
+    observations = statistics.median(
+        sum(run["node_calls"].values()) + 3 * run["llm_calls"] + run["search_calls"]
+        for run in runs
+    )
+    return {
+        "wall_seconds_median_enabled": round(enabled, 4),
+        "wall_seconds_median_disabled": round(disabled, 4),
+        "wall_delta_percent": round((enabled - disabled) / disabled * 100, 2)
+        if disabled
+        else 0.0,
+        "observations_per_run": observations,
+        "estimated_seconds_per_run": observations * cost,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {
+            entry["sweep"]: entry["summary"] for entry in json.load(f)["sweeps"]
+        }
+    print(f"\nCompared with {baseline_path}:")
+    for entry in results["sweeps"]:
+        before = baseline.get(entry["sweep"])
+        if before is None:
+            continue
+        after = entry["summary"]
+        deltas = []
+        for key in ("wall_seconds_median", "llm_calls_median", "input_tokens_median"):
+            change = (
+                (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            )
+            deltas.append(f"{key}={after[key]} ({change:+.1f}%)")
+        print(f"  {entry['sweep']}: " + ", ".join(deltas))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the research graph end to end"
+    )
+    parser.add_argument("--initial-queries", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--loops", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--questions", help="JSONL file with a question, query or title per line"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=3, help="Questions per sweep point, 0 for all"
+    )
+    parser.add_argument("--providers", choices=["stub", "replay"], default="stub")
+    parser.add_argument("--fixtures", help="Fixture directory for --providers replay")
+    parser.add_argument(
+        "--replay-latency",
+        default="recorded",
+        help="none, recorded, sampled or seconds",
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--llm-latency-per-token", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument(
+        "--config", default="{}", help="Extra configurable values as JSON"
+    )
+    parser.add_argument(
+        "--keep-caches", action="store_true", help="Leave the response caches on"
+    )
+    parser.add_argument(
+        "--metrics-overhead",
+        action="store_true",
+        help="Also run without instrumentation and compare",
+    )
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+
+    base_config = json.loads(args.config)
+    if not args.keep_caches:
+        # Sweep points reuse the same questions, so caches would hide provider latency
+        base_config.setdefault("search_cache_ttl_seconds", 0)
+        base_config.setdefault("llm_cache_ttl_seconds", 0)
+    if args.providers == "stub":
+        StubProviders(
+            args.llm_latency,
+            args.llm_latency_per_token,
+            args.search_latency,
+            args.jitter,
+        ).install()
+    else:
+        base_config.update(provider_mode="replay", replay_latency=args.replay_latency)
+        if args.fixtures:
+            base_config["provider_fixture_path"] = args.fixtures
+
+    questions = load_questions(args.questions, args.limit)
+    cost = observation_cost() if args.metrics_overhead else None
+    results = {
+        "revision": git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": vars(args),
+        "sweeps": [],
+    }
+    for initial_queries in args.initial_queries:
+        for loops in args.loops:
+            configurable = {
+                **base_config,
+                "number_of_initial_queries": initial_queries,
+                "max_research_loops": loops,
+            }
+            runs = []
+            disabled_runs = []
+            for _ in range(args.repeat):
+                for question in questions:
+                    runs.append(await run_once(question, configurable))
+                    if args.metrics_overhead:
+                        # Interleaved, so both variants see the same conditions
+                        registry.enabled = False
+                        try:
+                            disabled_runs.append(await run_once(question, configurable))
+                        finally:
+                            registry.enabled = True
+            summary = summarize(runs)
+            sweep = f"queries={initial_queries},loops={loops}"
+            entry = {"sweep": sweep, "summary": summary, "runs": runs}
+            if args.metrics_overhead:
+                entry["metrics_overhead"] = metrics_overhead(runs, disabled_runs, cost)
+            results["sweeps"].append(entry)
+            slowest = max(runs, key=lambda run: run["wall_seconds"])
+            path = " > ".join(
+                f"{entry['node']}({entry['seconds']:.2f})"
+                for entry in slowest["critical_path"]
+            )
+            print(
+                f"{sweep:<20} wall={summary['wall_seconds_median']:.2f}s "
+                f"llm={summary['llm_calls_median']:.0f} search={summary['search_calls_median']:.0f} "
+                f"tokens={summary['input_tokens_median']:.0f}/{summary['output_tokens_median']:.0f}"
+            )
+            print(f"{'':<20} critical path: {path}")
+            if args.metrics_overhead:
+                overhead = entry["metrics_overhead"]
+                print(
+                    f"{'':<20} metrics overhead: wall {overhead['wall_delta_percent']:+.2f}%, "
+                    f"estimated {overhead['estimated_seconds_per_run'] * 1e6:.0f}us per run"
+                )
+
+    output = pathlib.Path(
+        args.output
+        or pathlib.Path(__file__).parent
+        / "results"
+        / f"graph-{results['revision']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    print(f"\nResults written to {output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,218 @@
+"""Run a JSONL file of research questions through the agent concurrently.
+
+Each input line is a JSON object with an id (``id`` or ``request_id``) and a
+question (``question``, ``query`` or ``title``, or the field named with
+``--question-field``). Results are appended to the output JSONL as each run
+finishes, so an interrupted batch picks up where it stopped: questions whose
+id already has a successful result are skipped.
+
+Usage:
+    python examples/batch_research.py questions.jsonl results.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import UTC, datetime
+
+from langchain_core.messages import HumanMessage
+
+from agent.configuration import Configuration
+from agent.graph import make_graph
+from agent.usage import summarize_usage
+
+QUESTION_FIELDS = ("question", "query", "title")
+ID_FIELDS = ("id", "request_id")
+
+
+def load_questions(path, question_field=None):
+    """Read (id, question) pairs, numbering records that carry no id by line."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            fields = (question_field,) if question_field else QUESTION_FIELDS
+            question = next(
+                (record[field] for field in fields if record.get(field)), None
+            )
+            if question is None:
+                print(f"Warning: line {line_number} has no question, skipping")
+                continue
+            record_id = next(
+                (record[field] for field in ID_FIELDS if record.get(field)), None
+            )
+            questions.append((str(record_id or line_number), question))
+    return questions
+
+
+def load_completed(path, retry_failed):
+    """Return the ids that already have a result in the output file."""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # The last line of a crashed batch may be cut off
+                continue
+            if result.get("status") == "ok" or not retry_failed:
+                completed.add(result["id"])
+    return completed
+
+
+def open_output(path):
+    """Open the output for appending, after ending a line a crash cut off."""
+    needs_newline = False
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    output = open(path, "a", encoding="utf-8")
+    if needs_newline:
+        output.write("\n")
+    return output
+
+
+async def research(record_id, question, config, timeout):
+    started = time.perf_counter()
+    result = {
+        "id": record_id,
+        "question": question,
+        "started_at": datetime.now(UTC).isoformat(timespec="seconds"),
+    }
+    try:
+        state = await asyncio.wait_for(
+            make_graph(config).ainvoke(
+                {"messages": [HumanMessage(content=question)]}, config
+            ),
+            timeout,
+        )
+        messages = state.get("messages", [])
+        usage = summarize_usage(
+            state.get("token_usage"),
+            Configuration.from_runnable_config(config).model_prices,
+        )
+        result.update(
+            status="ok",
+            answer=messages[-1].content if messages else "",
+            sources=[source["value"] for source in state.get("sources_gathered", [])],
+            total_tokens=usage["total_tokens"],
+            estimated_cost=usage["cost"],
+        )
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["latency_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_batch(args) -> None:
+    questions = load_questions(args.input, args.question_field)
+    completed = load_completed(args.output, args.retry_failed)
+    pending = [
+        (record_id, question)
+        for record_id, question in questions
+        if record_id not in completed
+    ]
+    print(
+        f"{len(questions)} questions, {len(questions) - len(pending)} already done, {len(pending)} to run"
+    )
+    if not pending:
+        return
+
+    configurable = json.loads(args.config)
+    if args.initial_queries is not None:
+        configurable["number_of_initial_queries"] = args.initial_queries
+    if args.max_loops is not None:
+        configurable["max_research_loops"] = args.max_loops
+    config = {"configurable": configurable, "recursion_limit": 100}
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(record_id, question):
+        async with semaphore:
+            return await research(record_id, question, config, args.timeout)
+
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    output = open_output(args.output)
+    try:
+        for finished in asyncio.as_completed([limited(*item) for item in pending]):
+            result = await finished
+            # Written and flushed per result, so a crash loses at most the runs in flight
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            if result["status"] == "ok":
+                latencies.append(result["latency_seconds"])
+            else:
+                failures += 1
+            done = len(latencies) + failures
+            print(
+                f"[{done}/{len(pending)}] {result['id']} {result['status']} "
+                f"in {result['latency_seconds']:.1f}s"
+                + (f": {result['error']}" if "error" in result else "")
+            )
+    finally:
+        output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{len(latencies)} succeeded, {failures} failed in {elapsed:.1f}s")
+    print(f"Throughput: {(len(latencies) + failures) / elapsed * 60:.2f} questions/min")
+    if latencies:
+        print(
+            "Latency: "
+            + ", ".join(
+                f"p{int(q * 100)}={percentile(latencies, q):.1f}s"
+                for q in (0.5, 0.9, 0.95, 0.99)
+            )
+            + f", mean={statistics.mean(latencies):.1f}s, max={max(latencies):.1f}s"
+        )
+
+
+def main() -> None:
+    """Run a batch of research questions from a JSONL file."""
+    parser = argparse.ArgumentParser(
+        description="Run research questions from a JSONL file"
+    )
+    parser.add_argument("input", help="JSONL file with one question per line")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Questions researched at once"
+    )
+    parser.add_argument("--question-field", help="Field holding the question")
+    parser.add_argument(
+        "--initial-queries", type=int, help="Number of initial search queries"
+    )
+    parser.add_argument(
+        "--max-loops", type=int, help="Maximum number of research loops"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=900, help="Seconds allowed per question"
+    )
+    parser.add_argument(
+        "--config", default="{}", help="Extra configurable values as JSON"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Run questions again whose earlier run failed",
+    )
+    args = parser.parse_args()
+    asyncio.run(run_batch(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,179 @@
 import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.messages import HumanMessage
-from agent.graph import graph
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Command
+
+from agent.graph import QUALITY_PIPELINES, SKIP_REASONS, build_graph
+
+# Streamed summary tokens come from this node; the final answer repeats them
+SUMMARY_NODE = "optimize_summary"
+REPORT_HEADING = "# 研究质量验证报告"
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Records the start and end of every node task, for --profile."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.started = {}
+        self.durations = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self.started[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def _finish(self, run_id):
+        entry = self.started.pop(run_id, None)
+        if entry is not None:
+            node, start = entry
+            self.durations[node].append(time.perf_counter() - start)
+
+    def report(self, wall: float) -> str:
+        lines = [f"\n{'node':<30}{'calls':>6}{'total':>10}{'mean':>10}{'max':>10}"]
+        for node, durations in sorted(
+            self.durations.items(), key=lambda item: -sum(item[1])
+        ):
+            lines.append(
+                f"{node:<30}{len(durations):>6}{sum(durations):>9.2f}s"
+                f"{sum(durations) / len(durations):>9.2f}s{max(durations):>9.2f}s"
+            )
+        lines.append(f"{'wall time':<30}{'':>6}{wall:>9.2f}s")
+        return "\n".join(lines)
+
+
+def describe_update(node: str, update: dict) -> str:
+    """Summarize a node's state update in one line."""
+    if node == "generate_query":
+        queries = update.get("generated_queries") or []
+        return f"{len(queries)} 个查询: " + " | ".join(queries)
+    if node == "web_research":
+        if update.get("deferred_queries"):
+            return f"推迟: {update['deferred_queries'][0]}"
+        queries = update.get("search_query") or ["?"]
+        return f"{queries[0]} ({len(update.get('sources_gathered') or [])} 个来源)"
+    if node == "reflection":
+        if update.get("is_sufficient"):
+            return "信息充分"
+        return f"{len(update.get('follow_up_queries') or [])} 个后续查询"
+    if update.get("skipped_stages"):
+        reason = update["skipped_stages"][0]["reason"]
+        return f"已跳过（{SKIP_REASONS.get(reason, reason)}）"
+    return "完成"
+
+
+async def confirm_queries(payload: dict, auto_confirm: bool) -> dict:
+    """Ask whether to run the generated queries, or confirm them unattended."""
+    queries = payload.get("queries") or []
+    if auto_confirm or not sys.stdin.isatty():
+        print(f"自动确认 {len(queries)} 个查询")
+        return {"action": "confirm", "queries": queries}
+
+    print("\n" + payload.get("message", ""))
+    answer = (
+        await asyncio.to_thread(
+            input, "回车确认，输入以 | 分隔的新查询进行修改，输入 q 取消: "
+        )
+    ).strip()
+    if answer.lower() == "q":
+        return {"action": "cancel", "queries": []}
+    if answer:
+        return {
+            "action": "modify",
+            "queries": [q.strip() for q in answer.split("|") if q.strip()],
+        }
+    return {"action": "confirm", "queries": queries}
+
+
+async def run(args) -> None:
+    # A checkpointer lets the run pause for confirmation and resume in place
+    graph = build_graph(args.pipeline).compile(checkpointer=InMemorySaver())
+    timer = NodeTimer()
+    config = {
+        "configurable": {
+            "thread_id": str(uuid.uuid4()),
+            "stream_summary": True,
+            "pipeline_profile": args.pipeline,
+        },
+        "recursion_limit": 100,
+        "callbacks": [timer] if args.profile else [],
+    }
+    state = {
+        "messages": [HumanMessage(content=args.question)],
+        "initial_search_query_count": args.initial_queries,
+        "max_research_loops": args.max_loops,
+    }
+    if args.reasoning_model:
+        state["reasoning_model"] = args.reasoning_model
+
+    started = time.perf_counter()
+    # Branches of a fan-out are timed from the step that dispatched them
+    fanout_started = started
+    streamed = False
+    payload = state
+    while True:
+        pending = None
+        async for mode, chunk in graph.astream(
+            payload, config, stream_mode=["updates", "messages"]
+        ):
+            elapsed = time.perf_counter() - started
+            if mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == SUMMARY_NODE and isinstance(
+                    message.content, str
+                ):
+                    if not streamed:
+                        print("\n========== 研究报告 ==========\n")
+                        streamed = True
+                    print(message.content, end="", flush=True)
+                continue
+            for node, update in chunk.items():
+                if node == "__interrupt__":
+                    pending = update[0].value
+                    continue
+                if node == "web_research":
+                    branch = time.perf_counter() - fanout_started
+                    print(
+                        f"[{elapsed:7.1f}s] {node:<28} {branch:5.1f}s  {describe_update(node, update or {})}"
+                    )
+                    continue
+                fanout_started = time.perf_counter()
+                if not streamed:
+                    print(
+                        f"[{elapsed:7.1f}s] {node:<28} {describe_update(node, update or {})}"
+                    )
+        if pending is None:
+            break
+        payload = Command(resume=await confirm_queries(pending, args.auto_confirm))
+
+    values = (await graph.aget_state(config)).values
+    if values.get("user_confirmation_cancelled"):
+        print("已取消")
+        return
+    messages = values.get("messages", [])
+    if messages:
+        content = messages[-1].content
+        if streamed and REPORT_HEADING in content:
+            # The summary was already printed as it streamed
+            print("\n\n" + content[content.index(REPORT_HEADING) :])
+        else:
+            print("\n" + content)
+    if args.profile:
+        print(timer.report(time.perf_counter() - started))
 
 
 def main() -> None:
@@ -21,22 +194,27 @@ def main() -> None:
     )
     parser.add_argument(
         "--reasoning-model",
-        default="gemini-2.5-pro-preview-05-06",
-        help="Model for the final answer",
+        default=None,
+        help="DeepSeek model for reflection (default: the configured reflection_model)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        choices=list(QUALITY_PIPELINES),
+        default="full",
+        help="Quality pipeline: full runs each assessment separately, fast combines them into one call",
+    )
+    parser.add_argument(
+        "--auto-confirm",
+        action="store_true",
+        help="Run the generated queries without asking; implied when stdin is not a terminal",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print per-node timings at the end",
     )
     args = parser.parse_args()
-
-    state = {
-        "messages": [HumanMessage(content=args.question)],
-        "initial_search_query_count": args.initial_queries,
-        "max_research_loops": args.max_loops,
-        "reasoning_model": args.reasoning_model,
-    }
-
-    result = graph.invoke(state)
-    messages = result.get("messages", [])
-    if messages:
-        print(messages[-1].content)
+    asyncio.run(run(args))
 
 
 if __name__ == "__main__":
@@ -1,39 +1,208 @@
 # mypy: disable - error - code = "no-untyped-def,misc"
 import pathlib
-from fastapi import FastAPI, Response, HTTPException
+from datetime import datetime
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from langgraph_sdk import get_client
 from pydantic import BaseModel
-from typing import List
+
+from agent.batching import batch_stats
+from agent.cache import cache_stats
+from agent.configuration import Configuration
+from agent.export import (
+    EXPORT_FORMATS,
+    export_cache_key,
+    report_from_content,
+    report_from_state,
+    stream_export,
+)
+from agent.llm import pool_stats
+from agent.metrics import render_metrics
+from agent.prefetch import cancel_prefetch, prefetch_stats
+from agent.rate_limit import rate_limit_stats
 
 # Define the FastAPI app
 app = FastAPI()
 
+# The graph id registered in langgraph.json
+ASSISTANT_ID = "agent"
+
 
 class QueryConfirmationRequest(BaseModel):
     """用户查询确认请求"""
+
     thread_id: str
     action: str  # 'confirm', 'modify', or 'cancel'
     queries: List[str]  # 确认或修改后的查询
+    config: Dict[str, Any] | None = (
+        None  # 恢复运行使用的 config，省略时沿用中断运行的配置
+    )
+
+
+async def interrupted_run_config(client, thread_id: str) -> Dict[str, Any]:
+    """取出使线程中断的运行的可配置项，使恢复的运行沿用相同配置"""
+    runs = await client.runs.list(thread_id, limit=1)
+    if not runs:
+        return {}
+    configurable = (runs[0].get("kwargs") or {}).get("config", {}).get(
+        "configurable"
+    ) or {}
+    # 只保留 Configuration 的字段，thread_id 等运行时字段由服务端重新设置
+    return {
+        "configurable": {
+            key: value
+            for key, value in configurable.items()
+            if key in Configuration.model_fields
+        }
+    }
 
 
 @app.post("/user-confirmation")
 async def handle_user_confirmation(request: QueryConfirmationRequest):
-    """处理用户对生成查询的确认或修改"""
+    """处理用户对生成查询的确认或修改
+
+    线程在 wait_for_user_confirmation 处中断等待。确认或修改时，从检查点以用户的
+    查询恢复线程，直接进入 web_research；取消时中止线程。
+    """
+    if request.action not in ("confirm", "modify", "cancel"):
+        raise HTTPException(status_code=400, detail=f"未知的操作: {request.action}")
+
+    client = get_client()
     try:
-        # 这里应该更新对应thread的状态
-        # 由于LangGraph的特性，我们需要通过状态更新来继续流程
-        
-        # 返回确认结果
+        if request.action == "cancel":
+            # 停止为该thread进行的预取搜索和正在运行的流程
+            cancel_prefetch(request.thread_id)
+            for run in await client.runs.list(request.thread_id, status="running"):
+                await client.runs.cancel(request.thread_id, run["run_id"])
+
+        thread = await client.threads.get(request.thread_id)
+        if thread["status"] != "interrupted":
+            if request.action == "cancel":
+                return {
+                    "status": "success",
+                    "message": "流程已取消",
+                    "action": request.action,
+                    "run_id": None,
+                }
+            raise HTTPException(status_code=409, detail="该线程没有等待确认的查询")
+
+        # 以用户的决定恢复中断的线程，并沿用原运行的配置（流程画像、时限、预算等）
+        config = request.config
+        if config is None:
+            config = await interrupted_run_config(client, request.thread_id)
+        run = await client.runs.create(
+            request.thread_id,
+            ASSISTANT_ID,
+            command={"resume": {"action": request.action, "queries": request.queries}},
+            config=config,
+        )
         return {
             "status": "success",
             "message": "用户确认已接收",
             "action": request.action,
-            "queries": request.queries
+            "queries": request.queries,
+            "run_id": run["run_id"],
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class ExportReportRequest(BaseModel):
+    """报告导出请求：导出线程的最终报告，或客户端提交的报告内容"""
+
+    thread_id: str | None = None
+    report_content: str | None = None
+    report_title: str | None = None
+    format: str = "markdown"  # 'markdown', 'html' or 'json'
+    include_sources: bool = True
+    include_metadata: bool = True
+
+
+@app.post("/export-report")
+async def export_report(request: ExportReportRequest):
+    """以 Markdown、HTML 或 JSON 格式分块流式导出研究报告
+
+    指定 thread_id 时从线程的最终状态渲染，否则渲染请求中的 report_content。
+    渲染结果按（报告、格式、选项）缓存，重复下载直接从缓存输出。
+    """
+    if request.format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"不支持的导出格式: {request.format}"
+        )
+    options = (
+        request.format,
+        request.include_sources,
+        request.include_metadata,
+        request.report_title,
+    )
+
+    if request.thread_id:
+        try:
+            state = await get_client().threads.get_state(request.thread_id)
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status == 404:
+                raise HTTPException(status_code=404, detail="线程不存在")
+            raise HTTPException(status_code=500, detail=str(e))
+        report = report_from_state(state["values"] or {}, request.report_title)
+        if report is None:
+            raise HTTPException(status_code=409, detail="该线程还没有完成的报告")
+        # The checkpoint id changes with every new run on the thread
+        key = export_cache_key(
+            request.thread_id,
+            (state.get("checkpoint") or {}).get("checkpoint_id"),
+            *options,
+        )
+        name = request.thread_id[:8]
+    elif request.report_content and request.report_content.strip():
+        report = report_from_content(request.report_content, request.report_title)
+        key = export_cache_key(request.report_content, *options)
+        name = key[-8:]
+    else:
+        raise HTTPException(
+            status_code=400, detail="需要提供 thread_id 或 report_content"
+        )
+
+    media_type, extension = EXPORT_FORMATS[request.format]
+    filename = f"report_{name}_{datetime.now():%Y%m%d}.{extension}"
+    return StreamingResponse(
+        stream_export(
+            key,
+            report,
+            request.format,
+            request.include_sources,
+            request.include_metadata,
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/stats")
+async def get_stats():
+    """返回缓存、连接池、预取、限流队列和批量摘要的运行统计"""
+    return {
+        "caches": cache_stats(),
+        "llm_pools": pool_stats(),
+        "prefetch": prefetch_stats(),
+        "rate_limits": rate_limit_stats(),
+        "summary_batches": batch_stats(),
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """以 Prometheus 文本格式导出节点耗时、外部调用、token 用量和缓存命中指标"""
+    return Response(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 def create_frontend_router(build_dir="../frontend/dist"):
     """Creates a router to serve the React frontend.
 
@@ -0,0 +1,158 @@
+"""Micro-batching of the per-branch calls of a web research fan-out."""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List
+
+from agent.utils import warn_once
+
+BatchFunction = Callable[[List[Any]], Awaitable[List[Any | None]]]
+
+
+# Fan-outs whose batch window ran out are remembered, up to this many, so their
+# late branches summarize on their own instead of opening a new batch
+EXPIRED_FANOUTS_MAX = 1024
+
+
+class _Batch:
+    def __init__(self, batch_size: int, process: BatchFunction):
+        self.batch_size = batch_size
+        self.process = process
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class MicroBatcher:
+    """Collects the items of one fan-out and processes them in batched calls.
+
+    Branches of a fan-out submit their item under the fan-out id, or call
+    ``skip`` when they will not submit one, e.g. because they reuse earlier
+    research or fail first. The batch is flushed once every branch has
+    submitted or skipped, or ``window`` seconds after the first submission,
+    whichever comes first; branches arriving after the window has run out get
+    None and process their item on their own. Each flush splits its items
+    into chunks of ``batch_size`` and runs one call per chunk concurrently.
+    """
+
+    def __init__(self):
+        """Create a batcher with no open fan-outs."""
+        self._batches: Dict[str, _Batch] = {}
+        # Branches per fan-out that have neither submitted nor skipped yet
+        self._remaining: Dict[str, int] = {}
+        self._expired: OrderedDict[str, None] = OrderedDict()
+        self._stats = {"items": 0, "batches": 0, "fallbacks": 0, "skipped": 0}
+
+    async def submit(
+        self,
+        key: str,
+        size: int,
+        item: Any,
+        window: float,
+        batch_size: int,
+        process: BatchFunction,
+    ) -> Any | None:
+        """Submit one branch's item and wait for its result.
+
+        Args:
+            key: The fan-out id shared by the branches
+            size: The number of branches in the fan-out
+            item: This branch's input to the batch call
+            window: Seconds to wait for the other branches after the first submission
+            batch_size: The maximum number of items per call
+            process: Processes a chunk of items, returning one result per item,
+                None where the call produced no result for it
+
+        Returns:
+            This item's result, or None when the caller should fall back to
+            processing it on its own
+        """
+        if key in self._expired:
+            self._stats["fallbacks"] += 1
+            return None
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(batch_size, process)
+            batch.timer = loop.call_later(window, self._expire, key)
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        self._stats["items"] += 1
+        self._arrive(key, size)
+        result = await future
+        if result is None:
+            self._stats["fallbacks"] += 1
+        return result
+
+    def skip(self, key: str, size: int) -> None:
+        """Record that a branch of the fan-out will not submit, so its batch need not wait for it."""
+        if key in self._expired:
+            return
+        self._stats["skipped"] += 1
+        self._arrive(key, size)
+
+    def _arrive(self, key: str, size: int) -> None:
+        remaining = self._remaining.get(key, size) - 1
+        if remaining > 0:
+            self._remaining[key] = remaining
+            return
+        # Every branch is accounted for
+        self._remaining.pop(key, None)
+        self._flush(key)
+
+    def _expire(self, key: str) -> None:
+        # Branches still missing after the window summarize on their own
+        self._remaining.pop(key, None)
+        self._expired[key] = None
+        while len(self._expired) > EXPIRED_FANOUTS_MAX:
+            self._expired.popitem(last=False)
+        self._flush(key)
+
+    def _flush(self, key: str) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        for start in range(0, len(batch.items), batch.batch_size):
+            self._stats["batches"] += 1
+            asyncio.ensure_future(
+                self._run(
+                    batch.items[start : start + batch.batch_size],
+                    batch.futures[start : start + batch.batch_size],
+                    batch.process,
+                )
+            )
+
+    async def _run(
+        self, items: List[Any], futures: List[asyncio.Future], process: BatchFunction
+    ) -> None:
+        try:
+            results = await process(items)
+        except Exception as e:
+            warn_once(
+                f"batch:{type(e).__name__}",
+                f"batched call failed, falling back to single calls: {e}",
+            )
+            results = [None] * len(items)
+        results = list(results) + [None] * (len(items) - len(results))
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch counters and the number of open batches and fan-outs."""
+        return {
+            **self._stats,
+            "open_batches": len(self._batches),
+            "open_fanouts": len(self._remaining),
+        }
+
+
+summary_batcher = MicroBatcher()
+
+
+def batch_stats() -> Dict[str, Any]:
+    """Return the statistics of the summarization batcher."""
+    return summary_batcher.stats()
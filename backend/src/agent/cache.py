@@ -0,0 +1,270 @@
+"""Caches for search results, LLM responses and rendered exports."""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from agent.metrics import registry
+from agent.utils import normalize_query
+
+
+class TTLCache:
+    """Two-tier cache with an in-memory LRU tier and an optional SQLite tier.
+
+    Values must be JSON-serializable. Entries expire after ``ttl_seconds`` and
+    the memory tier evicts its least recently used entry once ``max_entries``
+    is exceeded. When ``sqlite_path`` is set, entries are also written to disk
+    so they survive restarts and are shared between worker processes.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        sqlite_path: str | None = None,
+        max_disk_entries: int | None = None,
+    ):
+        """Create a cache.
+
+        Args:
+            namespace: Prefix that keeps this cache's disk entries apart from other caches'
+            max_entries: Capacity of the memory tier
+            ttl_seconds: How long an entry stays valid
+            sqlite_path: SQLite database backing the disk tier; memory only when None
+            max_disk_entries: Capacity of the disk tier, 20 times ``max_entries`` by default
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self.max_disk_entries = max_disk_entries or max_entries * 20
+        self._memory: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        # The memory tier is read on the event loop, so its lock is never held
+        # during disk I/O; the SQLite tier has its own lock
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    # Memory tier
+    def get(self, key: str) -> Any | None:
+        """Return a value from the memory tier, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._memory[key]
+                self._stats["expirations"] += 1
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _put_memory(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # Disk tier
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _get_disk(self, key: str) -> Tuple[float, Any] | None:
+        with self._disk_lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= time.time():
+            return None
+        return expires_at, json.loads(value)
+
+    def _put_disk(self, key: str, value: Any, expires_at: float) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._disk_lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, payload, expires_at),
+            )
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time()),
+            )
+            # Size eviction: drop the entries closest to expiry beyond the disk limit
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache_entries WHERE namespace = ? "
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_disk_entries),
+            )
+            conn.commit()
+
+    # Public async API
+    async def aget(self, key: str) -> Any | None:
+        """Look up a key in the memory tier, then the disk tier."""
+        value = self.get(key)
+        if value is not None:
+            self._stats["hits"] += 1
+            self._stats["memory_hits"] += 1
+            return value
+        if self.sqlite_path:
+            entry = await asyncio.to_thread(self._get_disk, key)
+            if entry is not None:
+                expires_at, value = entry
+                self._put_memory(key, value, expires_at)
+                self._stats["hits"] += 1
+                self._stats["disk_hits"] += 1
+                return value
+        self._stats["misses"] += 1
+        return None
+
+    async def aset(
+        self, key: str, value: Any, ttl_seconds: float | None = None
+    ) -> None:
+        """Store a value in every configured tier."""
+        expires_at = time.time() + (
+            ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        )
+        self._put_memory(key, value, expires_at)
+        if self.sqlite_path:
+            await asyncio.to_thread(self._put_disk, key, value, expires_at)
+
+    def clear(self) -> None:
+        """Drop every entry of this namespace from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.sqlite_path:
+            with self._disk_lock:
+                conn = self._connect()
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+                )
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current memory tier size."""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._memory),
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+_caches: Dict[Tuple[Any, ...], TTLCache] = {}
+
+
+def get_cache(
+    namespace: str,
+    max_entries: int,
+    ttl_seconds: float,
+    sqlite_path: str | None = None,
+) -> TTLCache:
+    """Return the process-wide cache for a namespace and settings combination."""
+    key = (namespace, max_entries, ttl_seconds, sqlite_path)
+    if key not in _caches:
+        _caches[key] = TTLCache(
+            namespace,
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+            sqlite_path=sqlite_path,
+        )
+    return _caches[key]
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Return the statistics of every cache created in this process."""
+    return {cache.namespace: cache.stats() for cache in _caches.values()}
+
+
+def _cache_metrics():
+    totals: Dict[str, Dict[str, int]] = {}
+    for cache in _caches.values():
+        namespace = totals.setdefault(cache.namespace, {"hits": 0, "misses": 0})
+        namespace["hits"] += cache._stats["hits"]
+        namespace["misses"] += cache._stats["misses"]
+    return [
+        (
+            "agent_cache_hits_total",
+            "counter",
+            "Cache lookups served from the memory or SQLite tier.",
+            [
+                ("agent_cache_hits_total", {"cache": name}, c["hits"])
+                for name, c in totals.items()
+            ],
+        ),
+        (
+            "agent_cache_misses_total",
+            "counter",
+            "Cache lookups that found no valid entry.",
+            [
+                ("agent_cache_misses_total", {"cache": name}, c["misses"])
+                for name, c in totals.items()
+            ],
+        ),
+        (
+            "agent_cache_hit_ratio",
+            "gauge",
+            "Share of cache lookups that were hits since the process started.",
+            [
+                (
+                    "agent_cache_hit_ratio",
+                    {"cache": name},
+                    c["hits"] / (c["hits"] + c["misses"]),
+                )
+                for name, c in totals.items()
+                if c["hits"] + c["misses"]
+            ],
+        ),
+    ]
+
+
+registry.add_collector(_cache_metrics)
+
+
+def make_search_key(query: str, max_results: int, search_depth: str) -> str:
+    """Build the cache key for a search request."""
+    raw = f"{max_results}|{search_depth}|{normalize_query(query)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def make_llm_key(model: str, temperature: float, prompt: str, schema: str = "") -> str:
+    """Build the content-addressed cache key for an LLM call."""
+    digest = hashlib.sha256()
+    for part in (model, repr(float(temperature)), schema, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
@@ -0,0 +1,120 @@
+"""Stable citation markers for the sources gathered during a run."""
+
+import hashlib
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from agent.utils import normalize_url
+
+MARKER_PATTERN = re.compile(r"\[src-([0-9a-f]{10})\]")
+
+
+def citation_id(url: str) -> str:
+    """Return the stable citation id of a URL.
+
+    The id is derived from the normalized URL, so every web_research branch
+    assigns the same id to the same source without any coordination.
+    """
+    return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()[:10]
+
+
+def citation_marker(url: str) -> str:
+    """Return the citation marker that stands for a URL in research text."""
+    return f"[src-{citation_id(url)}]"
+
+
+class CitationRegistry:
+    """Run-wide registry of deduplicated sources and their citation markers.
+
+    URLs are registered under globally unique ids derived from the normalized
+    URL. Both directions of marker substitution run in a single pass over the
+    text, independent of the number of registered sources.
+    """
+
+    def __init__(self, sources: Iterable[dict] = ()):
+        """Create a registry, registering already gathered sources and their aliases."""
+        self._urls: Dict[str, str] = {}
+        self._spellings: Dict[str, str] = {}
+        self._sources: Dict[str, dict] = {}
+        # Ids of URLs merged into another source, mapped to the canonical id
+        self._canonical_ids: Dict[str, str] = {}
+        for source in sources:
+            self.register(source["value"], source)
+            for alias in source.get("aliases", []):
+                self._canonical_ids.setdefault(
+                    citation_id(alias), citation_id(source["value"])
+                )
+
+    def register(self, url: str, source: dict | None = None) -> str:
+        """Register a URL and return its marker."""
+        cid = citation_id(url)
+        self._urls.setdefault(cid, url)
+        if url:
+            self._spellings[url] = cid
+        if source is not None:
+            self._sources.setdefault(cid, source)
+        return f"[src-{cid}]"
+
+    def __len__(self) -> int:
+        """Return the number of registered sources."""
+        return len(self._urls)
+
+    def replace_urls(self, text: str, aliases: Dict[str, str] | None = None) -> str:
+        """Replace every registered URL, and optional aliases, with its marker.
+
+        Args:
+            text: The text to rewrite
+            aliases: Extra strings, such as bare domain names or per-branch
+                source numbers, mapped to the URL whose marker should replace them
+
+        Returns:
+            The text with URLs replaced by citation markers
+        """
+        replacements = {url: f"[src-{cid}]" for url, cid in self._spellings.items()}
+        alias_replacements = {
+            alias: f"[src-{citation_id(url)}]"
+            for alias, url in (aliases or {}).items()
+            if alias and alias not in replacements
+        }
+        if not replacements and not alias_replacements:
+            return text
+
+        # Longest alternatives first, so a full URL wins over its own domain.
+        # Aliases only match on their own, not inside an unregistered URL.
+        alternatives = [
+            re.escape(url) for url in sorted(replacements, key=len, reverse=True)
+        ]
+        alternatives += [
+            rf"(?<![\w/.-]){re.escape(alias)}(?![\w-])"
+            for alias in sorted(alias_replacements, key=len, reverse=True)
+        ]
+        pattern = re.compile("|".join(alternatives))
+        lookup = {**alias_replacements, **replacements}
+        return pattern.sub(lambda match: lookup[match.group(0)], text)
+
+    def resolve_markers(self, text: str) -> Tuple[str, List[dict]]:
+        """Replace citation markers with their URLs in a single pass.
+
+        A marker used as a markdown link target becomes the bare URL; a
+        standalone marker becomes a numbered markdown link. Numbers follow the
+        order of first appearance in the text.
+
+        Returns:
+            The rewritten text and the registered sources it cites, in order
+        """
+        numbers: Dict[str, int] = {}
+
+        def substitute(match: re.Match) -> str:
+            cid = self._canonical_ids.get(match.group(1), match.group(1))
+            url = self._urls.get(cid)
+            if url is None:
+                return match.group(0)
+            if cid not in numbers:
+                numbers[cid] = len(numbers) + 1
+            if match.start() > 0 and text[match.start() - 1] == "(":
+                return url
+            return f"[{numbers[cid]}]({url})"
+
+        resolved = MARKER_PATTERN.sub(substitute, text)
+        cited = [self._sources[cid] for cid in numbers if cid in self._sources]
+        return resolved, cited
@@ -0,0 +1,173 @@
+"""Compaction of research results that exceed the context budget."""
+
+import re
+from typing import Any, Dict, List
+
+from agent.utils import jaccard_similarity, text_shingles
+
+SECTION_SEPARATOR = "\n\n---\n\n"
+
+# Markdown links, bare numeric markers such as [3] and the registry's
+# [src-xxxxxxxxxx] markers must never be split
+CITATION_PATTERN = re.compile(
+    r"\[[^\[\]\n]*\]\([^()\s]*\)|\[\d+\]|\[src-[0-9a-f]{10}\]"
+)
+SENTENCE_END_PATTERN = re.compile(r"[。！？!?；;]|\.(?=\s)|\n")
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+
+# Share of a section's base score that comes from topic relevance; the base
+# score is then scaled by novelty, so exact restatements always rank last
+RELEVANCE_WEIGHT = 0.6
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the DeepSeek token count of a text without a tokenizer.
+
+    Uses DeepSeek's published ratios of roughly 0.6 tokens per Chinese
+    character and 0.3 tokens per other character.
+    """
+    cjk = len(CJK_PATTERN.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+
+def split_sections(results: List[str]) -> List[Dict[str, Any]]:
+    """Split research results into paragraph sections, keeping their origin."""
+    sections = []
+    for result_index, result in enumerate(results):
+        for paragraph in re.split(r"\n\s*\n", result):
+            paragraph = paragraph.strip()
+            if paragraph:
+                sections.append(
+                    {
+                        "result": result_index,
+                        "position": len(sections),
+                        "text": paragraph,
+                        "tokens": estimate_tokens(paragraph),
+                    }
+                )
+    return sections
+
+
+def rank_sections(results: List[str], topic: str) -> List[Dict[str, Any]]:
+    """Rank research sections by relevance to the topic and novelty.
+
+    Greedy maximal-marginal-relevance ordering: each step picks the section
+    that best combines overlap with the topic and dissimilarity to the
+    sections already ranked, so restated findings sink to the bottom.
+
+    Args:
+        results: The web research summaries
+        topic: The research topic
+
+    Returns:
+        The sections in rank order, each annotated with its score
+    """
+    sections = split_sections(results)
+    topic_shingles = text_shingles(topic, 2)
+    candidates = []
+    for section in sections:
+        shingles = text_shingles(section["text"])
+        section_bigrams = text_shingles(section["text"], 2)
+        relevance = (
+            len(topic_shingles & section_bigrams) / len(topic_shingles)
+            if topic_shingles
+            else 0.0
+        )
+        candidates.append((section, shingles, relevance))
+
+    # Each candidate's highest similarity to any section ranked so far; only
+    # the newly ranked section can raise it, so every pick costs one pass
+    redundancies = [0.0] * len(candidates)
+    ranked: List[Dict[str, Any]] = []
+    while candidates:
+        best_index, best_score = 0, float("-inf")
+        for index, (_, _, relevance) in enumerate(candidates):
+            score = (RELEVANCE_WEIGHT * relevance + 1 - RELEVANCE_WEIGHT) * (
+                1 - redundancies[index]
+            )
+            if score > best_score:
+                best_index, best_score = index, score
+        section, picked_shingles, _ = candidates.pop(best_index)
+        redundancies.pop(best_index)
+        ranked.append({**section, "score": round(best_score, 4)})
+        for index, (_, shingles, _) in enumerate(candidates):
+            if redundancies[index] < 1.0:
+                redundancies[index] = max(
+                    redundancies[index], jaccard_similarity(shingles, picked_shingles)
+                )
+    return ranked
+
+
+def section_ranking(ranked: List[Dict[str, Any]]) -> List[List[float]]:
+    """Reduce ranked sections to [position, score] pairs, small enough to keep in state."""
+    return [[section["position"], section["score"]] for section in ranked]
+
+
+def ranked_sections(
+    results: List[str], ranking: List[List[float]]
+) -> List[Dict[str, Any]]:
+    """Rebuild the ranked sections of the research results from a stored ranking."""
+    sections = split_sections(results)
+    return [
+        {**sections[int(position)], "score": score}
+        for position, score in ranking
+        if int(position) < len(sections)
+    ]
+
+
+def truncate_preserving_citations(text: str, max_tokens: int) -> str:
+    """Cut a text to a token budget at a sentence end outside any citation marker.
+
+    Markers directly after a sentence end, as in "。[src-…]", stay with the
+    sentence they cite.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    protected = [match.span() for match in CITATION_PATTERN.finditer(text)]
+    marker_ends = dict(protected)
+    best_cut = 0
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        cut = match.end()
+        if any(start < cut < end for start, end in protected):
+            continue
+        while cut in marker_ends:
+            cut = marker_ends[cut]
+        if estimate_tokens(text[:cut]) > max_tokens:
+            break
+        best_cut = cut
+    return text[:best_cut].rstrip()
+
+
+def render_context(sections: List[Dict[str, Any]], budget: int) -> str:
+    """Render the top-ranked sections that fit the token budget.
+
+    Sections are emitted in their original order; sections of different
+    research results are separated like the uncompacted context.
+    """
+    selected = []
+    remaining = budget
+    for section in sections:
+        if section["score"] <= 0:
+            # Exact restatements of a higher-ranked section add nothing
+            continue
+        if section["tokens"] <= remaining:
+            selected.append(section)
+            remaining -= section["tokens"]
+        elif not selected and remaining > 0:
+            # Never return an empty context because the best section is too long
+            text = truncate_preserving_citations(section["text"], remaining)
+            if text:
+                selected.append({**section, "text": text})
+            break
+
+    selected.sort(key=lambda section: section["position"])
+    parts: List[str] = []
+    previous_result = None
+    for section in selected:
+        if previous_result is not None:
+            parts.append(
+                SECTION_SEPARATOR if section["result"] != previous_result else "\n\n"
+            )
+        parts.append(section["text"])
+        previous_result = section["result"]
+    return "".join(parts)
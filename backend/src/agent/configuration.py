@@ -1,8 +1,9 @@
+import json
 import os
-from pydantic import BaseModel, Field
-from typing import Any, Optional
+from typing import Any, Dict, List
 
 from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, Field, field_validator
 
 
 class Configuration(BaseModel):
@@ -39,9 +40,382 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    provider_mode: str = Field(
+        default="live",
+        metadata={
+            "description": "How Tavily and DeepSeek are reached: 'live' calls the APIs, 'record' also writes every response to the fixture store, 'replay' serves recorded responses only."
+        },
+    )
+
+    provider_fixture_path: str | None = Field(
+        default=None,
+        metadata={
+            "description": "Directory of the recorded provider fixtures. Defaults to backend/fixtures."
+        },
+    )
+
+    replay_latency: str = Field(
+        default="none",
+        metadata={
+            "description": "Latency of replayed responses: 'none', 'recorded' for each call's recorded time, 'sampled' for a time drawn from all recorded calls, or a fixed number of seconds."
+        },
+    )
+
+    llm_max_connections: int = Field(
+        default=100,
+        metadata={
+            "description": "Maximum number of connections in the shared LLM HTTP pool."
+        },
+    )
+
+    llm_max_keepalive_connections: int = Field(
+        default=20,
+        metadata={
+            "description": "Maximum number of idle keep-alive connections in the shared LLM HTTP pool."
+        },
+    )
+
+    llm_keepalive_expiry: float = Field(
+        default=30.0,
+        metadata={
+            "description": "Seconds an idle LLM connection is kept alive before it is closed."
+        },
+    )
+
+    assessment_timeout_seconds: float = Field(
+        default=60.0,
+        metadata={
+            "description": "Timeout for each quality assessor. A timed-out assessor falls back to neutral defaults."
+        },
+    )
+
+    query_similarity_threshold: float = Field(
+        default=0.7,
+        metadata={
+            "description": "Shingle similarity at or above which a query is skipped as a repeat of one already run."
+        },
+    )
+
+    min_information_gain: float = Field(
+        default=0.1,
+        metadata={
+            "description": "End the research loop without reflecting when both the share of new URLs and of new content in the last loop fall below this value. 0 disables it."
+        },
+    )
+
+    incremental_reflection: bool = Field(
+        default=False,
+        metadata={
+            "description": "Send reflection only a running knowledge digest plus the results added since the last loop."
+        },
+    )
+
+    tavily_requests_per_second: float = Field(
+        default=5.0,
+        metadata={
+            "description": "Sustained Tavily request rate across all threads. 0 disables the rate limit."
+        },
+    )
+
+    tavily_burst: int = Field(
+        default=10,
+        metadata={
+            "description": "How many Tavily requests may be sent at once before the rate limit applies."
+        },
+    )
+
+    tavily_max_concurrency: int = Field(
+        default=8,
+        metadata={
+            "description": "The maximum number of Tavily requests in flight at once."
+        },
+    )
+
+    deepseek_requests_per_second: float = Field(
+        default=10.0,
+        metadata={
+            "description": "Sustained DeepSeek request rate across all threads. 0 disables the rate limit."
+        },
+    )
+
+    deepseek_burst: int = Field(
+        default=20,
+        metadata={
+            "description": "How many DeepSeek requests may be sent at once before the rate limit applies."
+        },
+    )
+
+    deepseek_max_concurrency: int = Field(
+        default=16,
+        metadata={
+            "description": "The maximum number of DeepSeek requests in flight at once."
+        },
+    )
+
+    rate_limit_max_retries: int = Field(
+        default=3,
+        metadata={
+            "description": "How often a throttled or transiently failed provider call is retried."
+        },
+    )
+
+    rate_limit_max_backoff: float = Field(
+        default=30.0,
+        metadata={
+            "description": "The longest backoff between retries, in seconds, including Retry-After delays."
+        },
+    )
+
+    shared_rate_limits: bool = Field(
+        default=False,
+        metadata={
+            "description": "Share the request rate limits between server processes through the Redis instance at REDIS_URI; needs the redis extra. The max_concurrency limits stay per process."
+        },
+    )
+
+    summary_batch_size: int = Field(
+        default=1,
+        metadata={
+            "description": "How many web research branches of a loop share one summarization call. 1 summarizes every branch on its own."
+        },
+    )
+
+    summary_batch_window_seconds: float = Field(
+        default=1.0,
+        metadata={
+            "description": "How long a summarization batch waits for the remaining branches of its loop before it is sent."
+        },
+    )
+
+    research_quorum: float = Field(
+        default=1.0,
+        metadata={
+            "description": "Share of the web research branches of a loop that must finish before reflection runs. 1.0 waits for all of them."
+        },
+    )
+
+    straggler_timeout_seconds: float = Field(
+        default=0,
+        metadata={
+            "description": "Seconds after which reflection runs with the branches finished so far, as long as at least one has. 0 disables the timeout."
+        },
+    )
+
+    straggler_policy: str = Field(
+        default="defer",
+        metadata={
+            "description": "What happens to branches still running when the quorum is met: 'cancel' drops them, 'defer' lets them finish and folds them into the next loop."
+        },
+    )
+
+    interrupt_for_confirmation: bool = Field(
+        default=True,
+        metadata={
+            "description": "Pause runs on a thread after query generation until /user-confirmation resumes them."
+        },
+    )
+
+    speculative_prefetch: bool = Field(
+        default=False,
+        metadata={
+            "description": "Research the generated queries in the background while the user reviews them, and reuse the results for unchanged queries."
+        },
+    )
+
+    prefetch_summaries: bool = Field(
+        default=False,
+        metadata={
+            "description": "Also summarize the prefetched search results, not only run the searches."
+        },
+    )
+
+    prefetch_max_queries: int = Field(
+        default=5,
+        metadata={
+            "description": "The maximum number of queries prefetched per thread."
+        },
+    )
+
+    prefetch_ttl_seconds: float = Field(
+        default=600,
+        metadata={
+            "description": "How long unused prefetched results stay valid, in seconds."
+        },
+    )
+
+    pipeline_profile: str = Field(
+        default="full",
+        metadata={
+            "description": "Quality pipeline run after research: 'full' runs the three assessors in parallel and then optimize_summary, 'fast' runs assess_and_optimize, a single call that fills the same results."
+        },
+    )
+
+    stream_summary: bool = Field(
+        default=False,
+        metadata={
+            "description": "Stream the optimized summary token by token, then extract insights in a separate call. The web frontend turns it on for its runs."
+        },
+    )
+
+    reflection_token_budget: int = Field(
+        default=6000,
+        metadata={
+            "description": "Token budget for the research context sent to reflection. 0 sends the full context."
+        },
+    )
+
+    assessment_token_budget: int = Field(
+        default=8000,
+        metadata={
+            "description": "Token budget for the research context sent to each quality assessor. 0 sends the full context."
+        },
+    )
+
+    summary_token_budget: int = Field(
+        default=12000,
+        metadata={
+            "description": "Token budget for the research context sent to optimize_summary. 0 sends the full context."
+        },
+    )
+
+    search_cache_ttl_seconds: int = Field(
+        default=3600,
+        metadata={
+            "description": "How long cached search results stay valid, in seconds. 0 disables the search cache."
+        },
+    )
+
+    search_cache_max_entries: int = Field(
+        default=512,
+        metadata={
+            "description": "The maximum number of searches kept in the in-memory cache tier."
+        },
+    )
+
+    search_cache_path: str | None = Field(
+        default=None,
+        metadata={
+            "description": "Path of an SQLite file used as the persistent search cache tier. Memory only when unset."
+        },
+    )
+
+    llm_cache_ttl_seconds: int = Field(
+        default=86400,
+        metadata={
+            "description": "How long cached LLM responses stay valid, in seconds. Entries never outlive the current day."
+        },
+    )
+
+    llm_cache_max_entries: int = Field(
+        default=256,
+        metadata={
+            "description": "The maximum number of LLM responses kept in the in-memory cache tier."
+        },
+    )
+
+    llm_cache_path: str | None = Field(
+        default=None,
+        metadata={
+            "description": "Path of an SQLite file used as the persistent LLM response cache tier. Memory only when unset."
+        },
+    )
+
+    cache_web_research_llm: bool = Field(
+        default=False,
+        metadata={
+            "description": "Serve repeated web_research summarization calls from the LLM response cache."
+        },
+    )
+
+    cache_verify_facts_llm: bool = Field(
+        default=False,
+        metadata={
+            "description": "Serve repeated verify_facts calls from the LLM response cache."
+        },
+    )
+
+    cache_assess_relevance_llm: bool = Field(
+        default=False,
+        metadata={
+            "description": "Serve repeated assess_relevance calls from the LLM response cache."
+        },
+    )
+
+    token_budget: int = Field(
+        default=0,
+        metadata={
+            "description": "Per-run budget of prompt plus completion tokens. Once it is spent, the stages in token_budget_skip_stages are skipped. 0 disables the budget."
+        },
+    )
+
+    token_budget_skip_stages: List[str] = Field(
+        default=[
+            "reflection",
+            "assess_content_quality",
+            "verify_facts",
+            "assess_relevance",
+        ],
+        metadata={
+            "description": "Nodes skipped once the token budget is spent: reflection (ends the research loop), assess_content_quality, verify_facts, assess_relevance, optimize_summary and assess_and_optimize. A JSON list or comma-separated names."
+        },
+    )
+
+    model_prices: Dict[str, Dict[str, float]] = Field(
+        default={
+            "deepseek-chat": {"input": 0.27, "cached_input": 0.07, "output": 1.10},
+            "deepseek-reasoner": {"input": 0.55, "cached_input": 0.14, "output": 2.19},
+        },
+        metadata={
+            "description": "USD per million tokens per model, with input, output and optional cached_input prices, used to estimate run cost. A JSON object."
+        },
+    )
+
+    deadline_seconds: float = Field(
+        default=0,
+        metadata={
+            "description": "Wall-clock seconds a run may take, counted from generate_query or from resuming after query confirmation. Model and search calls get at most the time left, and the stages in deadline_skip_stages are skipped once less than deadline_min_stage_seconds is left. 0 disables the deadline."
+        },
+    )
+
+    deadline_min_stage_seconds: float = Field(
+        default=20.0,
+        metadata={
+            "description": "Seconds that must be left before the deadline for an optional stage to start."
+        },
+    )
+
+    deadline_skip_stages: List[str] = Field(
+        default=[
+            "reflection",
+            "verify_facts",
+            "assess_relevance",
+            "optimize_summary",
+            "assess_and_optimize",
+        ],
+        metadata={
+            "description": "Nodes skipped when the deadline is near: reflection (ends the research loop), assess_content_quality, verify_facts, assess_relevance, optimize_summary and assess_and_optimize (the report falls back to the research results). A JSON list or comma-separated names."
+        },
+    )
+
+    @field_validator("token_budget_skip_stages", "deadline_skip_stages", mode="before")
+    @classmethod
+    def _parse_stage_list(cls, value: Any) -> Any:
+        # Values read from the environment arrive as strings
+        if isinstance(value, str):
+            value = value.strip()
+            if value.startswith("["):
+                return json.loads(value)
+            return [stage.strip() for stage in value.split(",") if stage.strip()]
+        return value
+
+    @field_validator("model_prices", mode="before")
+    @classmethod
+    def _parse_price_table(cls, value: Any) -> Any:
+        return json.loads(value) if isinstance(value, str) else value
+
     @classmethod
     def from_runnable_config(
-        cls, config: Optional[RunnableConfig] = None
+        cls, config: RunnableConfig | None = None
     ) -> "Configuration":
         """Create a Configuration instance from a RunnableConfig."""
         configurable = (
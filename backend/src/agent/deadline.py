@@ -0,0 +1,63 @@
+"""Run deadlines and the per-call timeouts derived from them."""
+
+import time
+from typing import Any, Dict
+
+from agent.configuration import Configuration
+
+
+def start_deadline(configurable: Configuration) -> float | None:
+    """Return the time a run starting now has to finish by, or None without a deadline.
+
+    The deadline is kept in the state as a wall-clock timestamp, as a run
+    paused for confirmation may be resumed by another worker process.
+    """
+    if configurable.deadline_seconds <= 0:
+        return None
+    return time.time() + configurable.deadline_seconds
+
+
+def remaining_seconds(state: Dict[str, Any]) -> float | None:
+    """Return the seconds left before the run's deadline, negative once it has passed."""
+    deadline_at = state.get("deadline_at")
+    if deadline_at is None:
+        return None
+    return deadline_at - time.time()
+
+
+def call_timeout(state: Dict[str, Any], timeout: float | None = None) -> float | None:
+    """Cap a call's own timeout, if any, at the time left before the run's deadline."""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return timeout
+    remaining = max(remaining, 0.0)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def deadline_record(
+    stage: str, state: Dict[str, Any], configurable: Configuration
+) -> Dict[str, Any]:
+    """Build the ``skipped_stages`` record of a stage dropped for lack of time."""
+    return {
+        "stage": stage,
+        "reason": "deadline",
+        "remaining_seconds": round(max(remaining_seconds(state) or 0.0, 0.0), 1),
+        "deadline_seconds": configurable.deadline_seconds,
+    }
+
+
+def skip_for_deadline(
+    stage: str, state: Dict[str, Any], configurable: Configuration
+) -> Dict[str, Any] | None:
+    """Decide whether a stage is skipped because too little of the run's time is left.
+
+    Returns:
+        The ``skipped_stages`` record to return from the node, or None when
+        the stage should run
+    """
+    if stage not in configurable.deadline_skip_stages:
+        return None
+    remaining = remaining_seconds(state)
+    if remaining is None or remaining >= configurable.deadline_min_stage_seconds:
+        return None
+    return deadline_record(stage, state, configurable)
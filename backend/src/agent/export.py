@@ -0,0 +1,333 @@
+"""Streaming export of research reports as Markdown, HTML or JSON."""
+
+import hashlib
+import html
+import json
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List
+
+from agent.cache import get_cache
+from agent.configuration import Configuration
+from agent.usage import run_skipped_stages, run_token_usage, summarize_usage
+
+# Content type and file extension per export format
+EXPORT_FORMATS = {
+    "markdown": ("text/markdown; charset=utf-8", "md"),
+    "html": ("text/html; charset=utf-8", "html"),
+    "json": ("application/json; charset=utf-8", "json"),
+}
+
+# Rendered pieces are coalesced into chunks of about this many characters
+EXPORT_CHUNK_SIZE = 16 * 1024
+
+# Rendered exports are cached unless larger than this many characters
+EXPORT_CACHE_MAX_CHARS = 2_000_000
+EXPORT_CACHE_MAX_ENTRIES = 64
+EXPORT_CACHE_TTL_SECONDS = 3600
+
+MARKDOWN_LINK_PATTERN = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+INLINE_PATTERN = re.compile(
+    r"\[([^\]]+)\]\((https?://[^)\s]+)\)|\*\*(.+?)\*\*|`([^`]+)`"
+)
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """Yield the lines of ``text`` without their line breaks, one at a time."""
+    start = 0
+    while start <= len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
+
+
+def chunked(pieces: Iterable[str], size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Coalesce small rendered pieces into chunks of roughly ``size`` characters."""
+    buffer: List[str] = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def sources_from_content(content: str) -> List[Dict[str, str]]:
+    """Collect the distinct markdown links of a report, in order of appearance."""
+    seen = {}
+    for match in MARKDOWN_LINK_PATTERN.finditer(content):
+        seen.setdefault(match.group(2), match.group(1))
+    return [{"label": label, "url": url} for url, label in seen.items()]
+
+
+def report_from_content(content: str, title: str) -> Dict[str, Any]:
+    """Build an export from report text sent by the client."""
+    sources = sources_from_content(content)
+    return {
+        "title": title or "研究报告",
+        "content": content,
+        "sources": sources,
+        "metadata": {
+            "characters": len(content),
+            "source_count": len(sources),
+        },
+    }
+
+
+def report_from_state(
+    values: Dict[str, Any], title: str | None = None
+) -> Dict[str, Any] | None:
+    """Build an export from a thread's final state, or None when it has no answer yet."""
+    messages = values.get("messages") or []
+    answer = next(
+        (
+            m
+            for m in reversed(messages)
+            if m.get("type") in ("ai", "AIMessageChunk") and m.get("content")
+        ),
+        None,
+    )
+    if answer is None:
+        return None
+    content = answer["content"]
+    if not isinstance(content, str):
+        content = "".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    topic = next((m.get("content") for m in messages if m.get("type") == "human"), "")
+
+    # Keep the gathered sources the final answer actually cites
+    sources = [
+        {
+            "label": source.get("label") or source.get("title") or source["value"],
+            "url": source["value"],
+        }
+        for source in values.get("sources_gathered") or []
+        if source.get("value") and source["value"] in content
+    ]
+    # Usage and skipped stages of the run that wrote the answer, not the whole thread
+    usage = summarize_usage(run_token_usage(values), Configuration().model_prices)
+    metadata = {
+        "research_topic": topic,
+        "research_loops": values.get("research_loop_count"),
+        "queries_run": len(values.get("search_query") or []),
+        "source_count": len(sources),
+        "final_confidence_score": values.get("final_confidence_score"),
+        "quality_score": (values.get("content_quality") or {}).get("quality_score"),
+        "fact_confidence": (values.get("fact_verification") or {}).get(
+            "confidence_score"
+        ),
+        "relevance_score": (values.get("relevance_assessment") or {}).get(
+            "relevance_score"
+        ),
+        "total_tokens": usage["total_tokens"],
+        "estimated_cost_usd": usage["cost"],
+        "skipped_stages": [entry["stage"] for entry in run_skipped_stages(values)],
+    }
+    return {
+        "title": title
+        or (topic[:80] if isinstance(topic, str) and topic else "研究报告"),
+        "content": content,
+        "sources": sources,
+        "metadata": metadata,
+    }
+
+
+def _metadata(report: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **report["metadata"],
+        "rendered_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def render_markdown(
+    report: Dict[str, Any], include_sources: bool, include_metadata: bool
+) -> Iterator[str]:
+    """Render a report as Markdown, piece by piece."""
+    yield f"# {report['title']}\n\n"
+    for line in iter_lines(report["content"]):
+        yield line + "\n"
+    if include_sources and report["sources"]:
+        yield "\n## 参考来源\n\n"
+        for i, source in enumerate(report["sources"], 1):
+            yield f"{i}. [{source['label']}]({source['url']})\n"
+    if include_metadata:
+        yield "\n## 报告元数据\n\n"
+        for key, value in _metadata(report).items():
+            yield f"- {key}: {value}\n"
+
+
+def _inline_html(text: str) -> str:
+    parts = []
+    position = 0
+    for match in INLINE_PATTERN.finditer(text):
+        parts.append(html.escape(text[position : match.start()]))
+        label, url, bold, code = match.groups()
+        if url:
+            parts.append(f'<a href="{html.escape(url)}">{html.escape(label)}</a>')
+        elif bold:
+            parts.append(f"<strong>{html.escape(bold)}</strong>")
+        else:
+            parts.append(f"<code>{html.escape(code)}</code>")
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+
+def markdown_to_html(lines: Iterable[str]) -> Iterator[str]:
+    """Convert the markdown subset the reports use to HTML, line by line.
+
+    Handles headings, bullet and numbered lists, rules, paragraphs and
+    inline links, bold text and code; anything else is escaped as text.
+    """
+    open_block = None
+    for line in lines:
+        stripped = line.strip()
+        heading = re.match(r"(#{1,6})\s+(.*)", stripped)
+        bullet = re.match(r"[-*]\s+(.*)", stripped)
+        numbered = re.match(r"\d+\.\s+(.*)", stripped)
+        block = (
+            "ul"
+            if bullet
+            else "ol"
+            if numbered
+            else "p"
+            if stripped and not heading
+            else None
+        )
+        if open_block and (block != open_block or stripped in ("---", "***")):
+            yield f"</{open_block}>\n"
+            open_block = None
+        if not stripped:
+            continue
+        if heading:
+            level = len(heading.group(1))
+            yield f"<h{level}>{_inline_html(heading.group(2))}</h{level}>\n"
+        elif stripped in ("---", "***"):
+            yield "<hr>\n"
+        elif block in ("ul", "ol"):
+            if open_block is None:
+                yield f"<{block}>\n"
+                open_block = block
+            yield f"<li>{_inline_html((bullet or numbered).group(1))}</li>\n"
+        else:
+            if open_block is None:
+                yield "<p>"
+                open_block = "p"
+            else:
+                yield "<br>\n"
+            yield _inline_html(stripped)
+    if open_block:
+        yield f"</{open_block}>\n"
+
+
+def render_html(
+    report: Dict[str, Any], include_sources: bool, include_metadata: bool
+) -> Iterator[str]:
+    """Render a report as a standalone HTML page, piece by piece."""
+    title = html.escape(report["title"])
+    yield (
+        '<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="utf-8">\n'
+        f"<title>{title}</title>\n"
+        "<style>body{max-width:860px;margin:2rem auto;padding:0 1rem;font-family:sans-serif;"
+        "line-height:1.7;color:#1f2937}a{color:#2563eb}code{background:#f3f4f6;padding:0 .25rem}"
+        "dt{font-weight:600}</style>\n</head>\n<body>\n"
+        f"<h1>{title}</h1>\n"
+    )
+    yield from markdown_to_html(iter_lines(report["content"]))
+    if include_sources and report["sources"]:
+        yield "<h2>参考来源</h2>\n<ol>\n"
+        for source in report["sources"]:
+            yield f'<li><a href="{html.escape(source["url"])}">{html.escape(source["label"])}</a></li>\n'
+        yield "</ol>\n"
+    if include_metadata:
+        yield "<h2>报告元数据</h2>\n<dl>\n"
+        for key, value in _metadata(report).items():
+            yield f"<dt>{html.escape(key)}</dt><dd>{html.escape(str(value))}</dd>\n"
+        yield "</dl>\n"
+    yield "</body>\n</html>\n"
+
+
+def render_json(
+    report: Dict[str, Any], include_sources: bool, include_metadata: bool
+) -> Iterator[str]:
+    """Render a report as a JSON object, piece by piece, without building it in memory."""
+    yield (
+        '{"title": '
+        + json.dumps(report["title"], ensure_ascii=False)
+        + ', "content": "'
+    )
+    # Escape the content line by line inside one JSON string
+    first = True
+    for line in iter_lines(report["content"]):
+        yield ("" if first else "\\n") + json.dumps(line, ensure_ascii=False)[1:-1]
+        first = False
+    yield '"'
+    if include_sources:
+        yield ', "sources": ['
+        for i, source in enumerate(report["sources"]):
+            yield (", " if i else "") + json.dumps(source, ensure_ascii=False)
+        yield "]"
+    if include_metadata:
+        yield ', "metadata": ' + json.dumps(_metadata(report), ensure_ascii=False)
+    yield "}\n"
+
+
+RENDERERS = {"markdown": render_markdown, "html": render_html, "json": render_json}
+
+
+def export_cache_key(*parts: Any) -> str:
+    """Return the cache key of an export rendered from ``parts``."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return "export:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def stream_export(
+    key: str,
+    report: Dict[str, Any] | None,
+    export_format: str,
+    include_sources: bool,
+    include_metadata: bool,
+) -> AsyncIterator[bytes]:
+    """Stream a rendered export in chunks, from the cache when it was rendered before.
+
+    A fresh render is cached once it has been streamed in full, unless it is
+    larger than ``EXPORT_CACHE_MAX_CHARS``.
+
+    Args:
+        key: The cache key of the export, see ``export_cache_key``
+        report: The report to render; only read on a cache miss
+        export_format: "markdown", "html" or "json"
+        include_sources: Whether to append the list of cited sources
+        include_metadata: Whether to append the report metadata
+    """
+    cache = get_cache(
+        "export",
+        max_entries=EXPORT_CACHE_MAX_ENTRIES,
+        ttl_seconds=EXPORT_CACHE_TTL_SECONDS,
+    )
+    cached = await cache.aget(key)
+    if cached is not None:
+        for start in range(0, len(cached), EXPORT_CHUNK_SIZE):
+            yield cached[start : start + EXPORT_CHUNK_SIZE].encode("utf-8")
+        return
+
+    rendered: List[str] | None = []
+    size = 0
+    for chunk in chunked(
+        RENDERERS[export_format](report, include_sources, include_metadata)
+    ):
+        if rendered is not None:
+            size += len(chunk)
+            rendered.append(chunk)
+            if size > EXPORT_CACHE_MAX_CHARS:
+                # Stop keeping a copy once the export is too large to cache
+                rendered = None
+        yield chunk.encode("utf-8")
+    if rendered is not None:
+        await cache.aset(key, "".join(rendered))
@@ -1,59 +1,318 @@
-import os
+import asyncio
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Iterable
 
-from agent.tools_and_schemas import (
-    SearchQueryList, 
-    Reflection, 
-    ContentQualityAssessment,
-    FactVerification,
-    RelevanceAssessment,
-    SummaryOptimization,
-    UserQueryConfirmation
-)
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessage
-from langgraph.types import Send
-from langgraph.graph import StateGraph
-from langgraph.graph import START, END
 from langchain_core.runnables import RunnableConfig
-from langchain_tavily import TavilySearch
-
-from agent.state import (
-    OverallState,
-    QueryGenerationState,
-    ReflectionState,
-    WebSearchState,
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send, interrupt
+
+from agent.batching import summary_batcher
+from agent.cache import get_cache, make_search_key
+from agent.citations import CitationRegistry
+from agent.compaction import (
+    SECTION_SEPARATOR,
+    estimate_tokens,
+    rank_sections,
+    ranked_sections,
+    render_context,
+    section_ranking,
 )
 from agent.configuration import Configuration
+from agent.deadline import (
+    call_timeout,
+    deadline_record,
+    remaining_seconds,
+    skip_for_deadline,
+    start_deadline,
+)
+from agent.llm import invoke_llm, stream_llm
+from agent.metrics import instrument_node
+from agent.prefetch import prefetch_store
 from agent.prompts import (
+    combined_quality_instructions,
+    content_quality_instructions,
+    fact_verification_instructions,
     get_current_date,
+    incremental_reflection_instructions,
     query_writer_instructions,
-    web_searcher_instructions,
     reflection_instructions,
-    answer_instructions,
-    content_quality_instructions,
-    fact_verification_instructions,
     relevance_assessment_instructions,
+    summary_insights_instructions,
     summary_optimization_instructions,
+    summary_streaming_instructions,
+    web_searcher_batch_instructions,
+    web_searcher_instructions,
+)
+from agent.providers import TAVILY_MAX_RESULTS, TAVILY_SEARCH_DEPTH, tavily_search
+from agent.quorum import quorum_tracker
+from agent.rate_limit import ProviderHTTPError, call_with_limits
+from agent.state import (
+    OverallState,
+    ReflectionState,
+    WebSearchState,
+    merge_token_usage,
+)
+from agent.tools_and_schemas import (
+    BatchedSearchSummaries,
+    CombinedQualityAssessment,
+    ContentQualityAssessment,
+    FactVerification,
+    IncrementalReflection,
+    Reflection,
+    RelevanceAssessment,
+    SearchQueryList,
+    SummaryInsights,
+    SummaryOptimization,
+)
+from agent.usage import (
+    collect_usage,
+    format_cost,
+    run_skipped_stages,
+    run_token_usage,
+    skip_for_budget,
+    start_run_usage,
+    summarize_usage,
+    track_usage,
 )
-from langchain_deepseek import ChatDeepSeek
 from agent.utils import (
+    dedupe_queries,
     get_research_topic,
+    parse_search_results,
+    text_shingles,
+    warn_once,
 )
 
 load_dotenv(override=True)
 
-if os.getenv("DEEPSEEK_API_KEY") is None:
-    raise ValueError("DEEPSEEK_API_KEY is not set")
 
-if os.getenv("TAVILY_API_KEY") is None:
-    raise ValueError("TAVILY_API_KEY is not set")
+async def run_tavily_search(query: str, configurable: Configuration):
+    """Run a Tavily search within the provider's rate limit."""
+
+    async def call():
+        response = await tavily_search(query, configurable)
+        # The Tavily tool returns HTTP failures as {"error": Exception("Error 429: ...")}
+        error = response.get("error") if isinstance(response, dict) else None
+        match = re.match(r"Error (\d{3})", str(error)) if error is not None else None
+        if match:
+            raise ProviderHTTPError("tavily", int(match.group(1)))
+        return response
+
+    return await call_with_limits("tavily", configurable, call)
+
+
+async def search_web(query: str, configurable: Configuration) -> list:
+    """Run a Tavily search through the search result cache.
+
+    Cache hits return the already-parsed result list, so neither the Tavily
+    round-trip nor the response parsing is repeated for overlapping queries.
+    """
+    if configurable.search_cache_ttl_seconds <= 0:
+        return parse_search_results(await run_tavily_search(query, configurable))
+
+    cache = get_cache(
+        "search",
+        max_entries=configurable.search_cache_max_entries,
+        ttl_seconds=configurable.search_cache_ttl_seconds,
+        sqlite_path=configurable.search_cache_path,
+    )
+    key = make_search_key(query, TAVILY_MAX_RESULTS, TAVILY_SEARCH_DEPTH)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return cached
+
+    results = parse_search_results(await run_tavily_search(query, configurable))
+    if results:
+        await cache.aset(key, results)
+    return results
+
+
+# Neutral results used when an assessor does not answer within its timeout or
+# is skipped to stay within the token budget
+DEFAULT_CONTENT_QUALITY = {
+    "quality_score": 0.5,
+    "reliability_assessment": "评估超时，未能完成可靠性评估",
+    "content_gaps": [],
+    "improvement_suggestions": [],
+}
+DEFAULT_FACT_VERIFICATION = {
+    "verified_facts": [],
+    "disputed_claims": [],
+    "verification_sources": [],
+    "confidence_score": 0.5,
+}
+DEFAULT_RELEVANCE_ASSESSMENT = {
+    "relevance_score": 0.5,
+    "key_topics_covered": [],
+    "missing_topics": [],
+    "content_alignment": "评估超时，未能完成相关性评估",
+}
+
+
+async def invoke_with_timeout(awaitable, timeout: float, name: str):
+    """Await a model call, returning None instead of raising when it times out."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except TimeoutError:
+        warn_once(
+            f"timeout:{name}",
+            f"{name} timed out after {timeout:.1f}s, falling back to defaults",
+        )
+        return None
+
+
+async def invoke_before_deadline(
+    awaitable,
+    state,
+    configurable: Configuration,
+    name: str,
+    timeout: float | None = None,
+):
+    """Await a call within its own timeout, if any, and the time left before the run's deadline.
+
+    Returns:
+        The result, or None when the call timed out, and the ``skipped_stages``
+        records to return: one when it was the deadline that cut the call short
+    """
+    limit = call_timeout(state, timeout)
+    result = await invoke_with_timeout(awaitable, limit, name)
+    if result is None and limit is not None and (timeout is None or limit < timeout):
+        return None, [deadline_record(name, state, configurable)]
+    return result, []
 
-# Initialize Tavily Search
-tavily_search = TavilySearch(
-    max_results=5,
-    search_depth="advanced",
-    api_key=os.getenv("TAVILY_API_KEY")
-)
+
+SKIP_REASONS = {"token_budget": "Token 预算已用尽", "deadline": "剩余时间不足"}
+
+
+def skip_stage(stage: str, state, configurable: Configuration):
+    """Return the record of why an optional stage is skipped, or None when it should run."""
+    return skip_for_budget(stage, state, configurable) or skip_for_deadline(
+        stage, state, configurable
+    )
+
+
+def get_research_context(state: OverallState, budget: int) -> str:
+    """Return the research results for a prompt, compacted to a token budget.
+
+    The full results are used when they already fit, when the budget is 0, or
+    before compact_context has ranked them.
+    """
+    full_context = SECTION_SEPARATOR.join(state["web_research_result"])
+    ranking = state.get("context_ranking")
+    if budget <= 0 or not ranking or estimate_tokens(full_context) <= budget:
+        return full_context
+    return render_context(
+        ranked_sections(state["web_research_result"], ranking), budget
+    )
+
+
+def measure_novelty(state: OverallState) -> dict:
+    """Measure how much new material the last research loop added.
+
+    Compares the loop's results with everything gathered before it: the share
+    of URLs it returned that were not already known, and the share of its
+    content shingles that do not appear in earlier results. The counts are
+    kept in the record so the next loop can use it as its baseline.
+    """
+    results = state["web_research_result"]
+    sources = state.get("sources_gathered") or []
+    queries = state.get("search_query") or []
+    history = state.get("research_novelty") or []
+    record = {
+        "loop": state.get("research_loop_count", 0),
+        "results": len(results),
+        "sources": len(sources),
+        "queries": len(queries),
+        "new_url_ratio": 1.0,
+        "new_content_ratio": 1.0,
+    }
+    if not history:
+        return record
+
+    baseline = history[-1]
+    loop_queries = set(queries[baseline["queries"] :])
+    url_hits = [
+        idx
+        for idx, source in enumerate(sources)
+        if loop_queries.intersection(source.get("queries", []))
+    ]
+    if url_hits:
+        new_urls = sum(1 for idx in url_hits if idx >= baseline["sources"])
+        record["new_url_ratio"] = round(new_urls / len(url_hits), 4)
+
+    new_shingles = text_shingles(SECTION_SEPARATOR.join(results[baseline["results"] :]))
+    if new_shingles:
+        old_shingles = text_shingles(
+            SECTION_SEPARATOR.join(results[: baseline["results"]])
+        )
+        record["new_content_ratio"] = round(
+            len(new_shingles - old_shingles) / len(new_shingles), 4
+        )
+    return record
+
+
+def select_follow_up_queries(
+    follow_up_queries: list, state: OverallState, configurable: Configuration
+) -> tuple[list, list]:
+    """Split follow-up queries into those worth running and repeats of earlier queries."""
+    return dedupe_queries(
+        follow_up_queries,
+        state.get("search_query") or [],
+        configurable.query_similarity_threshold,
+    )
+
+
+def get_thread_id(config: RunnableConfig):
+    """Return the id of the thread a run belongs to, if any."""
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+
+async def prefetch_research(query: str, configurable: Configuration) -> dict:
+    """Speculatively research a generated query while the user reviews it.
+
+    Always runs the search; the branch summarization only when
+    ``prefetch_summaries`` is set, as it is the costlier half to waste on a
+    query the user goes on to edit.
+    """
+    results = await search_web(query, configurable)
+    update = None
+    if configurable.prefetch_summaries:
+        # The run that reuses the summary is charged for its tokens
+        update, usage = await collect_usage(
+            summarize_search_results(query, results, configurable)
+        )
+        if usage:
+            update = {**update, "token_usage": {"prefetch": usage}}
+    return {"results": results, "update": update}
+
+
+async def await_prefetch(thread_id, query: str, configurable: Configuration):
+    """Wait for the prefetched or deferred research of a query, or return None without one."""
+    task = prefetch_store.get(thread_id, query, configurable.prefetch_ttl_seconds)
+    if task is None:
+        return None
+    try:
+        # Shielded so a stopped run does not cancel the prefetch a later run reuses
+        result = await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if task.cancelled():
+            return None
+        raise
+    except Exception as e:
+        # Forget the failed task so later runs search again instead of reusing it
+        prefetch_store.discard(thread_id, query, task)
+        warn_once(
+            f"prefetch:{type(e).__name__}",
+            f"prefetch for '{query}' failed, searching again: {e}",
+        )
+        return None
+    prefetch_store.discard(thread_id, query, task)
+    return result
 
 
 # Nodes
@@ -68,10 +327,12 @@ async def generate_query(state: OverallState, config: RunnableConfig) -> Overall
         config: Configuration for the runnable, including LLM provider settings
 
     Returns:
-        Dictionary with state update, including search_query key containing the generated queries
+        Dictionary with state update, including generated_queries key containing the generated queries.
+        search_query only collects the queries web_research has run, so the
+        proposed queries are not added to it before the user confirms them
     """
     configurable = Configuration.from_runnable_config(config)
-    
+
     # 检查是否是用户确认消息
     last_message = state["messages"][-1] if state["messages"] else None
     if last_message and last_message.content and "[查询已确认]" in last_message.content:
@@ -79,26 +340,25 @@ async def generate_query(state: OverallState, config: RunnableConfig) -> Overall
         content = last_message.content
         queries_part = content.split("[查询已确认]")[1].strip()
         confirmed_queries = [q.strip() for q in queries_part.split("|")]
+        # Drop speculative research for queries the user edited away
+        prefetch_store.retain(get_thread_id(config), confirmed_queries)
         return {
-            "search_query": confirmed_queries,
+            "deadline_at": start_deadline(configurable),
+            **start_run_usage(state),
             "generated_queries": confirmed_queries,
+            "user_confirmed_queries": confirmed_queries,
             "awaiting_user_confirmation": False,
-            "user_confirmation_received": True
+            "user_confirmation_received": True,
+            "user_confirmation_cancelled": False,
         }
 
+    # The run's deadline starts with its first node
+    state["deadline_at"] = start_deadline(configurable)
+
     # check for custom initial search query count
     if state.get("initial_search_query_count") is None:
         state["initial_search_query_count"] = configurable.number_of_initial_queries
 
-    # init DeepSeek
-    llm = ChatDeepSeek(
-        model=configurable.query_generator_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-    )
-    structured_llm = llm.with_structured_output(SearchQueryList)
-
     # Format the prompt
     current_date = get_current_date()
     formatted_prompt = query_writer_instructions.format(
@@ -107,38 +367,112 @@ async def generate_query(state: OverallState, config: RunnableConfig) -> Overall
         number_queries=state["initial_search_query_count"],
     )
     # Generate the search queries
-    result = await structured_llm.ainvoke(formatted_prompt)
+    result, timed_out = await invoke_before_deadline(
+        invoke_llm(
+            configurable,
+            configurable.query_generator_model,
+            1.0,
+            formatted_prompt,
+            SearchQueryList,
+        ),
+        state,
+        configurable,
+        "generate_query",
+    )
+    # Out of time: search for the question itself
+    generated = (
+        result.query if result is not None else [get_research_topic(state["messages"])]
+    )
+    # Drop near-duplicates of each other and of queries already run in this thread
+    queries, skipped = dedupe_queries(
+        generated,
+        state.get("search_query") or [],
+        configurable.query_similarity_threshold,
+    )
+    if not queries:
+        queries, skipped = generated[:1], skipped[1:]
     return {
-        "search_query": result.query,
-        "generated_queries": result.query,
+        "deadline_at": state["deadline_at"],
+        **start_run_usage(state),
+        "skipped_stages": timed_out,
+        "generated_queries": queries,
+        "skipped_queries": skipped,
+        "user_confirmed_queries": [],
         "awaiting_user_confirmation": True,
-        "user_confirmation_received": False
+        "user_confirmation_received": False,
+        "user_confirmation_cancelled": False,
     }
 
 
 async def wait_for_user_confirmation(state: OverallState, config: RunnableConfig):
     """LangGraph node that waits for user confirmation of generated queries.
-    
-    This node simply outputs the generated queries and waits.
-    The workflow will be paused here until user provides confirmation.
+
+    This node outputs the generated queries and, for runs on a thread, pauses
+    the graph with an interrupt. The /user-confirmation endpoint resumes it
+    from the checkpoint with the confirmed or modified queries, so research
+    continues at web_research without a new pass through generate_query.
+    With speculative prefetch enabled, the generated queries are researched
+    in the background meanwhile, so unchanged queries are ready on confirmation.
     """
     from langchain_core.messages import AIMessage
-    
+
     # 生成一个包含查询的消息给用户确认
-    queries = state.get("generated_queries", state.get("search_query", []))
-    confirmation_message = f"我为您生成了以下搜索查询：\n\n" + "\n".join([f"{i+1}. {q}" for i, q in enumerate(queries)]) + "\n\n请确认是否继续使用这些查询进行搜索，或者您可以修改它们。"
-    
+    queries = state.get("generated_queries") or []
+
+    configurable = Configuration.from_runnable_config(config)
+    thread_id = get_thread_id(config)
+    if configurable.speculative_prefetch and thread_id:
+        prefetch_store.start(
+            thread_id,
+            queries,
+            lambda query: prefetch_research(query, configurable),
+            configurable.prefetch_max_queries,
+            configurable.prefetch_ttl_seconds,
+        )
+    confirmation_message = (
+        "我为您生成了以下搜索查询：\n\n"
+        + "\n".join([f"{i + 1}. {q}" for i, q in enumerate(queries)])
+        + "\n\n请确认是否继续使用这些查询进行搜索，或者您可以修改它们。"
+    )
+
+    # Interrupts need a checkpointer, which runs on a thread always have
+    if not (configurable.interrupt_for_confirmation and thread_id):
+        return {
+            "messages": [AIMessage(content=confirmation_message)],
+            "awaiting_user_confirmation": True,
+        }
+
+    # The node runs again from the top on resume; the prefetch above skips
+    # queries that are already in flight
+    decision = interrupt({"queries": queries, "message": confirmation_message})
+    if decision.get("action") == "cancel":
+        prefetch_store.cancel(thread_id)
+        return {
+            "messages": [AIMessage(content=confirmation_message)],
+            "awaiting_user_confirmation": False,
+            "user_confirmation_cancelled": True,
+        }
+
+    confirmed_queries = [
+        q.strip() for q in decision.get("queries") or [] if q.strip()
+    ] or queries
+    # Drop speculative research for queries the user edited away
+    prefetch_store.retain(thread_id, confirmed_queries)
     return {
         "messages": [AIMessage(content=confirmation_message)],
-        "awaiting_user_confirmation": True
+        # Time spent waiting for the user does not count against the deadline
+        "deadline_at": start_deadline(configurable),
+        "user_confirmed_queries": confirmed_queries,
+        "awaiting_user_confirmation": False,
+        "user_confirmation_received": True,
     }
 
 
-def should_wait_for_confirmation(state: OverallState):
+def should_wait_for_confirmation(state: OverallState, config: RunnableConfig):
     """路由函数：决定是否需要等待用户确认"""
-    # 如果已经收到用户确认，直接进行网络搜索
+    # 如果已经收到用户确认，直接对确认的查询进行网络搜索
     if state.get("user_confirmation_received", False):
-        return "web_research"
+        return continue_to_web_research(state, config)
     # 如果需要等待用户确认
     elif state.get("awaiting_user_confirmation", False):
         return "wait_for_user_confirmation"
@@ -146,23 +480,325 @@ def should_wait_for_confirmation(state: OverallState):
         return "web_research"
 
 
-def continue_to_web_research(state: OverallState):
+def get_max_research_loops(state, configurable: Configuration) -> int:
+    """Return the research loop limit of the run, from the state or the configuration."""
+    if state.get("max_research_loops") is not None:
+        return state["max_research_loops"]
+    return configurable.max_research_loops
+
+
+def is_final_loop(state, configurable: Configuration) -> bool:
+    """Whether reflection stops the research after the loop about to be dispatched."""
+    return state.get("research_loop_count", 0) + 1 >= get_max_research_loops(
+        state, configurable
+    )
+
+
+def fan_out_web_research(
+    queries: list,
+    first_id: int = 0,
+    deadline_at: float | None = None,
+    final_loop: bool = False,
+    resumed: Iterable[str] = (),
+) -> list:
+    """Send one web_research branch per query, tagged with a shared fan-out id and the run's deadline.
+
+    Stragglers of the final loop are not deferred, as no later loop would
+    pick their results up. Queries in ``resumed`` are stragglers deferred by
+    the previous loop, whose research is already running.
+    """
+    resumed = set(resumed)
+    fanout_id = uuid.uuid4().hex
+    return [
+        Send(
+            "web_research",
+            {
+                "search_query": search_query,
+                "id": first_id + int(idx),
+                "fanout_id": fanout_id,
+                "fanout_size": len(queries),
+                "deadline_at": deadline_at,
+                "final_loop": final_loop,
+                "resumed_straggler": search_query in resumed,
+            },
+        )
+        for idx, search_query in enumerate(queries)
+    ]
+
+
+def continue_to_web_research(state: OverallState, config: RunnableConfig):
     """LangGraph node that sends the search queries to the web research node.
 
     This is used to spawn n number of web research nodes, one for each search query.
     """
+    # 用户取消时结束流程
+    if state.get("user_confirmation_cancelled"):
+        return END
     # 使用确认后的查询或原始查询
-    queries_to_use = state.get("user_confirmed_queries") or state.get("search_query", [])
-    return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
-        for idx, search_query in enumerate(queries_to_use)
-    ]
+    queries_to_use = (
+        state.get("user_confirmed_queries") or state.get("generated_queries") or []
+    )
+    configurable = Configuration.from_runnable_config(config)
+    return fan_out_web_research(
+        queries_to_use,
+        deadline_at=state.get("deadline_at"),
+        final_loop=is_final_loop(state, configurable),
+    )
+
+
+async def summarize_batch(items: list, configurable: Configuration) -> list:
+    """Summarize the search results of several queries in one structured call.
+
+    Args:
+        items: (search query, formatted search results) pairs
+        configurable: The run configuration
+
+    Returns:
+        One summary per item, None where the model returned none for it
+    """
+    blocks = "\n\n".join(
+        f"=== 查询 {i + 1}：{search_query} ===\n搜索结果：\n{search_content}"
+        for i, (search_query, search_content) in enumerate(items)
+    )
+    formatted_prompt = web_searcher_batch_instructions.format(
+        current_date=get_current_date(),
+        number_queries=len(items),
+    )
+    result = await invoke_llm(
+        configurable,
+        configurable.query_generator_model,
+        0,
+        f"{formatted_prompt}\n\n{blocks}",
+        BatchedSearchSummaries,
+        use_cache=configurable.cache_web_research_llm,
+    )
+    summaries = [None] * len(items)
+    for item in result.summaries:
+        if 1 <= item.query_index <= len(items) and item.summary.strip():
+            summaries[item.query_index - 1] = item.summary
+    return summaries
+
+
+def summary_batch_key(
+    configurable: Configuration, fanout: WebSearchState | None
+) -> str | None:
+    """Return the fan-out id a branch batches its summary under, or None when it summarizes alone."""
+    if (
+        configurable.summary_batch_size > 1
+        and fanout
+        and fanout.get("fanout_id")
+        and fanout.get("fanout_size", 0) > 1
+    ):
+        return fanout["fanout_id"]
+    return None
+
+
+async def summarize_search_results(
+    search_query: str,
+    results_to_process: list,
+    configurable: Configuration,
+    fanout: WebSearchState | None = None,
+) -> dict:
+    """Summarize the search results of one query into a web research state update.
+
+    With a summary batch size above 1, the branches of a fan-out share batched
+    summarization calls; a query the batch returns no summary for falls back
+    to its own call.
+    """
+    # Extract content and URLs from search results
+    search_content = ""
+    sources_gathered = []
+
+    citations = CitationRegistry()
+    # Bare domain names and per-branch source numbers the model may cite instead of URLs
+    aliases = {}
+    for i, result in enumerate(results_to_process):
+        if isinstance(result, dict):
+            title = result.get("title", f"Result {i + 1}")
+            url = result.get("url", f"https://search-result-{i + 1}.com")
+            content = result.get("content", str(result))
+        else:
+            title = f"Result {i + 1}"
+            url = f"https://search-result-{i + 1}.com"
+            content = str(result)
+
+        search_content += f"Source {i + 1}: {title}\nURL: {url}\nContent: {content}\n\n"
+        domain = url.split("/")[2] if len(url.split("/")) > 2 else url
+        aliases.setdefault(domain, url)
+        aliases[f"[{i + 1}]"] = url
+        sources_gathered.append(
+            {
+                "title": title,
+                "url": url,
+                "content": content[:500] + "..." if len(content) > 500 else content,
+                "short_url": citations.register(url),
+                "value": url,
+                "label": title,  # Add label field for frontend compatibility
+                "queries": [search_query],
+            }
+        )
+
+    summary = None
+    if summary_batch_key(configurable, fanout):
+        summary = await summary_batcher.submit(
+            fanout["fanout_id"],
+            fanout["fanout_size"],
+            (search_query, search_content),
+            configurable.summary_batch_window_seconds,
+            configurable.summary_batch_size,
+            lambda items: summarize_batch(items, configurable),
+        )
+
+    if summary is None:
+        # Format prompt for DeepSeek to analyze the search results
+        formatted_prompt = web_searcher_instructions.format(
+            current_date=get_current_date(),
+            research_topic=search_query,
+        )
+
+        # Add search results to the prompt
+        analysis_prompt = f"{formatted_prompt}\n\n搜索结果：\n{search_content}\n\n请分析这些搜索结果并提供带有引用的综合摘要。请用中文回答。"
+
+        # Use DeepSeek to analyze and summarize the search results
+        response = await invoke_llm(
+            configurable,
+            configurable.query_generator_model,
+            0,
+            analysis_prompt,
+            use_cache=configurable.cache_web_research_llm,
+        )
+        summary = response.content
+
+    # Insert citation markers: URLs and their aliases become run-wide stable
+    # markers in a single pass. Source numbers are per query in batched
+    # prompts too, so the branch's own aliases apply.
+    modified_text = citations.replace_urls(summary, aliases)
+
+    return {
+        "sources_gathered": sources_gathered,
+        "search_query": [search_query],
+        "web_research_result": [modified_text],
+    }
+
+
+async def research_query(
+    search_query: str,
+    thread_id,
+    configurable: Configuration,
+    fanout: WebSearchState | None = None,
+) -> dict:
+    """Search and summarize one query, reusing prefetched or deferred research.
+
+    A branch of a batched fan-out that returns without submitting a summary
+    tells the batcher, so the other branches do not wait out the batch window.
+    """
+    batch_key = summary_batch_key(configurable, fanout)
+    try:
+        prefetched = await await_prefetch(thread_id, search_query, configurable)
+        if prefetched is None:
+            results_to_process = await search_web(search_query, configurable)
+        elif prefetched["update"] is None:
+            results_to_process = prefetched["results"]
+        else:
+            if batch_key:
+                summary_batcher.skip(batch_key, fanout["fanout_size"])
+            return prefetched["update"]
+    except BaseException:
+        # Failed or cancelled before reaching the batch
+        if batch_key:
+            summary_batcher.skip(batch_key, fanout["fanout_size"])
+        raise
+
+    return await summarize_search_results(
+        search_query, results_to_process, configurable, fanout
+    )
+
+
+async def research_with_quorum(
+    search_query: str, state: WebSearchState, thread_id, configurable: Configuration
+) -> dict:
+    """Research one query of a fan-out, returning early once the fan-out's quorum is met.
+
+    A branch still running when the quorum is released becomes a straggler:
+    it is cancelled, or with the 'defer' policy left running in the prefetch
+    store so the next loop reuses its result instead of searching again.
+    A deferred straggler dispatched again is never cut off a second time, as
+    its result would otherwise be stranded in the prefetch store.
+    """
+    started = time.monotonic()
+    quorum = quorum_tracker.join(
+        state["fanout_id"],
+        state["fanout_size"],
+        configurable.research_quorum,
+        configurable.straggler_timeout_seconds,
+    )
+    defer = (
+        configurable.straggler_policy == "defer"
+        and thread_id
+        and not state.get("final_loop")
+    )
+
+    async def research():
+        # Collected separately, as a deferred branch finishes outside this node
+        update, usage = await collect_usage(
+            research_query(search_query, thread_id, configurable, state)
+        )
+        if usage:
+            update = {
+                **update,
+                "token_usage": merge_token_usage(
+                    update.get("token_usage"), {"web_research": usage}
+                ),
+            }
+        return {"results": None, "update": update}
+
+    # Runs in the node's context, so its calls stay traced and streamed; a
+    # deferred straggler keeps running after the node returns and still
+    # reports to this run's callbacks
+    task = asyncio.create_task(research())
+    released = asyncio.create_task(quorum.released.wait())
+    try:
+        # A resumed straggler still counts towards the quorum, but waits for its own result
+        awaited = {task} if state.get("resumed_straggler") else {task, released}
+        await asyncio.wait(awaited, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        released.cancel()
+        quorum_tracker.leave(state["fanout_id"])
+
+    if task.done():
+        quorum.complete()
+        return task.result()["update"]
+
+    record = {
+        "fanout_id": state["fanout_id"],
+        "query": search_query,
+        "fanout_size": quorum.size,
+        "completed": quorum.completed,
+        "quorum_wait_seconds": round(quorum.wait_seconds(), 3),
+        "running_seconds": round(time.monotonic() - started, 3),
+        "timed_out": quorum.timed_out,
+    }
+    if defer:
+        prefetch_store.adopt(thread_id, search_query, task)
+        return {
+            "straggler_stats": [{**record, "action": "deferred"}],
+            "deferred_queries": [search_query],
+        }
+    task.cancel()
+    return {"straggler_stats": [{**record, "action": "cancelled"}]}
 
 
 async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """LangGraph node that performs web research using Tavily Search API.
 
     Executes a web search using Tavily Search API and then uses DeepSeek to analyze and summarize the results.
+    Speculatively prefetched searches and summaries of the query are reused.
+    With a reflection quorum configured, a branch that is still running once
+    enough of its fan-out has finished returns without results, as does a
+    branch still running at the run's deadline.
 
     Args:
         state: Current graph state containing the search query and research loop count
@@ -173,100 +809,70 @@ async def web_research(state: WebSearchState, config: RunnableConfig) -> Overall
     """
     # Configure
     configurable = Configuration.from_runnable_config(config)
-    
+
     # Perform search using Tavily
     # Ensure search_query is a string, not a list
     search_query = state["search_query"]
     if isinstance(search_query, list):
         search_query = search_query[0] if search_query else ""
-    search_results = await tavily_search.ainvoke(search_query)
-    
-    # Extract content and URLs from search results
-    search_content = ""
-    sources_gathered = []
-    
-
-    
-    # Handle different return formats from Tavily
-    if isinstance(search_results, list):
-        results_to_process = search_results
-    elif isinstance(search_results, dict):
-        # Tavily typically returns a dict with 'results' key
-        results_to_process = search_results.get('results', [])
-    elif isinstance(search_results, str):
-        # If it's a string, it might be JSON content
-        try:
-            import json
-            parsed_results = json.loads(search_results)
-            if isinstance(parsed_results, dict) and 'results' in parsed_results:
-                results_to_process = parsed_results['results']
-            else:
-                results_to_process = [{"title": "Search Result", "url": "", "content": search_results}]
-        except (json.JSONDecodeError, TypeError, KeyError) as e:
-            print(f"Warning: Failed to parse search results as JSON: {e}")
-            results_to_process = [{"title": "Search Result", "url": "", "content": search_results}]
+
+    thread_id = get_thread_id(config)
+    quorum_enabled = (
+        configurable.research_quorum < 1 or configurable.straggler_timeout_seconds > 0
+    )
+    if quorum_enabled and state.get("fanout_id") and state.get("fanout_size", 0) > 1:
+        research = research_with_quorum(search_query, state, thread_id, configurable)
     else:
-        results_to_process = []
-    
+        research = research_query(search_query, thread_id, configurable, state)
+    update, skipped = await invoke_before_deadline(
+        research, state, configurable, "web_research"
+    )
+    if update is None:
+        return {
+            "search_query": [search_query],
+            "skipped_stages": [{**entry, "query": search_query} for entry in skipped],
+        }
+    return update
 
-    
-    for i, result in enumerate(results_to_process):
-        if isinstance(result, dict):
-            title = result.get('title', f'Result {i+1}')
-            url = result.get('url', f'https://search-result-{i+1}.com')
-            content = result.get('content', str(result))
-        else:
-            title = f'Result {i+1}'
-            url = f'https://search-result-{i+1}.com'
-            content = str(result)
-            
-        search_content += f"Source {i+1}: {title}\nURL: {url}\nContent: {content}\n\n"
-        sources_gathered.append({
-            "title": title,
-            "url": url,
-            "content": content[:500] + "..." if len(content) > 500 else content,
-            "short_url": f"[{i+1}]",
-            "value": url,
-            "label": title  # Add label field for frontend compatibility
-        })
-    
-
-    
-    # Format prompt for DeepSeek to analyze the search results
-    formatted_prompt = web_searcher_instructions.format(
-        current_date=get_current_date(),
-        research_topic=search_query,
-    )
-    
-    # Add search results to the prompt
-    analysis_prompt = f"{formatted_prompt}\n\n搜索结果：\n{search_content}\n\n请分析这些搜索结果并提供带有引用的综合摘要。请用中文回答。"
-    
-    # Use DeepSeek to analyze and summarize the search results
-    llm = ChatDeepSeek(
-        model=configurable.query_generator_model,
-        temperature=0,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-    )
-    
-    response = await llm.ainvoke(analysis_prompt)
-    
-    # Insert citation markers
-    modified_text = response.content
-    for i, source in enumerate(sources_gathered):
-        # Replace URL references with short citations
-        if source['url'] in modified_text:
-            modified_text = modified_text.replace(source['url'], source['short_url'])
-        # Also try to match domain names
-        domain = source['url'].split('/')[2] if len(source['url'].split('/')) > 2 else source['url']
-        if domain in modified_text:
-            modified_text = modified_text.replace(domain, source['short_url'])
 
-    return {
-        "sources_gathered": sources_gathered,
-        "search_query": [state["search_query"]],
-        "web_research_result": [modified_text],
-    }
+async def compact_context(state: OverallState, config: RunnableConfig):
+    """LangGraph node that ranks the research results once for all later prompts.
+
+    Splits the web research summaries into sections and ranks them by relevance
+    to the research topic and novelty. Reflection, the quality assessors and
+    the summary optimization then render this shared ranking within their own
+    token budgets instead of resending every result in full. Nothing is
+    ranked while the full results fit every budget.
+
+    Args:
+        state: Current graph state containing the web research results
+        config: Configuration for the runnable
+
+    Returns:
+        Dictionary with state update, including the context_ranking key
+    """
+    configurable = Configuration.from_runnable_config(config)
+    budgets = [
+        budget
+        for budget in (
+            configurable.reflection_token_budget,
+            configurable.assessment_token_budget,
+            configurable.summary_token_budget,
+        )
+        if budget > 0
+    ]
+    full_context = SECTION_SEPARATOR.join(state["web_research_result"])
+    if not budgets or estimate_tokens(full_context) <= min(budgets):
+        # get_research_context sends the full results without a ranking
+        return {"context_ranking": []}
+    # The ranking is CPU-bound, so keep it off the event loop
+    ranked = await asyncio.to_thread(
+        rank_sections,
+        state["web_research_result"],
+        get_research_topic(state["messages"]),
+    )
+    # Only the order is kept in state; the text stays in web_research_result
+    return {"context_ranking": section_ranking(ranked)}
 
 
 async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
@@ -274,7 +880,8 @@ async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionS
 
     Analyzes the current summary to identify areas for further research and generates
     potential follow-up queries. Uses structured output to extract
-    the follow-up query in JSON format.
+    the follow-up query in JSON format. In incremental mode only the running
+    knowledge digest and the results added since the last loop are sent.
 
     Args:
         state: Current graph state containing the running summary and research topic
@@ -288,34 +895,131 @@ async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionS
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
     reasoning_model = state.get("reasoning_model", configurable.reflection_model)
 
-    # Format the prompt
+    research_results = state["web_research_result"]
     current_date = get_current_date()
-    formatted_prompt = reflection_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
-    )
-    # init Reasoning Model
-    llm = ChatDeepSeek(
-        model=reasoning_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-    )
-    result = await llm.with_structured_output(Reflection).ainvoke(formatted_prompt)
 
+    # Straggler queries deferred by the loop that just finished
+    deferred_queries = state.get("deferred_queries") or []
+    deferred_update = {
+        "pending_deferred_queries": deferred_queries[
+            state.get("deferred_query_offset", 0) :
+        ],
+        "deferred_query_offset": len(deferred_queries),
+    }
+
+    # Deferred stragglers are only picked up by a further loop; record the
+    # ones a stopping loop leaves unused instead of dropping them silently
+    abandoned = [
+        {"query": query, "action": "abandoned"}
+        for query in deferred_update["pending_deferred_queries"]
+    ]
+    stop_update = {
+        "is_sufficient": True,
+        "knowledge_gap": "",
+        "follow_up_queries": [],
+        "research_loop_count": state["research_loop_count"],
+        "reflected_result_indices": list(range(len(research_results))),
+        "number_of_ran_queries": len(state["search_query"]),
+        "straggler_stats": abandoned,
+        **deferred_update,
+    }
+
+    # Stop the research loop once the run's token budget or time is spent
+    skipped = skip_stage("reflection", state, configurable)
+    if skipped:
+        return {**stop_update, "skipped_stages": [skipped]}
+
+    # Stop without calling the model once a loop stops turning up new material
+    novelty = measure_novelty(state)
+    if (
+        configurable.min_information_gain > 0
+        and max(novelty["new_url_ratio"], novelty["new_content_ratio"])
+        < configurable.min_information_gain
+    ):
+        return {**stop_update, "research_novelty": [{**novelty, "early_stop": True}]}
+
+    update = {"research_novelty": [{**novelty, "early_stop": False}]}
+    if configurable.incremental_reflection:
+        # Only send the digest plus the results added since the last loop, so
+        # the prompt stays roughly constant in size as loops accumulate
+        reflected = set(state.get("reflected_result_indices") or [])
+        new_results = [
+            result
+            for idx, result in enumerate(research_results)
+            if idx not in reflected
+        ]
+        formatted_prompt = incremental_reflection_instructions.format(
+            current_date=current_date,
+            research_topic=get_research_topic(state["messages"]),
+            knowledge_digest=state.get("knowledge_digest") or "（暂无）",
+            new_summaries=SECTION_SEPARATOR.join(new_results),
+        )
+        result, timed_out = await invoke_before_deadline(
+            invoke_llm(
+                configurable,
+                reasoning_model,
+                1.0,
+                formatted_prompt,
+                IncrementalReflection,
+            ),
+            state,
+            configurable,
+            "reflection",
+        )
+        if result is not None:
+            update["knowledge_digest"] = result.knowledge_digest
+    else:
+        # Format the prompt
+        formatted_prompt = reflection_instructions.format(
+            current_date=current_date,
+            research_topic=get_research_topic(state["messages"]),
+            summaries=get_research_context(state, configurable.reflection_token_budget),
+        )
+        # Run the reasoning model
+        result, timed_out = await invoke_before_deadline(
+            invoke_llm(
+                configurable, reasoning_model, 1.0, formatted_prompt, Reflection
+            ),
+            state,
+            configurable,
+            "reflection",
+        )
+    if result is None:
+        # Cut short by the deadline: research what was gathered so far
+        return {**update, **stop_update, "skipped_stages": timed_out}
+
+    # Report follow-ups that repeat queries already run; evaluate_research
+    # applies the same filter before dispatching
+    _, skipped = select_follow_up_queries(result.follow_up_queries, state, configurable)
+
+    stopping = result.is_sufficient or state[
+        "research_loop_count"
+    ] >= get_max_research_loops(state, configurable)
     return {
+        **update,
+        "straggler_stats": abandoned if stopping else [],
+        "skipped_queries": skipped,
         "is_sufficient": result.is_sufficient,
         "knowledge_gap": result.knowledge_gap,
         "follow_up_queries": result.follow_up_queries,
         "research_loop_count": state["research_loop_count"],
+        "reflected_result_indices": list(range(len(research_results))),
         "number_of_ran_queries": len(state["search_query"]),
+        **deferred_update,
     }
 
 
+# The nodes each pipeline profile runs once research is done
+QUALITY_PIPELINES = {
+    "full": ["assess_content_quality", "verify_facts", "assess_relevance"],
+    "fast": ["assess_and_optimize"],
+}
+
+
 def evaluate_research(
     state: ReflectionState,
     config: RunnableConfig,
+    profile: str = "full",
 ) -> OverallState:
     """LangGraph routing function that determines the next step in the research flow.
 
@@ -325,29 +1029,37 @@ def evaluate_research(
     Args:
         state: Current graph state containing the research loop count
         config: Configuration for the runnable, including max_research_loops setting
+        profile: The pipeline profile of the graph, which decides the quality
+            nodes research continues with
 
     Returns:
-        String literal indicating the next node to visit ("web_research" or "assess_content_quality")
+        Either Send objects for further web research, or the quality nodes of
+        the profile to run in parallel
     """
     configurable = Configuration.from_runnable_config(config)
-    max_research_loops = (
-        state.get("max_research_loops")
-        if state.get("max_research_loops") is not None
-        else configurable.max_research_loops
+    max_research_loops = get_max_research_loops(state, configurable)
+    # Skip follow-ups that were already run or nearly restate an earlier query
+    follow_up_queries, _ = select_follow_up_queries(
+        state["follow_up_queries"], state, configurable
     )
-    if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
-        return "assess_content_quality"
+    # Straggler branches of the last loop that were deferred instead of finished
+    deferred_queries = state.get("pending_deferred_queries") or []
+    queries = list(dict.fromkeys(deferred_queries + follow_up_queries))
+    if (
+        state["is_sufficient"]
+        or state["research_loop_count"] >= max_research_loops
+        or not queries
+    ):
+        # The assessors only read the research results, so fan them out in parallel
+        return QUALITY_PIPELINES[profile]
     else:
-        return [
-            Send(
-                "web_research",
-                {
-                    "search_query": follow_up_query,
-                    "id": state["number_of_ran_queries"] + int(idx),
-                },
-            )
-            for idx, follow_up_query in enumerate(state["follow_up_queries"])
-        ]
+        return fan_out_web_research(
+            queries,
+            state["number_of_ran_queries"],
+            state.get("deadline_at"),
+            is_final_loop(state, configurable),
+            resumed=deferred_queries,
+        )
 
 
 async def assess_content_quality(state: OverallState, config: RunnableConfig):
@@ -364,32 +1076,50 @@ async def assess_content_quality(state: OverallState, config: RunnableConfig):
         Dictionary with state update including content quality assessment
     """
     configurable = Configuration.from_runnable_config(config)
-    
-    # Combine all research content
-    combined_content = "\n\n---\n\n".join(state["web_research_result"])
-    
+    skipped = skip_stage("assess_content_quality", state, configurable)
+    if skipped:
+        return {
+            "content_quality": {
+                **DEFAULT_CONTENT_QUALITY,
+                "reliability_assessment": f"{SKIP_REASONS[skipped['reason']]}，未进行可靠性评估",
+            },
+            "skipped_stages": [skipped],
+        }
+
+    # Combine the research content, compacted to the assessment budget
+    combined_content = get_research_context(state, configurable.assessment_token_budget)
+
     # Format the prompt
     formatted_prompt = content_quality_instructions.format(
-        research_topic=get_research_topic(state["messages"]),
-        content=combined_content
-    )
-    
-    # Initialize DeepSeek
-    llm = ChatDeepSeek(
-        model=configurable.reflection_model,
-        temperature=0.3,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-    )
-    
-    result = await llm.with_structured_output(ContentQualityAssessment).ainvoke(formatted_prompt)
-    
+        research_topic=get_research_topic(state["messages"]), content=combined_content
+    )
+
+    # Call DeepSeek
+    result, timed_out = await invoke_before_deadline(
+        invoke_llm(
+            configurable,
+            configurable.reflection_model,
+            0.3,
+            formatted_prompt,
+            ContentQualityAssessment,
+        ),
+        state,
+        configurable,
+        "assess_content_quality",
+        configurable.assessment_timeout_seconds,
+    )
+    if result is None:
+        return {
+            "content_quality": dict(DEFAULT_CONTENT_QUALITY),
+            "skipped_stages": timed_out,
+        }
+
     return {
         "content_quality": {
             "quality_score": result.quality_score,
             "reliability_assessment": result.reliability_assessment,
             "content_gaps": result.content_gaps,
-            "improvement_suggestions": result.improvement_suggestions
+            "improvement_suggestions": result.improvement_suggestions,
         }
     }
 
@@ -408,34 +1138,51 @@ async def verify_facts(state: OverallState, config: RunnableConfig):
         Dictionary with state update including fact verification results
     """
     configurable = Configuration.from_runnable_config(config)
-    
-    # Combine all research content
-    combined_content = "\n\n---\n\n".join(state["web_research_result"])
-    
+    skipped = skip_stage("verify_facts", state, configurable)
+    if skipped:
+        return {
+            "fact_verification": dict(DEFAULT_FACT_VERIFICATION),
+            "skipped_stages": [skipped],
+        }
+
+    # Combine the research content, compacted to the assessment budget
+    combined_content = get_research_context(state, configurable.assessment_token_budget)
+
     # Format the prompt
     current_date = get_current_date()
     formatted_prompt = fact_verification_instructions.format(
         current_date=current_date,
         research_topic=get_research_topic(state["messages"]),
-        content=combined_content
-    )
-    
-    # Initialize DeepSeek
-    llm = ChatDeepSeek(
-        model=configurable.reflection_model,
-        temperature=0.1,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-    )
-    
-    result = await llm.with_structured_output(FactVerification).ainvoke(formatted_prompt)
-    
+        content=combined_content,
+    )
+
+    # Call DeepSeek
+    result, timed_out = await invoke_before_deadline(
+        invoke_llm(
+            configurable,
+            configurable.reflection_model,
+            0.1,
+            formatted_prompt,
+            FactVerification,
+            use_cache=configurable.cache_verify_facts_llm,
+        ),
+        state,
+        configurable,
+        "verify_facts",
+        configurable.assessment_timeout_seconds,
+    )
+    if result is None:
+        return {
+            "fact_verification": dict(DEFAULT_FACT_VERIFICATION),
+            "skipped_stages": timed_out,
+        }
+
     return {
         "fact_verification": {
             "verified_facts": result.verified_facts,
             "disputed_claims": result.disputed_claims,
             "verification_sources": result.verification_sources,
-            "confidence_score": result.confidence_score
+            "confidence_score": result.confidence_score,
         }
     }
 
@@ -454,32 +1201,51 @@ async def assess_relevance(state: OverallState, config: RunnableConfig):
         Dictionary with state update including relevance assessment
     """
     configurable = Configuration.from_runnable_config(config)
-    
-    # Combine all research content
-    combined_content = "\n\n---\n\n".join(state["web_research_result"])
-    
+    skipped = skip_stage("assess_relevance", state, configurable)
+    if skipped:
+        return {
+            "relevance_assessment": {
+                **DEFAULT_RELEVANCE_ASSESSMENT,
+                "content_alignment": f"{SKIP_REASONS[skipped['reason']]}，未进行相关性评估",
+            },
+            "skipped_stages": [skipped],
+        }
+
+    # Combine the research content, compacted to the assessment budget
+    combined_content = get_research_context(state, configurable.assessment_token_budget)
+
     # Format the prompt
     formatted_prompt = relevance_assessment_instructions.format(
-        research_topic=get_research_topic(state["messages"]),
-        content=combined_content
-    )
-    
-    # Initialize DeepSeek
-    llm = ChatDeepSeek(
-        model=configurable.reflection_model,
-        temperature=0.2,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-    )
-    
-    result = await llm.with_structured_output(RelevanceAssessment).ainvoke(formatted_prompt)
-    
+        research_topic=get_research_topic(state["messages"]), content=combined_content
+    )
+
+    # Call DeepSeek
+    result, timed_out = await invoke_before_deadline(
+        invoke_llm(
+            configurable,
+            configurable.reflection_model,
+            0.2,
+            formatted_prompt,
+            RelevanceAssessment,
+            use_cache=configurable.cache_assess_relevance_llm,
+        ),
+        state,
+        configurable,
+        "assess_relevance",
+        configurable.assessment_timeout_seconds,
+    )
+    if result is None:
+        return {
+            "relevance_assessment": dict(DEFAULT_RELEVANCE_ASSESSMENT),
+            "skipped_stages": timed_out,
+        }
+
     return {
         "relevance_assessment": {
             "relevance_score": result.relevance_score,
             "key_topics_covered": result.key_topics_covered,
             "missing_topics": result.missing_topics,
-            "content_alignment": result.content_alignment
+            "content_alignment": result.content_alignment,
         }
     }
 
@@ -488,7 +1254,9 @@ async def optimize_summary(state: OverallState, config: RunnableConfig):
     """LangGraph node that optimizes and enhances the research summary.
 
     Uses quality assessment, fact verification, and relevance analysis to
-    create an optimized summary with key insights and actionable items.
+    create an optimized summary with key insights and actionable items. In
+    streaming mode the summary text is streamed to the client as it is
+    generated and the insights are extracted afterwards.
 
     Args:
         state: Current graph state containing all assessment results
@@ -498,49 +1266,226 @@ async def optimize_summary(state: OverallState, config: RunnableConfig):
         Dictionary with state update including optimized summary
     """
     configurable = Configuration.from_runnable_config(config)
-    
-    # Get original summary
-    original_summary = "\n\n---\n\n".join(state["web_research_result"])
-    
-    # Format the prompt with all assessment results
-    current_date = get_current_date()
-    formatted_prompt = summary_optimization_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        original_summary=original_summary,
-        quality_assessment=str(state.get("content_quality", {})),
-        fact_verification=str(state.get("fact_verification", {})),
-        relevance_assessment=str(state.get("relevance_assessment", {}))
-    )
-    
-    # Initialize DeepSeek
-    llm = ChatDeepSeek(
-        model=configurable.answer_model,
-        temperature=0.3,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-    )
-    
-    result = await llm.with_structured_output(SummaryOptimization).ainvoke(formatted_prompt)
-    
+
     # Calculate final confidence score
     quality_score = state.get("content_quality", {}).get("quality_score", 0.5)
     fact_confidence = state.get("fact_verification", {}).get("confidence_score", 0.5)
     relevance_score = state.get("relevance_assessment", {}).get("relevance_score", 0.5)
     final_confidence = (quality_score + fact_confidence + relevance_score) / 3
-    
+
+    # finalize_answer falls back to the research results as they are
+    fallback = {
+        "summary_optimization": {},
+        "quality_enhanced_summary": "",
+        "summary_message_id": None,
+        "final_confidence_score": final_confidence,
+    }
+    skipped = skip_stage("optimize_summary", state, configurable)
+    if skipped:
+        return {**fallback, "skipped_stages": [skipped]}
+
+    # Get original summary, compacted to the summary budget
+    original_summary = get_research_context(state, configurable.summary_token_budget)
+
+    # Format the prompt with all assessment results
+    current_date = get_current_date()
+    prompt_values = {
+        "current_date": current_date,
+        "research_topic": get_research_topic(state["messages"]),
+        "original_summary": original_summary,
+        "quality_assessment": str(state.get("content_quality", {})),
+        "fact_verification": str(state.get("fact_verification", {})),
+        "relevance_assessment": str(state.get("relevance_assessment", {})),
+    }
+
+    async def optimize():
+        if configurable.stream_summary:
+            # Stream the report text first so clients can render it token by token,
+            # then extract the insights from it in a small call kept off the stream
+            message = await stream_llm(
+                configurable,
+                configurable.answer_model,
+                0.3,
+                summary_streaming_instructions.format(**prompt_values),
+            )
+            insights = await invoke_llm(
+                configurable,
+                configurable.answer_model,
+                0.3,
+                summary_insights_instructions.format(
+                    research_topic=prompt_values["research_topic"],
+                    optimized_summary=message.content,
+                ),
+                SummaryInsights,
+                tags=[TAG_NOSTREAM],
+            )
+            result = SummaryOptimization(
+                optimized_summary=message.content, **insights.model_dump()
+            )
+            summary_message_id = message.id
+        else:
+            # Call DeepSeek
+            result = await invoke_llm(
+                configurable,
+                configurable.answer_model,
+                0.3,
+                summary_optimization_instructions.format(**prompt_values),
+                SummaryOptimization,
+            )
+            summary_message_id = None
+        return result, summary_message_id
+
+    optimized, timed_out = await invoke_before_deadline(
+        optimize(), state, configurable, "optimize_summary"
+    )
+    if optimized is None:
+        return {**fallback, "skipped_stages": timed_out}
+    result, summary_message_id = optimized
+
+    return {
+        "summary_optimization": {
+            "optimized_summary": result.optimized_summary,
+            "key_insights": result.key_insights,
+            "actionable_items": result.actionable_items,
+            "confidence_level": result.confidence_level,
+        },
+        "quality_enhanced_summary": result.optimized_summary,
+        "summary_message_id": summary_message_id,
+        "final_confidence_score": final_confidence,
+    }
+
+
+async def assess_and_optimize(state: OverallState, config: RunnableConfig):
+    """LangGraph node that assesses the research and optimizes the summary in one call.
+
+    Used by the 'fast' pipeline profile in place of the three assessors and
+    optimize_summary. A single structured call returns all of their results,
+    which are written to the same state keys, so the verification report and
+    the final answer are built as in the full pipeline. The research content
+    is sent once, within the summary token budget.
+
+    Args:
+        state: Current graph state containing web research results
+        config: Configuration for the runnable
+
+    Returns:
+        Dictionary with state update including the assessments and optimized summary
+    """
+    configurable = Configuration.from_runnable_config(config)
+
+    # finalize_answer falls back to the research results as they are
+    fallback = {
+        "content_quality": dict(DEFAULT_CONTENT_QUALITY),
+        "fact_verification": dict(DEFAULT_FACT_VERIFICATION),
+        "relevance_assessment": dict(DEFAULT_RELEVANCE_ASSESSMENT),
+        "summary_optimization": {},
+        "quality_enhanced_summary": "",
+        "summary_message_id": None,
+        "final_confidence_score": 0.5,
+    }
+    skipped = skip_stage("assess_and_optimize", state, configurable)
+    if skipped:
+        return {**fallback, "skipped_stages": [skipped]}
+
+    formatted_prompt = combined_quality_instructions.format(
+        current_date=get_current_date(),
+        research_topic=get_research_topic(state["messages"]),
+        content=get_research_context(state, configurable.summary_token_budget),
+    )
+    result, timed_out = await invoke_before_deadline(
+        invoke_llm(
+            configurable,
+            configurable.answer_model,
+            0.2,
+            formatted_prompt,
+            CombinedQualityAssessment,
+        ),
+        state,
+        configurable,
+        "assess_and_optimize",
+    )
+    if result is None:
+        return {**fallback, "skipped_stages": timed_out}
+
     return {
+        "content_quality": {
+            "quality_score": result.quality_score,
+            "reliability_assessment": result.reliability_assessment,
+            "content_gaps": result.content_gaps,
+            "improvement_suggestions": result.improvement_suggestions,
+        },
+        "fact_verification": {
+            "verified_facts": result.verified_facts,
+            "disputed_claims": result.disputed_claims,
+            "verification_sources": result.verification_sources,
+            "confidence_score": result.confidence_score,
+        },
+        "relevance_assessment": {
+            "relevance_score": result.relevance_score,
+            "key_topics_covered": result.key_topics_covered,
+            "missing_topics": result.missing_topics,
+            "content_alignment": result.content_alignment,
+        },
         "summary_optimization": {
             "optimized_summary": result.optimized_summary,
             "key_insights": result.key_insights,
             "actionable_items": result.actionable_items,
-            "confidence_level": result.confidence_level
+            "confidence_level": result.confidence_level,
         },
         "quality_enhanced_summary": result.optimized_summary,
-        "final_confidence_score": final_confidence
+        "summary_message_id": None,
+        "final_confidence_score": (
+            result.quality_score + result.confidence_score + result.relevance_score
+        )
+        / 3,
     }
 
 
+def format_skipped_stages(state: OverallState) -> str:
+    """List the stages a run skipped, with the reason each was skipped for."""
+    skipped = run_skipped_stages(state)
+    if not skipped:
+        return "无"
+    # Every web_research branch cut off by the deadline records its own entry
+    counts = Counter((entry["stage"], entry["reason"]) for entry in skipped)
+    return ", ".join(
+        f"{stage}（{SKIP_REASONS.get(reason, reason)}）"
+        + (f" ×{count}" if count > 1 else "")
+        for (stage, reason), count in counts.items()
+    )
+
+
+def format_deadline(state: OverallState, configurable: Configuration) -> str:
+    """Describe the run's deadline for the verification report."""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return "未设置"
+    return f"{configurable.deadline_seconds:g} 秒（生成报告时剩余 {max(remaining, 0.0):.1f} 秒）"
+
+
+def format_usage_report(state: OverallState, configurable: Configuration) -> str:
+    """Render the token usage and estimated cost section of the verification report."""
+    usage = summarize_usage(run_token_usage(state), configurable.model_prices)
+    budget = (
+        f"{usage['total_tokens']}/{configurable.token_budget}"
+        if configurable.token_budget > 0
+        else "未设置"
+    )
+    section = f"""## 资源消耗
+- Token 用量: {usage["total_tokens"]}（输入 {usage["input_tokens"]}，其中缓存命中 {usage["cached_input_tokens"]}；输出 {usage["output_tokens"]}）
+- LLM 调用次数: {usage["calls"]}
+- 估算成本: {format_cost(usage["cost"])}
+- Token 预算: {budget}
+- 运行时限: {format_deadline(state, configurable)}
+- 跳过的环节: {format_skipped_stages(state)}
+"""
+    for model, totals in usage["by_model"].items():
+        section += f"- 模型 {model}: {totals['total_tokens']} tokens，{totals['calls']} 次调用，{format_cost(totals['cost'])}\n"
+    for node, totals in usage["by_node"].items():
+        section += f"- 节点 {node}: {totals['total_tokens']} tokens，{totals['calls']} 次调用，{format_cost(totals['cost'])}\n"
+    return section
+
+
 async def generate_verification_report(state: OverallState, config: RunnableConfig):
     """LangGraph node that generates a comprehensive verification report.
 
@@ -554,44 +1499,45 @@ async def generate_verification_report(state: OverallState, config: RunnableConf
     Returns:
         Dictionary with state update including verification report
     """
+    configurable = Configuration.from_runnable_config(config)
+
     # Generate comprehensive verification report
     quality_data = state.get("content_quality", {})
     fact_data = state.get("fact_verification", {})
     relevance_data = state.get("relevance_assessment", {})
     optimization_data = state.get("summary_optimization", {})
-    
+
     report = f"""# 研究质量验证报告
 
 ## 内容质量评估
-- 质量评分: {quality_data.get('quality_score', 'N/A')}/1.0
-- 可靠性评估: {quality_data.get('reliability_assessment', 'N/A')}
-- 内容空白: {', '.join(quality_data.get('content_gaps', []))}
-- 改进建议: {', '.join(quality_data.get('improvement_suggestions', []))}
+- 质量评分: {quality_data.get("quality_score", "N/A")}/1.0
+- 可靠性评估: {quality_data.get("reliability_assessment", "N/A")}
+- 内容空白: {", ".join(quality_data.get("content_gaps", []))}
+- 改进建议: {", ".join(quality_data.get("improvement_suggestions", []))}
 
 ## 事实验证结果
-- 验证置信度: {fact_data.get('confidence_score', 'N/A')}/1.0
-- 已验证事实数量: {len(fact_data.get('verified_facts', []))}
-- 争议声明数量: {len(fact_data.get('disputed_claims', []))}
-- 验证来源: {', '.join(fact_data.get('verification_sources', []))}
+- 验证置信度: {fact_data.get("confidence_score", "N/A")}/1.0
+- 已验证事实数量: {len(fact_data.get("verified_facts", []))}
+- 争议声明数量: {len(fact_data.get("disputed_claims", []))}
+- 验证来源: {", ".join(fact_data.get("verification_sources", []))}
 
 ## 相关性评估
-- 相关性评分: {relevance_data.get('relevance_score', 'N/A')}/1.0
-- 已覆盖关键主题: {', '.join(relevance_data.get('key_topics_covered', []))}
-- 缺失主题: {', '.join(relevance_data.get('missing_topics', []))}
-- 内容一致性: {relevance_data.get('content_alignment', 'N/A')}
+- 相关性评分: {relevance_data.get("relevance_score", "N/A")}/1.0
+- 已覆盖关键主题: {", ".join(relevance_data.get("key_topics_covered", []))}
+- 缺失主题: {", ".join(relevance_data.get("missing_topics", []))}
+- 内容一致性: {relevance_data.get("content_alignment", "N/A")}
 
 ## 摘要优化结果
-- 置信度等级: {optimization_data.get('confidence_level', 'N/A')}
-- 关键洞察数量: {len(optimization_data.get('key_insights', []))}
-- 可行建议数量: {len(optimization_data.get('actionable_items', []))}
+- 置信度等级: {optimization_data.get("confidence_level", "N/A")}
+- 关键洞察数量: {len(optimization_data.get("key_insights", []))}
+- 可行建议数量: {len(optimization_data.get("actionable_items", []))}
 
 ## 综合评估
-- 最终置信度评分: {state.get('final_confidence_score', 'N/A'):.3f}/1.0
-"""
-    
-    return {
-        "verification_report": report
-    }
+- 最终置信度评分: {state.get("final_confidence_score", "N/A"):.3f}/1.0
+
+{format_usage_report(state, configurable)}"""
+
+    return {"verification_report": report}
 
 
 async def finalize_answer(state: OverallState, config: RunnableConfig):
@@ -602,85 +1548,147 @@ async def finalize_answer(state: OverallState, config: RunnableConfig):
 
     Args:
         state: Current graph state containing the enhanced summary and all assessment results
+        config: Configuration for the runnable, providing the model price table
 
     Returns:
         Dictionary with state update, including the final enhanced message with sources
     """
+    configurable = Configuration.from_runnable_config(config)
+
     # Use the optimized summary if available, otherwise fall back to original
-    final_summary = state.get("quality_enhanced_summary") or "\n---\n\n".join(state["web_research_result"])
+    final_summary = state.get("quality_enhanced_summary") or "\n---\n\n".join(
+        state["web_research_result"]
+    )
     verification_report = state.get("verification_report", "")
-    
+
     # Combine the enhanced summary with verification report
     enhanced_content = f"""{final_summary}
 
 ---
 
 {verification_report}"""
-    
-    # Replace the short urls with the original urls and add all used urls to the sources_gathered
-    unique_sources = []
-    for source in state["sources_gathered"]:
-        if source["short_url"] in enhanced_content:
-            enhanced_content = enhanced_content.replace(
-                source["short_url"], source["value"]
-            )
-            unique_sources.append(source)
-    
+
+    # Replace the citation markers with the original urls in one pass and keep
+    # the sources that are actually cited
+    registry = CitationRegistry(state["sources_gathered"])
+    enhanced_content, unique_sources = registry.resolve_markers(enhanced_content)
+
     # Add quality metrics to the final message
-    quality_metrics = f"\n\n## 研究质量指标\n"
-    quality_metrics += f"- 最终置信度: {state.get('final_confidence_score', 0):.3f}/1.0\n"
+    quality_metrics = "\n\n## 研究质量指标\n"
+    quality_metrics += (
+        f"- 最终置信度: {state.get('final_confidence_score', 0):.3f}/1.0\n"
+    )
     quality_metrics += f"- 内容质量评分: {state.get('content_quality', {}).get('quality_score', 'N/A')}/1.0\n"
     quality_metrics += f"- 事实验证置信度: {state.get('fact_verification', {}).get('confidence_score', 'N/A')}/1.0\n"
     quality_metrics += f"- 相关性评分: {state.get('relevance_assessment', {}).get('relevance_score', 'N/A')}/1.0\n"
-    
+    usage = summarize_usage(run_token_usage(state), configurable.model_prices)
+    quality_metrics += f"- Token 用量: {usage['total_tokens']}（输入 {usage['input_tokens']} / 输出 {usage['output_tokens']}）\n"
+    quality_metrics += f"- 估算成本: {format_cost(usage['cost'])}\n"
+    if run_skipped_stages(state):
+        quality_metrics += f"- 跳过的环节: {format_skipped_stages(state)}\n"
+
     final_content = enhanced_content + quality_metrics
 
+    # Reuse the id of the streamed summary so clients replace it with the final answer
     return {
-        "messages": [AIMessage(content=final_content)],
+        "messages": [
+            AIMessage(content=final_content, id=state.get("summary_message_id"))
+        ],
         "sources_gathered": unique_sources,
     }
 
 
-# Create our Agent Graph
-builder = StateGraph(OverallState, config_schema=Configuration)
-
-# Define the nodes we will cycle between
-builder.add_node("generate_query", generate_query)
-builder.add_node("wait_for_user_confirmation", wait_for_user_confirmation)
-builder.add_node("web_research", web_research)
-builder.add_node("reflection", reflection)
-# Add new quality enhancement nodes
-builder.add_node("assess_content_quality", assess_content_quality)
-builder.add_node("verify_facts", verify_facts)
-builder.add_node("assess_relevance", assess_relevance)
-builder.add_node("optimize_summary", optimize_summary)
-builder.add_node("generate_verification_report", generate_verification_report)
-builder.add_node("finalize_answer", finalize_answer)
-
-# Set the entrypoint as `generate_query`
-# This means that this node is the first one called
-builder.add_edge(START, "generate_query")
-# Add conditional edge to check if we need user confirmation
-builder.add_conditional_edges(
-    "generate_query", should_wait_for_confirmation, ["wait_for_user_confirmation", "web_research"]
-)
-# After user confirmation, proceed to web research
-builder.add_conditional_edges(
-    "wait_for_user_confirmation", continue_to_web_research, ["web_research"]
-)
-# Reflect on the web research
-builder.add_edge("web_research", "reflection")
-# Evaluate the research
-builder.add_conditional_edges(
-    "reflection", evaluate_research, ["web_research", "assess_content_quality"]
-)
-# Quality enhancement pipeline
-builder.add_edge("assess_content_quality", "verify_facts")
-builder.add_edge("verify_facts", "assess_relevance")
-builder.add_edge("assess_relevance", "optimize_summary")
-builder.add_edge("optimize_summary", "generate_verification_report")
-builder.add_edge("generate_verification_report", "finalize_answer")
-# Finalize the answer
-builder.add_edge("finalize_answer", END)
-
-graph = builder.compile(name="enhanced-pro-search-agent")
+def traced(node):
+    """Wrap a node so it is timed for /metrics and its LLM usage is accounted."""
+    return instrument_node(track_usage(node))
+
+
+def build_graph(profile: str = "full") -> StateGraph:
+    """Build the agent graph with the quality pipeline of a pipeline profile.
+
+    Args:
+        profile: "full" assesses the research in three parallel calls and then
+            optimizes the summary; "fast" does both in one assess_and_optimize call
+
+    Returns:
+        The uncompiled graph, to compile with or without a checkpointer
+    """
+    builder = StateGraph(OverallState, config_schema=Configuration)
+
+    # Define the nodes we will cycle between
+    builder.add_node("generate_query", traced(generate_query))
+    builder.add_node("wait_for_user_confirmation", traced(wait_for_user_confirmation))
+    builder.add_node("web_research", traced(web_research))
+    builder.add_node("compact_context", traced(compact_context))
+    builder.add_node("reflection", traced(reflection))
+    if profile == "fast":
+        builder.add_node("assess_and_optimize", traced(assess_and_optimize))
+    else:
+        # Add new quality enhancement nodes
+        builder.add_node("assess_content_quality", traced(assess_content_quality))
+        builder.add_node("verify_facts", traced(verify_facts))
+        builder.add_node("assess_relevance", traced(assess_relevance))
+        builder.add_node("optimize_summary", traced(optimize_summary))
+    builder.add_node(
+        "generate_verification_report", traced(generate_verification_report)
+    )
+    builder.add_node("finalize_answer", traced(finalize_answer))
+
+    # Set the entrypoint as `generate_query`
+    # This means that this node is the first one called
+    builder.add_edge(START, "generate_query")
+    # Add conditional edge to check if we need user confirmation
+    builder.add_conditional_edges(
+        "generate_query",
+        should_wait_for_confirmation,
+        ["wait_for_user_confirmation", "web_research"],
+    )
+    # After user confirmation, proceed to web research
+    builder.add_conditional_edges(
+        "wait_for_user_confirmation", continue_to_web_research, ["web_research", END]
+    )
+    # Compact the research results, then reflect on them
+    builder.add_edge("web_research", "compact_context")
+    builder.add_edge("compact_context", "reflection")
+
+    # Evaluate the research
+    def route_research(state: ReflectionState, config: RunnableConfig):
+        return evaluate_research(state, config, profile)
+
+    builder.add_conditional_edges(
+        "reflection", route_research, ["web_research", *QUALITY_PIPELINES[profile]]
+    )
+    if profile == "fast":
+        builder.add_edge("assess_and_optimize", "generate_verification_report")
+    else:
+        # Quality enhancement pipeline: the three assessors run in parallel and join
+        # before the summary optimization
+        builder.add_edge(QUALITY_PIPELINES["full"], "optimize_summary")
+        builder.add_edge("optimize_summary", "generate_verification_report")
+    builder.add_edge("generate_verification_report", "finalize_answer")
+    # Finalize the answer
+    builder.add_edge("finalize_answer", END)
+    return builder
+
+
+# Create our Agent Graph, and precompile one per pipeline profile
+builder = build_graph("full")
+graphs = {
+    "full": builder.compile(name="enhanced-pro-search-agent"),
+    "fast": build_graph("fast").compile(name="enhanced-pro-search-agent-fast"),
+}
+graph = graphs["full"]
+
+
+def make_graph(config: RunnableConfig):
+    """Return the precompiled graph of the pipeline profile a run is configured with.
+
+    Registered in langgraph.json, so the server picks the graph per run from
+    ``pipeline_profile``.
+    """
+    profile = Configuration.from_runnable_config(config).pipeline_profile
+    if profile not in graphs:
+        raise ValueError(
+            f"Unknown pipeline_profile '{profile}', expected one of: {', '.join(graphs)}"
+        )
+    return graphs[profile]
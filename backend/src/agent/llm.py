@@ -0,0 +1,266 @@
+"""Pooled DeepSeek chat models with caching, rate limiting and usage tracking."""
+
+import asyncio
+import json
+import weakref
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple, Type
+
+import httpx
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable
+from langchain_deepseek import ChatDeepSeek
+from pydantic import BaseModel
+
+from agent.cache import get_cache, make_llm_key
+from agent.configuration import Configuration
+from agent.metrics import record_token_usage
+from agent.prompts import get_current_date
+from agent.providers import deepseek_api_key, make_http_client
+from agent.rate_limit import call_with_limits
+from agent.usage import record_usage
+
+
+class ClientPool:
+    """A pooled async HTTP transport plus the chat models that share it.
+
+    In record and replay mode the transport records DeepSeek responses to,
+    or serves them from, the fixture store.
+    """
+
+    def __init__(self, limits: httpx.Limits, configurable: Configuration):
+        """Create the pool's HTTP client, whose connections are capped by ``limits``."""
+        self.limits = limits
+        self.api_key = deepseek_api_key(configurable)
+        self.http_client = make_http_client("deepseek", configurable, limits)
+        self.models: Dict[Tuple[Any, ...], Runnable] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, model: str, temperature: float, schema: Type[BaseModel] | None
+    ) -> Runnable:
+        """Return the pooled chat model for a model, temperature and output schema."""
+        key = (model, temperature, schema)
+        runnable = self.models.get(key)
+        if runnable is not None:
+            self.hits += 1
+            return runnable
+
+        self.misses += 1
+        llm = ChatDeepSeek(
+            model=model,
+            temperature=temperature,
+            # Retries are left to call_with_limits, which backs off per provider
+            max_retries=0,
+            # Report token usage for streamed completions too
+            stream_usage=True,
+            api_key=self.api_key,
+            http_async_client=self.http_client,
+        )
+        # Structured calls keep the raw message so its token usage can be recorded
+        runnable = (
+            llm.with_structured_output(schema, include_raw=True)
+            if schema is not None
+            else llm
+        )
+        self.models[key] = runnable
+        return runnable
+
+    def stats(self) -> Dict[str, Any]:
+        """Return model reuse counts and the state of the connection pool."""
+        # httpcore does not expose pool statistics publicly, so read them defensively
+        transport = getattr(self.http_client, "_transport", None)
+        connections = list(
+            getattr(getattr(transport, "_pool", None), "connections", [])
+        )
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "clients": len(self.models),
+            "client_hits": self.hits,
+            "client_misses": self.misses,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+        }
+
+
+# An httpx.AsyncClient is bound to the event loop that opened its connections,
+# so the registry keeps one pool per running loop.
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Any, ...], ClientPool]]" = weakref.WeakKeyDictionary()
+
+
+def _get_pool(configurable: Configuration) -> ClientPool:
+    limits = httpx.Limits(
+        max_connections=configurable.llm_max_connections,
+        max_keepalive_connections=configurable.llm_max_keepalive_connections,
+        keepalive_expiry=configurable.llm_keepalive_expiry,
+    )
+    loop_pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    key = (
+        limits.max_connections,
+        limits.max_keepalive_connections,
+        limits.keepalive_expiry,
+        configurable.provider_mode,
+        configurable.provider_fixture_path,
+        configurable.replay_latency,
+    )
+    if key not in loop_pools:
+        loop_pools[key] = ClientPool(limits, configurable)
+    return loop_pools[key]
+
+
+def get_chat_model(
+    configurable: Configuration,
+    model: str,
+    temperature: float,
+    schema: Type[BaseModel] | None = None,
+) -> Runnable:
+    """Return the shared DeepSeek client for (model, temperature, schema).
+
+    Clients are created once per process and event loop and reuse a single
+    pooled HTTP transport, so repeated calls keep their connections alive
+    instead of opening a new TLS session per request.
+
+    Args:
+        configurable: The run configuration, providing the connection limits
+        model: The DeepSeek model name
+        temperature: Sampling temperature
+        schema: Optional pydantic model for structured output
+
+    Returns:
+        The chat model, or when a schema is given the model bound to it,
+        returning ``{"raw", "parsed", "parsing_error"}``
+    """
+    return _get_pool(configurable).get(model, temperature, schema)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return statistics for every client pool in this process."""
+    stats = []
+    for loop_pools in list(_pools.values()):
+        stats.extend(pool.stats() for pool in loop_pools.values())
+    return {"pools": stats}
+
+
+def _seconds_until_midnight() -> float:
+    now = datetime.now()
+    midnight = (now + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return (midnight - now).total_seconds()
+
+
+def _response_cache_key(
+    model: str, temperature: float, prompt: str, schema: Type[BaseModel] | None
+) -> str:
+    # Prompts embed get_current_date(); hash it as a placeholder so the key only
+    # depends on the actual content. Entries expire at midnight (see invoke_llm),
+    # so a cached answer is never served under a different date.
+    normalized_prompt = prompt.replace(get_current_date(), "{current_date}")
+    schema_json = (
+        json.dumps(schema.model_json_schema(), sort_keys=True)
+        if schema is not None
+        else ""
+    )
+    return make_llm_key(model, temperature, normalized_prompt, schema_json)
+
+
+async def invoke_llm(
+    configurable: Configuration,
+    model: str,
+    temperature: float,
+    prompt: str,
+    schema: Type[BaseModel] | None = None,
+    use_cache: bool = False,
+    tags: List[str] | None = None,
+) -> Any:
+    """Invoke a shared DeepSeek client, optionally through the response cache.
+
+    Calls that reach DeepSeek go through the provider's rate limiter.
+
+    With ``use_cache`` the response is looked up by a hash of the model,
+    temperature, prompt and schema. Structured results are stored as their
+    pydantic dump and validated back into ``schema`` on a hit; plain chat
+    responses are returned as an ``AIMessage``.
+
+    Args:
+        configurable: The run configuration
+        model: The DeepSeek model name
+        temperature: Sampling temperature
+        prompt: The fully formatted prompt
+        schema: Optional pydantic model for structured output
+        use_cache: Whether this call may be served from the response cache
+        tags: Optional run tags, e.g. TAG_NOSTREAM to hide the call from the
+            LangGraph messages stream
+
+    Returns:
+        The parsed ``schema`` instance, or the model's ``AIMessage``
+    """
+    llm = get_chat_model(configurable, model, temperature, schema)
+    run_config = {"tags": tags} if tags else None
+
+    async def call():
+        result = await llm.ainvoke(prompt, config=run_config)
+        message = result if schema is None else result["raw"]
+        record_token_usage(model, message.usage_metadata)
+        record_usage(model, message.usage_metadata)
+        if schema is None:
+            return result
+        if result["parsing_error"] is not None:
+            raise result["parsing_error"]
+        return result["parsed"]
+
+    if not use_cache or configurable.llm_cache_ttl_seconds <= 0:
+        return await call_with_limits("deepseek", configurable, call)
+
+    cache = get_cache(
+        "llm",
+        max_entries=configurable.llm_cache_max_entries,
+        ttl_seconds=configurable.llm_cache_ttl_seconds,
+        sqlite_path=configurable.llm_cache_path,
+    )
+    key = _response_cache_key(model, temperature, prompt, schema)
+    cached = await cache.aget(key)
+    if cached is not None:
+        if schema is not None:
+            return schema.model_validate(cached)
+        return AIMessage(content=cached)
+
+    result = await call_with_limits("deepseek", configurable, call)
+    value = result.model_dump() if schema is not None else result.content
+    ttl = min(configurable.llm_cache_ttl_seconds, _seconds_until_midnight())
+    await cache.aset(key, value, ttl_seconds=ttl)
+    return result
+
+
+async def stream_llm(
+    configurable: Configuration, model: str, temperature: float, prompt: str
+) -> AIMessageChunk:
+    """Stream a plain-text completion from a shared DeepSeek client.
+
+    Inside a graph run the tokens reach the LangGraph ``messages`` stream as
+    they are generated, so clients can render the text progressively.
+
+    Returns:
+        The aggregated message; its ``id`` is the id the streamed tokens carried
+    """
+    llm = get_chat_model(configurable, model, temperature)
+    message = None
+
+    async def call():
+        nonlocal message
+        async for chunk in llm.astream(prompt):
+            message = chunk if message is None else message + chunk
+        if message is not None:
+            record_token_usage(model, message.usage_metadata)
+            record_usage(model, message.usage_metadata)
+        return message
+
+    # Only retry while no tokens have been streamed to the client yet
+    return await call_with_limits(
+        "deepseek", configurable, call, lambda: message is None
+    )
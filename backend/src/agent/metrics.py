@@ -0,0 +1,264 @@
+"""Prometheus metrics for node latency, provider calls, token usage and caches."""
+
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from langgraph.errors import GraphBubbleUp
+
+from agent.utils import warn_once
+
+# Upper bounds in seconds; provider calls run from milliseconds (cache-warm
+# searches) to minutes (long reasoning completions)
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+        + "}"
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        """Create a counter whose samples are labelled with ``labels``."""
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """Add ``amount`` to the value of a label combination."""
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        """Return one sample per label combination."""
+        return [
+            (self.name, dict(zip(self.labels, key)), value)
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """Create a histogram counting observations into ``buckets``, upper bounds in seconds."""
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: per-bucket counts (the last one is +Inf), sum
+        self._values: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Count an observation for a label combination."""
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> List[Sample]:
+        """Return the bucket, sum and count samples per label combination."""
+        samples = []
+        for key, (counts, total) in self._values.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        {**labels, "le": _format_value(bound)},
+                        cumulative,
+                    )
+                )
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format.
+
+    Besides the counters and histograms updated as the graph runs, collectors
+    are called at scrape time to export the statistics other modules already
+    keep, such as cache hit counts and limiter queue depths.
+    """
+
+    def __init__(self):
+        """Create an empty registry."""
+        self.enabled = True
+        self._metrics: List[Any] = []
+        self._collectors: List[
+            Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+        ] = []
+
+    def counter(
+        self, name: str, description: str, labels: Iterable[str] = ()
+    ) -> Counter:
+        """Create and register a counter."""
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, description: str, labels: Iterable[str] = ()
+    ) -> Histogram:
+        """Create and register a histogram."""
+        metric = Histogram(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(
+        self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+    ) -> None:
+        """Register a function returning ``(name, type, description, samples)`` families."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric and collected family in the Prometheus text format."""
+        families = [(m.name, m.kind, m.description, m.samples()) for m in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                warn_once(
+                    f"collector:{getattr(collector, '__qualname__', collector)}",
+                    f"metrics collector failed: {e}",
+                )
+        lines = []
+        for name, kind, description, samples in families:
+            lines.append(f"# HELP {name} {_escape(description)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(
+                    f"{sample_name}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+node_duration = registry.histogram(
+    "agent_node_duration_seconds",
+    "Duration of graph node executions.",
+    ("node", "status"),
+)
+provider_call_duration = registry.histogram(
+    "agent_provider_call_duration_seconds",
+    "Duration of single Tavily and DeepSeek call attempts, excluding rate limit waits.",
+    ("provider", "status"),
+)
+llm_tokens = registry.counter(
+    "agent_llm_tokens_total",
+    "Tokens reported by DeepSeek responses.",
+    ("model", "type"),
+)
+
+
+def _status(exc: BaseException | None) -> str:
+    if exc is None:
+        return "ok"
+    if isinstance(exc, GraphBubbleUp):
+        # interrupt() and parent commands unwind through the node by design
+        return "interrupted"
+    if isinstance(exc, asyncio.CancelledError):
+        return "cancelled"
+    return "error"
+
+
+def instrument_node(func: Callable, name: str | None = None) -> Callable:
+    """Wrap an async graph node so its executions are timed by status.
+
+    The wrapper keeps the node's signature, so LangGraph still passes the
+    run config to nodes that accept one.
+
+    Args:
+        func: The node function
+        name: The node name used as label, the function name by default
+    """
+    name = name or func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if not registry.enabled:
+            return await func(*args, **kwargs)
+        started = time.perf_counter()
+        error = None
+        try:
+            return await func(*args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            node_duration.observe(time.perf_counter() - started, name, _status(error))
+
+    return wrapper
+
+
+def observe_provider_call(
+    provider: str, seconds: float, error: BaseException | None = None
+) -> None:
+    """Record the duration and outcome of one provider call attempt."""
+    if registry.enabled:
+        provider_call_duration.observe(seconds, provider, _status(error))
+
+
+def record_token_usage(model: str, usage: Dict[str, Any] | None) -> None:
+    """Count the prompt and completion tokens of an LLM response's usage metadata."""
+    if registry.enabled and usage:
+        llm_tokens.inc(model, "prompt", amount=usage.get("input_tokens", 0))
+        llm_tokens.inc(model, "completion", amount=usage.get("output_tokens", 0))
+
+
+def render_metrics() -> str:
+    """Return every metric of this process in the Prometheus text format."""
+    return registry.render()
@@ -0,0 +1,162 @@
+"""Speculative research of generated queries while the user reviews them."""
+
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from agent.utils import normalize_query
+
+# Threads whose prefetches are kept; the least recently used thread is dropped first
+MAX_PREFETCH_THREADS = 256
+
+
+class PrefetchStore:
+    """Per-thread store of speculative research tasks, keyed by normalized query.
+
+    Tasks run detached from the graph run that started them, so they survive
+    the run being stopped while the user reviews the generated queries, and are
+    only cancelled explicitly, when their query is dropped, or once stale.
+    """
+
+    def __init__(self, max_threads: int = MAX_PREFETCH_THREADS):
+        """Create a store keeping the prefetches of up to ``max_threads`` threads."""
+        self.max_threads = max_threads
+        self._threads: OrderedDict[str, Dict[str, Dict[str, Any]]] = OrderedDict()
+        self._stats = {"started": 0, "reused": 0, "cancelled": 0, "failed": 0}
+
+    def start(
+        self,
+        thread_id: str,
+        queries: Iterable[str],
+        factory: Callable[[str], Awaitable[Any]],
+        max_queries: int,
+        ttl_seconds: float,
+    ) -> int:
+        """Start prefetching the given queries, skipping those already in flight.
+
+        Args:
+            thread_id: The thread the queries were generated for
+            queries: The generated search queries
+            factory: Builds the coroutine that researches one query
+            max_queries: Cap on the prefetches a thread may hold at once
+            ttl_seconds: How long an unused prefetch stays valid
+
+        Returns:
+            The number of prefetches started by this call
+        """
+        self._purge(thread_id, ttl_seconds)
+        entries = self._threads.setdefault(thread_id, {})
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            _, evicted = self._threads.popitem(last=False)
+            self._cancel_entries(evicted.values())
+
+        started = 0
+        for query in queries:
+            key = normalize_query(query)
+            if key in entries:
+                continue
+            if len(entries) >= max_queries:
+                break
+            # Run in an empty context so the task neither reports to nor is
+            # cancelled with the graph run that started it
+            task = asyncio.create_task(factory(query), context=contextvars.Context())
+            task.add_done_callback(self._record_failure)
+            entries[key] = {"task": task, "created_at": time.time()}
+            started += 1
+        self._stats["started"] += started
+        return started
+
+    def get(
+        self, thread_id: str | None, query: str, ttl_seconds: float
+    ) -> Optional["asyncio.Task"]:
+        """Return the prefetch task for a query, or None when there is none."""
+        if not thread_id or thread_id not in self._threads:
+            return None
+        self._purge(thread_id, ttl_seconds)
+        entry = self._threads.get(thread_id, {}).get(normalize_query(query))
+        if entry is None or entry["task"].cancelled():
+            return None
+        self._stats["reused"] += 1
+        return entry["task"]
+
+    def discard(self, thread_id: str | None, query: str, task: "asyncio.Task") -> None:
+        """Forget a query's prefetch once a run has used its result, so it is used only once.
+
+        A prefetched update carries the token usage of producing it, which
+        must be charged to one run only.
+        """
+        entries = self._threads.get(thread_id) if thread_id else None
+        key = normalize_query(query)
+        if entries and key in entries and entries[key]["task"] is task:
+            del entries[key]
+
+    def adopt(self, thread_id: str, query: str, task: "asyncio.Task") -> None:
+        """Hand a running research task to later runs of the thread, e.g. a straggler."""
+        entries = self._threads.setdefault(thread_id, {})
+        self._threads.move_to_end(thread_id)
+        task.add_done_callback(self._record_failure)
+        entries[normalize_query(query)] = {"task": task, "created_at": time.time()}
+
+    def retain(self, thread_id: str | None, queries: Iterable[str]) -> None:
+        """Cancel the prefetches of a thread whose queries are not in ``queries``."""
+        entries = self._threads.get(thread_id) if thread_id else None
+        if not entries:
+            return
+        keep = {normalize_query(query) for query in queries}
+        dropped = [key for key in entries if key not in keep]
+        self._cancel_entries(entries.pop(key) for key in dropped)
+
+    def cancel(self, thread_id: str | None) -> None:
+        """Cancel and forget every prefetch of a thread."""
+        entries = self._threads.pop(thread_id, None) if thread_id else None
+        if entries:
+            self._cancel_entries(entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return prefetch counters and the number of prefetches held."""
+        return {
+            **self._stats,
+            "threads": len(self._threads),
+            "pending": sum(
+                1
+                for entries in self._threads.values()
+                for entry in entries.values()
+                if not entry["task"].done()
+            ),
+        }
+
+    def _purge(self, thread_id: str, ttl_seconds: float) -> None:
+        entries = self._threads.get(thread_id)
+        if not entries:
+            return
+        cutoff = time.time() - ttl_seconds
+        stale = [key for key, entry in entries.items() if entry["created_at"] < cutoff]
+        self._cancel_entries(entries.pop(key) for key in stale)
+
+    def _cancel_entries(self, entries: Iterable[Dict[str, Any]]) -> None:
+        for entry in entries:
+            if not entry["task"].done():
+                entry["task"].cancel()
+                self._stats["cancelled"] += 1
+
+    def _record_failure(self, task: "asyncio.Task") -> None:
+        # Retrieve the exception so a failed prefetch is not reported as unhandled;
+        # the branch that needed it simply runs the query again
+        if not task.cancelled() and task.exception() is not None:
+            self._stats["failed"] += 1
+
+
+prefetch_store = PrefetchStore()
+
+
+def cancel_prefetch(thread_id: str) -> None:
+    """Cancel the speculative research of a thread, e.g. when the user cancels."""
+    prefetch_store.cancel(thread_id)
+
+
+def prefetch_stats() -> Dict[str, Any]:
+    """Return the statistics of the process-wide prefetch store."""
+    return prefetch_store.stats()
@@ -49,6 +49,22 @@ web_searcher_instructions = """进行有针对性的Google搜索，收集关于"
 {research_topic}
 """
 
+web_searcher_batch_instructions = """你将收到{number_queries}个搜索查询及其搜索结果，请分别为每个查询将其搜索结果合成为可验证的文本内容。
+
+指令：
+- 当前日期是 {current_date}。
+- 每个查询单独撰写一份摘要，只使用该查询自己的搜索结果，不要混用其他查询的结果。
+- 整合关键发现，同时仔细跟踪每个具体信息的来源。
+- 每份摘要都应该是基于搜索发现的结构良好的摘要或报告。
+- 只包含在搜索结果中找到的信息，不要编造任何信息。
+- **重要：在引用信息时，请使用markdown链接格式 [引用文本](URL) 来标注来源。**
+- **每当提到具体事实、数据或观点时，都应该包含相应的引用链接。**
+- 请用中文回答。
+
+输出格式：
+- 为每个查询返回一项，query_index 为查询的编号（从1开始），summary 为该查询的摘要。
+"""
+
 reflection_instructions = """你是一名专业的研究助手，正在分析关于"{research_topic}"的摘要。
 
 指令：
@@ -81,6 +97,33 @@ reflection_instructions = """你是一名专业的研究助手，正在分析关
 {summaries}
 """
 
+incremental_reflection_instructions = """你是一名专业的研究助手，正在持续分析关于"{research_topic}"的研究进展。
+
+指令：
+- 当前日期是 {current_date}。
+- "知识摘要"是此前各轮研究的累积摘要，"新增研究结果"是本轮刚刚收集的内容。
+- 将新增研究结果中的新发现合并到知识摘要中，得到更新后的知识摘要。保留原有的引用标记和链接，不要删除已有的重要事实。
+- 基于更新后的知识摘要，识别知识差距或需要深入探索的领域，并生成后续查询（1个或多个）。
+- 如果更新后的知识摘要足以回答用户的问题，则不要生成后续查询。
+
+要求：
+- 确保后续查询是自包含的，并包含网络搜索所需的必要上下文。
+- 知识摘要应简洁、去除重复内容，只保留对回答问题有价值的事实、数据和观点。
+
+输出格式：
+- 将您的回复格式化为具有这些确切键的JSON对象：
+   - "is_sufficient": true 或 false
+   - "knowledge_gap": 描述缺少什么信息或需要澄清什么
+   - "follow_up_queries": 写一个具体问题来解决这个差距
+   - "knowledge_digest": 合并新增研究结果后的知识摘要
+
+知识摘要：
+{knowledge_digest}
+
+新增研究结果：
+{new_summaries}
+"""
+
 answer_instructions = """基于提供的摘要，使用中文生成高质量的用户问题答案。
 
 指令：
@@ -217,3 +260,93 @@ summary_optimization_instructions = """你是一名专业的内容优化专家
 
 相关性评估结果：
 {relevance_assessment}"""
+
+
+summary_streaming_instructions = """你是一名专业的内容优化专家，负责优化和增强研究摘要。
+
+指令：
+- 基于质量评估、事实验证和相关性分析结果优化摘要
+- 确保摘要结构清晰、逻辑严密，使用markdown标题和列表组织内容
+- 保留原始摘要中的引用标记和链接
+- 当前日期是 {current_date}
+
+优化原则：
+- 准确性优先
+- 逻辑清晰
+- 重点突出
+- 实用性强
+
+输出格式：
+- 直接输出优化后的摘要正文（markdown格式），不要输出JSON，不要添加任何前言或说明。
+
+研究主题：{research_topic}
+
+原始摘要：
+{original_summary}
+
+质量评估结果：
+{quality_assessment}
+
+事实验证结果：
+{fact_verification}
+
+相关性评估结果：
+{relevance_assessment}"""
+
+
+summary_insights_instructions = """你是一名专业的研究分析师，负责从已优化的研究摘要中提炼要点。
+
+指令：
+- 提取关键洞察和发现
+- 生成可行的建议和行动项
+- 评估摘要内容的置信度
+
+输出格式：
+- 将您的回复格式化为具有这些确切键的JSON对象：
+   - "key_insights": 关键洞察列表
+   - "actionable_items": 可行建议列表
+   - "confidence_level": 置信度等级（高/中/低）
+
+研究主题：{research_topic}
+
+优化后的摘要：
+{optimized_summary}"""
+
+
+combined_quality_instructions = """你是一名专业的研究质量分析师，负责一次性完成研究内容的质量评估、事实核查、相关性分析，并据此优化研究摘要。
+
+指令：
+- 评估内容的整体质量和来源的可靠性，识别内容空白并提出改进建议
+- 识别并验证关键事实和声明，标记有争议或无法验证的声明
+- 分析内容与研究主题的相关程度，找出已覆盖和缺失的主题
+- 基于以上评估结果优化摘要，提取关键洞察并生成可行建议
+- 当前日期是 {current_date}
+
+优化原则：
+- 准确性优先，删除或标注有争议的内容
+- 逻辑清晰、重点突出
+- 保留原始摘要中的来源引用链接
+
+输出格式：
+- 将您的回复格式化为具有这些确切键的JSON对象：
+   - "quality_score": 0.0到1.0的质量评分
+   - "reliability_assessment": 可靠性评估描述
+   - "content_gaps": 内容空白列表
+   - "improvement_suggestions": 改进建议列表
+   - "verified_facts": 已验证事实列表，每个包含"fact"和"source"键
+   - "disputed_claims": 有争议声明列表，每个包含"claim"和"reason"键
+   - "verification_sources": 验证来源列表
+   - "confidence_score": 0.0到1.0的事实置信度评分
+   - "relevance_score": 0.0到1.0的相关性评分
+   - "key_topics_covered": 已充分覆盖的关键主题列表
+   - "missing_topics": 缺失或不足的主题列表
+   - "content_alignment": 内容与目标一致性的描述
+   - "optimized_summary": 优化后的摘要
+   - "key_insights": 关键洞察列表
+   - "actionable_items": 可行建议列表
+   - "confidence_level": 置信度等级（高/中/低）
+
+研究主题：{research_topic}
+
+研究内容：
+{content}"""
@@ -0,0 +1,311 @@
+"""Record and replay of provider responses for offline runs and tests."""
+
+import asyncio
+import hashlib
+import json
+import os
+import pathlib
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+from langchain_tavily import TavilySearch
+
+from agent.configuration import Configuration
+from agent.prompts import get_current_date
+
+PROVIDER_MODES = ("live", "record", "replay")
+
+TAVILY_MAX_RESULTS = 5
+TAVILY_SEARCH_DEPTH = "advanced"
+
+# Placeholder key for clients that never reach the real API in replay mode
+REPLAY_API_KEY = "replay"
+
+DEFAULT_FIXTURE_PATH = pathlib.Path(__file__).parent.parent.parent / "fixtures"
+
+
+class FixtureNotFoundError(LookupError):
+    """Raised in replay mode when no recorded response matches a request."""
+
+
+def require_api_key(name: str) -> str:
+    """Return an API key from the environment, raising when it is not set."""
+    value = os.getenv(name)
+    if value is None:
+        raise ValueError(f"{name} is not set")
+    return value
+
+
+def fixture_key(payload: Dict[str, Any]) -> str:
+    """Hash a request payload into its fixture key.
+
+    The current date is replaced by a placeholder, as in the LLM response
+    cache, so fixtures recorded on one day replay on any other.
+    """
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    raw = raw.replace(get_current_date(), "{current_date}")
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """Recorded provider responses, one JSON file per request.
+
+    Files live under ``<path>/<provider>/<key>.json`` and hold the request,
+    the response and how long the provider took to answer.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        """Create a store of fixtures under ``path``."""
+        self.path = pathlib.Path(path)
+        self._timings: Dict[str, List[float]] = {}
+
+    def _file(self, provider: str, key: str) -> pathlib.Path:
+        return self.path / provider / f"{key}.json"
+
+    def get(self, provider: str, key: str) -> Dict[str, Any] | None:
+        """Return a recorded fixture, or None when the request was never recorded."""
+        file = self._file(provider, key)
+        if not file.is_file():
+            return None
+        return json.loads(file.read_text(encoding="utf-8"))
+
+    def put(
+        self,
+        provider: str,
+        key: str,
+        request: Any,
+        response: Any,
+        elapsed: float,
+    ) -> None:
+        """Record a provider response and how long it took."""
+        file = self._file(provider, key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        fixture = {
+            "request": request,
+            "response": response,
+            "elapsed": round(elapsed, 4),
+        }
+        file.write_text(
+            json.dumps(fixture, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        self._timings.pop(provider, None)
+
+    def timings(self, provider: str) -> List[float]:
+        """Return the recorded response times of a provider."""
+        if provider not in self._timings:
+            self._timings[provider] = [
+                json.loads(file.read_text(encoding="utf-8"))["elapsed"]
+                for file in sorted((self.path / provider).glob("*.json"))
+            ]
+        return self._timings[provider]
+
+
+_stores: Dict[pathlib.Path, FixtureStore] = {}
+
+
+def get_fixture_store(configurable: Configuration) -> FixtureStore:
+    """Return the fixture store at the configured path."""
+    path = pathlib.Path(configurable.provider_fixture_path or DEFAULT_FIXTURE_PATH)
+    if path not in _stores:
+        _stores[path] = FixtureStore(path)
+    return _stores[path]
+
+
+async def simulate_latency(
+    configurable: Configuration, store: FixtureStore, provider: str, recorded: float
+) -> None:
+    """Sleep according to the replay latency model.
+
+    "none" answers immediately, "recorded" waits as long as the recorded
+    call took, "sampled" waits a time drawn from all recorded calls of the
+    provider, and a number waits that many seconds.
+    """
+    model = configurable.replay_latency
+    if model == "none":
+        return
+    if model == "recorded":
+        delay = recorded
+    elif model == "sampled":
+        delay = random.choice(store.timings(provider) or [recorded])
+    else:
+        delay = float(model)
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+class RecordReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records provider responses or replays them.
+
+    Keys are derived from the request path and JSON body, never from the
+    headers, so recorded fixtures contain no API keys.
+    """
+
+    # Headers kept with a fixture; the body is stored decoded, so encoding
+    # and length headers of the original response would be wrong on replay
+    KEPT_HEADERS = ("content-type", "retry-after", "retry-after-ms")
+
+    def __init__(
+        self,
+        provider: str,
+        configurable: Configuration,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Create a transport for one provider.
+
+        Args:
+            provider: The provider the fixtures are stored under
+            configurable: Configuration selecting the mode and the fixture directory
+            transport: The transport that reaches the provider; unused in replay mode
+        """
+        self.provider = provider
+        self.configurable = configurable
+        self.mode = configurable.provider_mode
+        self.store = get_fixture_store(configurable)
+        self.transport = transport
+
+    def _request_payload(self, request: httpx.Request) -> Dict[str, Any]:
+        body = request.content.decode("utf-8") if request.content else ""
+        try:
+            body = json.loads(body) if body else None
+        except ValueError:
+            pass
+        return {"method": request.method, "path": request.url.path, "body": body}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request, or serve it from the fixtures in replay mode."""
+        await request.aread()
+        payload = self._request_payload(request)
+        key = fixture_key(payload)
+
+        if self.mode == "replay":
+            fixture = self.store.get(self.provider, key)
+            if fixture is None:
+                raise FixtureNotFoundError(
+                    f"No recorded {self.provider} response for {payload['path']} ({key}); "
+                    "record it first with provider_mode=record"
+                )
+            await simulate_latency(
+                self.configurable, self.store, self.provider, fixture["elapsed"]
+            )
+            response = fixture["response"]
+            return httpx.Response(
+                response["status_code"],
+                headers=response["headers"],
+                content=response["body"].encode("utf-8"),
+                request=request,
+            )
+
+        started = time.perf_counter()
+        upstream = await self.transport.handle_async_request(request)
+        try:
+            # Read the whole body, decompressed; streamed responses are only
+            # handed on once complete while recording
+            decoded = await upstream.aread()
+        finally:
+            await upstream.aclose()
+        headers = {
+            name: value
+            for name, value in upstream.headers.items()
+            if name.lower() in self.KEPT_HEADERS
+        }
+        if (
+            self.mode == "record"
+            and upstream.status_code < 500
+            and upstream.status_code != 429
+        ):
+            self.store.put(
+                self.provider,
+                key,
+                payload,
+                {
+                    "status_code": upstream.status_code,
+                    "headers": headers,
+                    "body": decoded.decode("utf-8"),
+                },
+                time.perf_counter() - started,
+            )
+        return httpx.Response(
+            upstream.status_code, headers=headers, content=decoded, request=request
+        )
+
+    async def aclose(self) -> None:
+        """Close the upstream transport."""
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+def make_http_client(
+    provider: str, configurable: Configuration, limits: httpx.Limits
+) -> httpx.AsyncClient:
+    """Create the pooled HTTP client of a provider for the configured mode."""
+    if configurable.provider_mode == "live":
+        return httpx.AsyncClient(limits=limits)
+    transport = (
+        None
+        if configurable.provider_mode == "replay"
+        else httpx.AsyncHTTPTransport(limits=limits)
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        transport=RecordReplayTransport(provider, configurable, transport),
+    )
+
+
+def deepseek_api_key(configurable: Configuration) -> str:
+    """Return the DeepSeek API key, which replay mode does not need."""
+    if configurable.provider_mode == "replay":
+        return os.getenv("DEEPSEEK_API_KEY") or REPLAY_API_KEY
+    return require_api_key("DEEPSEEK_API_KEY")
+
+
+_tavily_search: TavilySearch | None = None
+
+
+def get_tavily_search() -> TavilySearch:
+    """Return the Tavily search tool, created on first live use."""
+    global _tavily_search
+    if _tavily_search is None:
+        _tavily_search = TavilySearch(
+            max_results=TAVILY_MAX_RESULTS,
+            search_depth=TAVILY_SEARCH_DEPTH,
+            api_key=require_api_key("TAVILY_API_KEY"),
+        )
+    return _tavily_search
+
+
+async def tavily_search(query: str, configurable: Configuration) -> Any:
+    """Run a Tavily search live, recording it, or from a recorded fixture.
+
+    Returns the raw Tavily response, including the ``{"error": ...}`` values
+    the Tavily tool returns for failed requests.
+    """
+    mode = configurable.provider_mode
+    if mode not in PROVIDER_MODES:
+        raise ValueError(f"Unknown provider_mode: {mode}")
+    if mode == "live":
+        return await get_tavily_search().ainvoke(query)
+
+    store = get_fixture_store(configurable)
+    payload = {
+        "query": query,
+        "max_results": TAVILY_MAX_RESULTS,
+        "search_depth": TAVILY_SEARCH_DEPTH,
+    }
+    key = fixture_key(payload)
+    if mode == "replay":
+        fixture = store.get("tavily", key)
+        if fixture is None:
+            raise FixtureNotFoundError(
+                f"No recorded Tavily response for query {query!r} ({key}); "
+                "record it first with provider_mode=record"
+            )
+        await simulate_latency(configurable, store, "tavily", fixture["elapsed"])
+        return fixture["response"]
+
+    started = time.perf_counter()
+    response = await get_tavily_search().ainvoke(query)
+    if not (isinstance(response, dict) and "error" in response):
+        store.put("tavily", key, payload, response, time.perf_counter() - started)
+    return response
@@ -0,0 +1,85 @@
+"""Completion quorums that let a fan-out continue without its stragglers."""
+
+import asyncio
+import math
+import time
+from typing import Any, Dict
+
+
+class Quorum:
+    """Completion quorum of one web research fan-out.
+
+    Released once ``needed`` branches have finished, or once ``timeout``
+    seconds have passed since the first branch started and at least one
+    branch has finished. Branches still running then are stragglers.
+    """
+
+    def __init__(self, size: int, needed: int, timeout: float):
+        """Create the quorum of a fan-out of ``size`` branches, ``needed`` of which release it."""
+        self.size = size
+        self.needed = needed
+        self.started_at = time.monotonic()
+        self.completed = 0
+        self.returned = 0
+        self.timed_out = False
+        self.released = asyncio.Event()
+        self.released_at: float | None = None
+        self._timer = (
+            asyncio.get_running_loop().call_later(timeout, self._on_timeout)
+            if timeout > 0
+            else None
+        )
+
+    def complete(self) -> None:
+        """Record that a branch finished, releasing the quorum once enough have."""
+        self.completed += 1
+        if self.completed >= self.needed or self.timed_out:
+            self._release()
+
+    def wait_seconds(self) -> float:
+        """Seconds from the start of the fan-out until the quorum was released."""
+        end = self.released_at if self.released_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def _on_timeout(self) -> None:
+        self.timed_out = True
+        if self.completed:
+            self._release()
+
+    def _release(self) -> None:
+        if not self.released.is_set():
+            self.released_at = time.monotonic()
+            self.released.set()
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+class QuorumTracker:
+    """Process-wide registry of the quorums of in-flight fan-outs."""
+
+    def __init__(self):
+        """Create an empty tracker."""
+        self._quorums: Dict[str, Quorum] = {}
+
+    def join(self, fanout_id: str, size: int, ratio: float, timeout: float) -> Quorum:
+        """Return the quorum of a fan-out, creating it for its first branch."""
+        quorum = self._quorums.get(fanout_id)
+        if quorum is None:
+            needed = min(size, max(1, math.ceil(ratio * size)))
+            quorum = self._quorums[fanout_id] = Quorum(size, needed, timeout)
+        return quorum
+
+    def leave(self, fanout_id: str) -> None:
+        """Record that a branch returned, forgetting the fan-out after its last one."""
+        quorum = self._quorums.get(fanout_id)
+        if quorum is not None:
+            quorum.returned += 1
+            if quorum.returned >= quorum.size:
+                self._quorums.pop(fanout_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of fan-outs being tracked."""
+        return {"active_fanouts": len(self._quorums)}
+
+
+quorum_tracker = QuorumTracker()
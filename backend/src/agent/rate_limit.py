@@ -0,0 +1,417 @@
+"""Per-provider rate and concurrency limits with retries and backoff."""
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+import httpx
+
+from agent.configuration import Configuration
+from agent.metrics import observe_provider_call, registry
+from agent.utils import warn
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # redis is only needed for limits shared between processes
+    redis_asyncio = None
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Atomically refill the bucket and reserve one token. Returns the seconds the
+# caller has to wait for its token, as a string so Redis does not truncate it.
+REDIS_RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class ProviderHTTPError(Exception):
+    """A provider call failed with an HTTP status its client did not raise for."""
+
+    def __init__(
+        self, provider: str, status_code: int, retry_after: float | None = None
+    ):
+        """Create an error for a call to ``provider`` that answered ``status_code``."""
+        super().__init__(f"{provider} request failed with HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def get_status_code(exc: BaseException) -> int | None:
+    """Return the HTTP status code carried by a provider error, if any."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def get_retry_after(exc: BaseException) -> float | None:
+    """Return the delay requested by a Retry-After header, in seconds."""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a failed provider call is worth retrying after a backoff."""
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    # openai's connection errors do not carry a status code
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    return get_status_code(exc) in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """In-process token bucket that hands out reservations instead of polling.
+
+    A caller takes a token immediately, possibly driving the bucket negative,
+    and is told how long to wait for it, so waiters are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """Create a full bucket refilled at ``rate`` tokens per second."""
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = (
+                min(self.capacity, self.tokens + (now - self.updated) * self.rate) - 1
+            )
+            self.updated = now
+            return max(0.0, -self.tokens / self.rate)
+
+
+class ProviderLimiter:
+    """Concurrency and request-rate limit for one provider.
+
+    The token bucket is shared by every thread of the server process, or by
+    every process when a Redis URI is given. The concurrency limit is an
+    asyncio semaphore, one per event loop since semaphores are bound to the
+    loop they are used on.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        rate: float,
+        burst: float,
+        max_concurrency: int,
+        redis_uri: str | None = None,
+    ):
+        """Create a limiter.
+
+        Args:
+            provider: The provider name, used as the Redis key
+            rate: Requests per second; 0 disables the rate limit
+            burst: Requests allowed at once after an idle period
+            max_concurrency: Calls allowed in flight per event loop
+            redis_uri: Redis server sharing the bucket between processes, if any
+        """
+        self.provider = provider
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.redis_uri = redis_uri
+        self.bucket = TokenBucket(rate, burst)
+        self.blocked_until = 0.0
+        # Set while Redis is failing, so an outage is reported once, not per call
+        self._redis_failing = False
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+        self._redis: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._stats = {
+            "waiting": 0,
+            "in_flight": 0,
+            "max_queue_depth": 0,
+            "acquired": 0,
+            "wait_seconds": 0.0,
+            "throttled": 0,
+            "retries": 0,
+            "redis_errors": 0,
+        }
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        if self.redis_uri and redis_asyncio is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                if loop not in self._redis:
+                    self._redis[loop] = redis_asyncio.from_url(self.redis_uri)
+                delay = await self._redis[loop].eval(
+                    REDIS_RESERVE_SCRIPT,
+                    1,
+                    f"ratelimit:{self.provider}",
+                    self.rate,
+                    self.burst,
+                )
+                if self._redis_failing:
+                    self._redis_failing = False
+                    warn(f"shared rate limit for {self.provider} is available again")
+                return float(delay)
+            except Exception as e:
+                # Fall back to the in-process bucket rather than failing the call
+                self._stats["redis_errors"] += 1
+                if not self._redis_failing:
+                    self._redis_failing = True
+                    warn(
+                        f"shared rate limit for {self.provider} unavailable, using local limit: {e}"
+                    )
+        return self.bucket.reserve()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a concurrency slot and a rate token, then hold the slot."""
+        stats = self._stats
+        stats["waiting"] += 1
+        stats["max_queue_depth"] = max(stats["max_queue_depth"], stats["waiting"])
+        started = time.monotonic()
+        semaphore = self._semaphore()
+        try:
+            await semaphore.acquire()
+            try:
+                delay = max(
+                    await self._reserve(), self.blocked_until - time.monotonic()
+                )
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            except BaseException:
+                semaphore.release()
+                raise
+        finally:
+            stats["waiting"] -= 1
+        stats["acquired"] += 1
+        stats["wait_seconds"] += time.monotonic() - started
+        stats["in_flight"] += 1
+        try:
+            yield
+        finally:
+            stats["in_flight"] -= 1
+            semaphore.release()
+
+    def penalize(self, seconds: float) -> None:
+        """Hold back every caller of this provider, e.g. for a Retry-After delay."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def record_retry(self, exc: BaseException, delay: float) -> None:
+        """Count a retry, holding back every caller after a 429."""
+        self._stats["retries"] += 1
+        if get_status_code(exc) == 429:
+            self._stats["throttled"] += 1
+            self.penalize(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the limiter's counters and settings."""
+        return {
+            **self._stats,
+            "wait_seconds": round(self._stats["wait_seconds"], 3),
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "shared": bool(self.redis_uri and redis_asyncio is not None),
+        }
+
+
+_limiters: Dict[Tuple[Any, ...], ProviderLimiter] = {}
+# Providers already warned about that their limits cannot be shared
+_unshared_warned: set = set()
+
+
+def get_limiter(provider: str, configurable: Configuration) -> ProviderLimiter:
+    """Return the process-wide limiter of a provider for the configured limits."""
+    rate = getattr(configurable, f"{provider}_requests_per_second")
+    burst = getattr(configurable, f"{provider}_burst")
+    max_concurrency = getattr(configurable, f"{provider}_max_concurrency")
+    redis_uri = os.getenv("REDIS_URI") if configurable.shared_rate_limits else None
+    key = (provider, rate, burst, max_concurrency, redis_uri)
+    if key not in _limiters:
+        if (
+            configurable.shared_rate_limits
+            and (not redis_uri or redis_asyncio is None)
+            and provider not in _unshared_warned
+        ):
+            _unshared_warned.add(provider)
+            missing = (
+                "REDIS_URI is not set"
+                if not redis_uri
+                else "the redis package is not installed (pip install 'agent[redis]')"
+            )
+            warn(
+                f"shared_rate_limits is set but {missing}; {provider} requests are limited per process"
+            )
+        _limiters[key] = ProviderLimiter(
+            provider, rate, burst, max_concurrency, redis_uri
+        )
+    return _limiters[key]
+
+
+def backoff_delay(attempt: int, exc: BaseException, max_backoff: float) -> float:
+    """Seconds to wait before retry ``attempt``: Retry-After, else exponential with jitter."""
+    retry_after = get_retry_after(exc)
+    if retry_after is not None:
+        return min(retry_after, max_backoff)
+    return min(max_backoff, 2**attempt) * random.uniform(0.5, 1.0)
+
+
+async def call_with_limits(
+    provider: str,
+    configurable: Configuration,
+    call: Callable[[], Awaitable[T]],
+    can_retry: Callable[[], bool] = lambda: True,
+) -> T:
+    """Run a provider call within its rate limit, backing off on throttling.
+
+    Retries rate-limited and transient failures up to ``rate_limit_max_retries``
+    times. A 429 with a Retry-After delay holds back every caller of the
+    provider in this process, not only the one that was throttled.
+
+    Args:
+        provider: The provider name, e.g. "tavily" or "deepseek"
+        configurable: The run configuration, providing the limits
+        call: Makes the provider call; invoked once per attempt
+        can_retry: Whether a failed attempt may still be retried, e.g. not
+            after a streamed call has already emitted tokens
+
+    Returns:
+        The result of the first successful attempt
+    """
+    limiter = get_limiter(provider, configurable)
+    attempt = 0
+    while True:
+        async with limiter.slot():
+            started = time.perf_counter()
+            try:
+                result = await call()
+            except BaseException as e:
+                observe_provider_call(provider, time.perf_counter() - started, e)
+                if not isinstance(e, Exception):
+                    raise
+                if (
+                    attempt >= configurable.rate_limit_max_retries
+                    or not is_retryable(e)
+                    or not can_retry()
+                ):
+                    raise
+                delay = backoff_delay(attempt, e, configurable.rate_limit_max_backoff)
+                limiter.record_retry(e, delay)
+            else:
+                observe_provider_call(provider, time.perf_counter() - started)
+                return result
+        attempt += 1
+        # The slot is released while backing off so other calls can proceed
+        await asyncio.sleep(delay)
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Return queue depth and throttling statistics of every provider limiter."""
+    return {limiter.provider: limiter.stats() for limiter in _limiters.values()}
+
+
+def _limiter_metrics():
+    totals: Dict[str, Dict[str, float]] = {}
+    for limiter in _limiters.values():
+        provider = totals.setdefault(limiter.provider, {})
+        for key in ("retries", "throttled", "wait_seconds", "waiting", "in_flight"):
+            provider[key] = provider.get(key, 0) + limiter._stats[key]
+    families = [
+        (
+            "agent_provider_retries_total",
+            "retries",
+            "counter",
+            "Provider call attempts that were retried.",
+        ),
+        (
+            "agent_provider_throttled_total",
+            "throttled",
+            "counter",
+            "Retries caused by HTTP 429 responses.",
+        ),
+        (
+            "agent_provider_wait_seconds_total",
+            "wait_seconds",
+            "counter",
+            "Time calls spent waiting for a rate limit slot.",
+        ),
+        (
+            "agent_provider_waiting",
+            "waiting",
+            "gauge",
+            "Calls waiting for a rate limit slot.",
+        ),
+        (
+            "agent_provider_in_flight",
+            "in_flight",
+            "gauge",
+            "Calls holding a rate limit slot.",
+        ),
+    ]
+    return [
+        (
+            name,
+            kind,
+            description,
+            [(name, {"provider": p}, stats[key]) for p, stats in totals.items()],
+        )
+        for name, key, kind, description in families
+    ]
+
+
+registry.add_collector(_limiter_metrics)
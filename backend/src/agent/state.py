@@ -1,29 +1,139 @@
 from __future__ import annotations
 
+import operator
 from dataclasses import dataclass, field
 from typing import TypedDict
 
 from langgraph.graph import add_messages
 from typing_extensions import Annotated
 
-
-import operator
+from agent.utils import hamming_distance, normalize_url, simhash
+
+# Sources with less content than this are too short for a reliable fingerprint
+MIN_FINGERPRINT_LENGTH = 80
+# Fingerprints at most this many bits apart are treated as the same content
+NEAR_DUPLICATE_BITS = 8
+
+
+def merge_sources(existing: list, new: list) -> list:
+    """Merge gathered sources, keeping one canonical record per source.
+
+    Records are matched by normalized URL first and then by a SimHash
+    fingerprint of their content, so tracking-parameter variants, mirrors and
+    syndicated copies collapse into the first record seen. The canonical
+    record lists every query that found it and the other URLs it appeared under.
+    """
+    merged = list(existing or [])
+    by_url = {}
+    fingerprints = []
+    for idx, source in enumerate(merged):
+        by_url[normalize_url(source["value"])] = idx
+        for alias in source.get("aliases", []):
+            by_url[normalize_url(alias)] = idx
+        if source.get("fingerprint"):
+            fingerprints.append((int(source["fingerprint"], 16), idx))
+        elif len(source.get("content", "")) >= MIN_FINGERPRINT_LENGTH:
+            fingerprints.append((simhash(source["content"]), idx))
+
+    for source in new or []:
+        url_key = normalize_url(source["value"])
+        fingerprint = source.get("fingerprint")
+        if (
+            fingerprint is None
+            and len(source.get("content", "")) >= MIN_FINGERPRINT_LENGTH
+        ):
+            fingerprint = f"{simhash(source['content']):016x}"
+
+        target = by_url.get(url_key)
+        if target is None and fingerprint is not None:
+            value = int(fingerprint, 16)
+            target = next(
+                (
+                    idx
+                    for other, idx in fingerprints
+                    if hamming_distance(value, other) <= NEAR_DUPLICATE_BITS
+                ),
+                None,
+            )
+
+        if target is None:
+            record = {**source, "queries": list(source.get("queries", []))}
+            if fingerprint is not None:
+                record["fingerprint"] = fingerprint
+                fingerprints.append((int(fingerprint, 16), len(merged)))
+            by_url[url_key] = len(merged)
+            merged.append(record)
+            continue
+
+        canonical = merged[target]
+        queries = canonical.get("queries", [])
+        aliases = canonical.get("aliases", [])
+        new_queries = [q for q in source.get("queries", []) if q not in queries]
+        is_alias = (
+            url_key != normalize_url(canonical["value"])
+            and source["value"] not in aliases
+        )
+        if new_queries or is_alias:
+            merged[target] = {
+                **canonical,
+                "queries": queries + new_queries,
+                "aliases": aliases + [source["value"]] if is_alias else list(aliases),
+            }
+        by_url[url_key] = target
+    return merged
+
+
+def merge_token_usage(existing: dict, new: dict) -> dict:
+    """Add up LLM usage counters keyed by node and then by model."""
+    merged = {
+        node: {model: dict(counts) for model, counts in models.items()}
+        for node, models in (existing or {}).items()
+    }
+    for node, models in (new or {}).items():
+        for model, counts in models.items():
+            target = merged.setdefault(node, {}).setdefault(model, {})
+            for key, value in counts.items():
+                target[key] = target.get(key, 0) + value
+    return merged
 
 
 class OverallState(TypedDict):
     messages: Annotated[list, add_messages]
     search_query: Annotated[list, operator.add]
     web_research_result: Annotated[list, operator.add]
-    sources_gathered: Annotated[list, operator.add]
+    sources_gathered: Annotated[list, merge_sources]
     initial_search_query_count: int
     max_research_loops: int
     research_loop_count: int
     reasoning_model: str
+    # Queries dropped as repeats of queries already run in this thread
+    skipped_queries: Annotated[list, operator.add]
+    # Per-loop novelty of the gathered research, recorded for tuning the early stop
+    research_novelty: Annotated[list, operator.add]
+    # Branches cut off by the reflection quorum, and the queries left for the next loop
+    straggler_stats: Annotated[list, operator.add]
+    deferred_queries: Annotated[list, operator.add]
+    deferred_query_offset: int
+    # LLM usage of the run by node and model, and stages skipped to stay within budget
+    token_usage: Annotated[dict, merge_token_usage]
+    skipped_stages: Annotated[list, operator.add]
+    # Where token_usage and skipped_stages stood when the current run started
+    usage_baseline: dict
+    skipped_stages_offset: int
+    # Wall-clock time the current run has to finish by, None without a deadline
+    deadline_at: float
+    # Sections of the research results ranked by relevance and novelty, as
+    # [position, score] pairs, shared by the prompt-heavy nodes
+    context_ranking: list
+    # Incremental reflection: running digest and the results already folded into it
+    knowledge_digest: str
+    reflected_result_indices: list
     # 人在闭环相关状态
     generated_queries: list  # 生成的原始查询
     user_confirmed_queries: list  # 用户确认/修改后的查询
     awaiting_user_confirmation: bool  # 是否等待用户确认
     user_confirmation_received: bool  # 是否已收到用户确认
+    user_confirmation_cancelled: bool  # 用户是否取消了查询
     # 新增的状态字段
     content_quality: ContentQualityState
     fact_verification: FactVerificationState
@@ -31,6 +141,9 @@ class OverallState(TypedDict):
     relevance_assessment: RelevanceState
     summary_optimization: SummaryOptimizationState
     quality_enhanced_summary: str
+    summary_message_id: (
+        str  # id of the streamed summary message, reused by the final answer
+    )
     verification_report: str
     final_confidence_score: float
 
@@ -41,6 +154,8 @@ class ReflectionState(TypedDict):
     follow_up_queries: Annotated[list, operator.add]
     research_loop_count: int
     number_of_ran_queries: int
+    pending_deferred_queries: list
+    deferred_query_offset: int
 
 
 class Query(TypedDict):
@@ -55,6 +170,14 @@ class QueryGenerationState(TypedDict):
 class WebSearchState(TypedDict):
     search_query: str
     id: str
+    # Identify the fan-out a branch belongs to, for the reflection quorum
+    fanout_id: str
+    fanout_size: int
+    # Set on the last loop, whose stragglers are not deferred
+    final_loop: bool
+    # Set on a straggler of the previous loop dispatched again, which the quorum never cuts off
+    resumed_straggler: bool
+    deadline_at: float
 
 
 class ContentQualityState(TypedDict):
@@ -1,5 +1,6 @@
+from typing import Dict, List
+
 from pydantic import BaseModel, Field
-from typing import List, Dict
 
 
 class SearchQueryList(BaseModel):
@@ -17,14 +18,39 @@ class Reflection(BaseModel):
     is_sufficient: bool = Field(
         description="Whether the research is sufficient to answer the question."
     )
-    knowledge_gap: str = Field(
-        description="The knowledge gap that needs to be filled."
-    )
+    knowledge_gap: str = Field(description="The knowledge gap that needs to be filled.")
     follow_up_queries: List[str] = Field(
         description="Follow-up queries to fill the knowledge gap."
     )
 
 
+class IncrementalReflection(Reflection):
+    """Reflection that also maintains a running digest of the research so far."""
+
+    knowledge_digest: str = Field(
+        description="Updated digest of all findings so far, merging the new research results"
+    )
+
+
+class QuerySummary(BaseModel):
+    """Summary of one query's search results within a batched summarization."""
+
+    query_index: int = Field(
+        description="The number of the query this summary belongs to, as numbered in the prompt."
+    )
+    summary: str = Field(
+        description="The summary of this query's search results, with citation links."
+    )
+
+
+class BatchedSearchSummaries(BaseModel):
+    """Summaries of several queries' search results from one call."""
+
+    summaries: List[QuerySummary] = Field(
+        description="One summary per query in the batch."
+    )
+
+
 class ContentQualityAssessment(BaseModel):
     """Assessment of content quality and reliability."""
 
@@ -93,15 +119,31 @@ class SummaryOptimization(BaseModel):
     )
 
 
+class SummaryInsights(BaseModel):
+    """Insights extracted from an already optimized summary."""
+
+    key_insights: List[str] = Field(
+        description="Key insights extracted from the research"
+    )
+    actionable_items: List[str] = Field(
+        description="Actionable items or recommendations based on findings"
+    )
+    confidence_level: str = Field(
+        description="Confidence level in the summary and insights"
+    )
+
+
+class CombinedQualityAssessment(
+    SummaryOptimization, RelevanceAssessment, FactVerification, ContentQualityAssessment
+):
+    """Quality, fact and relevance assessments plus the optimized summary, from a single call."""
+
+
 class UserQueryConfirmation(BaseModel):
     """User confirmation for generated search queries."""
 
-    confirmed: bool = Field(
-        description="Whether the user confirmed the queries"
-    )
+    confirmed: bool = Field(description="Whether the user confirmed the queries")
     modified_queries: List[str] = Field(
         description="Modified queries if the user changed them"
     )
-    action: str = Field(
-        description="User action: 'confirm', 'modify', or 'cancel'"
-    )
+    action: str = Field(description="User action: 'confirm', 'modify', or 'cancel'")
@@ -0,0 +1,193 @@
+"""Per-run accounting of LLM token usage, cost and token budgets."""
+
+import functools
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from agent.configuration import Configuration
+from agent.state import merge_token_usage
+
+# Usage of the LLM calls made by the node (or detached task) currently running,
+# keyed by model; None outside a tracked scope
+_ledger: ContextVar[Dict[str, Dict[str, int]] | None] = ContextVar(
+    "token_usage_ledger", default=None
+)
+
+USAGE_KEYS = ("calls", "input_tokens", "output_tokens", "cached_input_tokens")
+
+
+def record_usage(model: str, usage: Dict[str, Any] | None) -> None:
+    """Add an LLM response's usage metadata to the current node's ledger."""
+    ledger = _ledger.get()
+    if ledger is None or not usage:
+        return
+    counts = ledger.setdefault(model, dict.fromkeys(USAGE_KEYS, 0))
+    counts["calls"] += 1
+    counts["input_tokens"] += usage.get("input_tokens", 0)
+    counts["output_tokens"] += usage.get("output_tokens", 0)
+    counts["cached_input_tokens"] += (usage.get("input_token_details") or {}).get(
+        "cache_read", 0
+    )
+
+
+async def collect_usage(
+    awaitable: Awaitable[Any],
+) -> Tuple[Any, Dict[str, Dict[str, int]]]:
+    """Await work in its own ledger, e.g. a task that outlives the node that started it.
+
+    Returns:
+        The awaitable's result and the usage of its LLM calls, keyed by model
+    """
+    ledger: Dict[str, Dict[str, int]] = {}
+    token = _ledger.set(ledger)
+    try:
+        return await awaitable, ledger
+    finally:
+        _ledger.reset(token)
+
+
+def track_usage(func: Callable) -> Callable:
+    """Wrap an async graph node so its LLM usage is added to ``token_usage``.
+
+    Calls made by tasks the node spawns count too, as they inherit the
+    node's ledger. Usage the node returns itself, e.g. from reused prefetched
+    research, is merged with it.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        result, ledger = await collect_usage(func(*args, **kwargs))
+        if ledger and isinstance(result, dict):
+            result = {
+                **result,
+                "token_usage": merge_token_usage(
+                    result.get("token_usage"), {name: ledger}
+                ),
+            }
+        return result
+
+    return wrapper
+
+
+def summarize_usage(
+    token_usage: Dict[str, Any] | None, prices: Dict[str, Dict[str, float]]
+) -> Dict[str, Any]:
+    """Total a run's token usage and estimate its cost from the price table.
+
+    Args:
+        token_usage: The ``token_usage`` state value, keyed by node and model
+        prices: USD per million tokens per model, with "input", "output" and
+            optionally "cached_input" prices
+
+    Returns:
+        Totals over the run, per model and per node; ``cost`` is None when a
+        model used is missing from the price table
+    """
+
+    def cost_of(model: str, counts: Dict[str, int]) -> float | None:
+        price = prices.get(model)
+        if price is None:
+            return None
+        cached = counts.get("cached_input_tokens", 0)
+        return (
+            (counts.get("input_tokens", 0) - cached) * price["input"]
+            + cached * price.get("cached_input", price["input"])
+            + counts.get("output_tokens", 0) * price["output"]
+        ) / 1_000_000
+
+    def add(target: Dict[str, Any], model: str, counts: Dict[str, int]) -> None:
+        for key in USAGE_KEYS:
+            target[key] = target.get(key, 0) + counts.get(key, 0)
+        cost = cost_of(model, counts)
+        previous = target.get("cost", 0.0)
+        target["cost"] = None if cost is None or previous is None else previous + cost
+
+    summary: Dict[str, Any] = {"by_model": {}, "by_node": {}}
+    for node, models in (token_usage or {}).items():
+        for model, counts in models.items():
+            add(summary, model, counts)
+            add(summary["by_model"].setdefault(model, {}), model, counts)
+            add(summary["by_node"].setdefault(node, {}), model, counts)
+    for totals in [
+        summary,
+        *summary["by_model"].values(),
+        *summary["by_node"].values(),
+    ]:
+        for key in USAGE_KEYS:
+            totals.setdefault(key, 0)
+        totals.setdefault("cost", 0.0)
+        totals["total_tokens"] = totals["input_tokens"] + totals["output_tokens"]
+    return summary
+
+
+def start_run_usage(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the state update that starts a run's usage accounting.
+
+    ``token_usage`` and ``skipped_stages`` accumulate over every run on a
+    thread, so a run records where they stood when it started and budgets
+    and reports only what was added since.
+    """
+    return {
+        "usage_baseline": merge_token_usage(state.get("token_usage"), None),
+        "skipped_stages_offset": len(state.get("skipped_stages") or []),
+    }
+
+
+def run_token_usage(state: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """Return the LLM usage of the current run, keyed by node and model."""
+    baseline = state.get("usage_baseline") or {}
+    usage: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for node, models in (state.get("token_usage") or {}).items():
+        for model, counts in models.items():
+            before = baseline.get(node, {}).get(model, {})
+            added = {key: counts.get(key, 0) - before.get(key, 0) for key in USAGE_KEYS}
+            if any(added.values()):
+                usage.setdefault(node, {})[model] = added
+    return usage
+
+
+def run_skipped_stages(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the stages the current run skipped."""
+    return (state.get("skipped_stages") or [])[
+        state.get("skipped_stages_offset") or 0 :
+    ]
+
+
+def tokens_used(state: Dict[str, Any]) -> int:
+    """Return the prompt plus completion tokens the current run has spent so far."""
+    return sum(
+        counts["input_tokens"] + counts["output_tokens"]
+        for models in run_token_usage(state).values()
+        for counts in models.values()
+    )
+
+
+def skip_for_budget(
+    stage: str, state: Dict[str, Any], configurable: Configuration
+) -> Dict[str, Any] | None:
+    """Decide whether a stage is skipped because the run's token budget is spent.
+
+    Returns:
+        The ``skipped_stages`` record to return from the node, or None when
+        the stage should run
+    """
+    if (
+        configurable.token_budget <= 0
+        or stage not in configurable.token_budget_skip_stages
+    ):
+        return None
+    used = tokens_used(state)
+    if used < configurable.token_budget:
+        return None
+    return {
+        "stage": stage,
+        "reason": "token_budget",
+        "tokens_used": used,
+        "token_budget": configurable.token_budget,
+    }
+
+
+def format_cost(cost: float | None) -> str:
+    """Format an estimated cost in US dollars for the reports."""
+    return "未知（缺少模型价格）" if cost is None else f"${cost:.4f}"
@@ -1,11 +1,35 @@
+import hashlib
+import json
+import unicodedata
 from typing import Any, Dict, List
-from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
 
-def get_research_topic(messages: List[AnyMessage]) -> str:
-    """
-    Get the research topic from the messages.
+# Causes already warned about by warn_once
+_warned_causes: set = set()
+
+
+def warn(message: str) -> None:
+    """Print a warning to the server log."""
+    print(f"Warning: {message}")  # noqa: T201
+
+
+def warn_once(cause: str, message: str) -> None:
+    """Print a warning the first time a cause occurs in this process.
+
+    Warnings raised per provider call or per branch would otherwise repeat
+    for every call while the cause lasts. ``cause`` must come from a small,
+    fixed set, e.g. a stage name or an exception type, never a query.
     """
+    if cause in _warned_causes:
+        return
+    _warned_causes.add(cause)
+    warn(f"{message} (further warnings of this kind are suppressed)")
+
+
+def get_research_topic(messages: List[AnyMessage]) -> str:
+    """Get the research topic from the messages."""
     # check if request has a history and combine the messages into a single string
     if len(messages) == 1:
         research_topic = messages[-1].content
@@ -19,12 +43,141 @@ def get_research_topic(messages: List[AnyMessage]) -> str:
     return research_topic
 
 
-def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
+def normalize_query(query: str) -> str:
+    """Normalize a search query so trivially different spellings compare equal.
+
+    This is the one normalization behind the search cache keys, the prefetch
+    entries and query deduplication, so a query skipped as a repeat is one
+    that would also have hit the cache.
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def dedupe_queries(
+    candidates: List[str], previous: List[str], threshold: float
+) -> tuple[List[str], List[Dict[str, Any]]]:
+    """Drop candidate queries that repeat or nearly repeat an earlier query.
+
+    Queries are compared by the Jaccard similarity of their normalized
+    character bigrams, against every previous query and every
+    candidate already kept. Queries with the same ``normalize_query`` key are
+    always repeats, whatever the threshold.
+
+    Args:
+        candidates: The queries about to be dispatched
+        previous: The queries already run
+        threshold: Similarity at or above which a candidate is skipped
+
+    Returns:
+        The kept queries, and one record per skipped query with the query it
+        duplicates and their similarity
     """
-    Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
+
+    def shingles_of(key: str) -> set:
+        return text_shingles(key.replace(" ", ""), 2)
+
+    seen = []
+    for query in previous:
+        key = normalize_query(query)
+        seen.append((query, key, shingles_of(key)))
+    kept: List[str] = []
+    skipped: List[Dict[str, Any]] = []
+    for query in candidates:
+        key = normalize_query(query)
+        shingles = shingles_of(key)
+        match, similarity, exact = None, 0.0, False
+        for other, other_key, other_shingles in seen:
+            if key == other_key:
+                match, similarity, exact = other, 1.0, True
+                break
+            score = jaccard_similarity(shingles, other_shingles)
+            if score > similarity:
+                match, similarity = other, score
+        if match is not None and (exact or similarity >= threshold):
+            skipped.append(
+                {
+                    "query": query,
+                    "similar_to": match,
+                    "similarity": round(similarity, 3),
+                }
+            )
+            continue
+        kept.append(query)
+        seen.append((query, key, shingles))
+    return kept, skipped
+
+
+def parse_search_results(search_results: Any) -> List[Dict[str, Any]]:
+    """Normalize the different return formats of Tavily into a list of result dicts."""
+    if isinstance(search_results, list):
+        return search_results
+    if isinstance(search_results, dict):
+        # Tavily typically returns a dict with 'results' key
+        return search_results.get("results", [])
+    if isinstance(search_results, str):
+        # If it's a string, it might be JSON content
+        try:
+            parsed_results = json.loads(search_results)
+            if isinstance(parsed_results, dict) and "results" in parsed_results:
+                return parsed_results["results"]
+        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            print(f"Warning: Failed to parse search results as JSON: {e}")
+        return [{"title": "Search Result", "url": "", "content": search_results}]
+    return []
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "yclid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "igshid",
+    "ref",
+    "ref_src",
+    "spm",
+    "from",
+}
+
+
+def normalize_url(url: str) -> str:
+    """Return a canonical form of a URL so trivially different spellings compare equal.
+
+    Treats http and https alike, lowercases the host and drops "www.", default
+    ports, tracking parameters, the fragment and the trailing slash.
+    """
+    url = url.strip()
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url.rstrip("/")
+    scheme = (
+        "https" if parts.scheme.lower() in ("http", "https") else parts.scheme.lower()
+    )
+    host = parts.netloc.lower()
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+        )
+    )
+    return urlunsplit((scheme, host, parts.path.rstrip("/"), query, ""))
+
+
+def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
+    """Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
     Ensures each original URL gets a consistent shortened form while maintaining uniqueness.
     """
-    prefix = f"https://vertexaisearch.cloud.google.com/id/"
+    prefix = "https://vertexaisearch.cloud.google.com/id/"
     urls = [site.web.uri for site in urls_to_resolve]
 
     # Create a dictionary that maps each unique URL to its first occurrence index
@@ -37,8 +190,7 @@ def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
 
 
 def insert_citation_markers(text, citations_list):
-    """
-    Inserts citation markers into a text string based on start and end indices.
+    """Inserts citation markers into a text string based on start and end indices.
 
     Args:
         text (str): The original text string.
@@ -76,8 +228,7 @@ def insert_citation_markers(text, citations_list):
 
 
 def get_citations(response, resolved_urls_map):
-    """
-    Extracts and formats citation information from a Gemini model's response.
+    """Extracts and formats citation information from a Gemini model's response.
 
     This function processes the grounding metadata provided in the response to
     construct a list of citation objects. Each citation object includes the
@@ -165,3 +316,41 @@ def get_citations(response, resolved_urls_map):
                     continue
         citations.append(citation)
     return citations
+
+
+def text_shingles(text: str, k: int = 3) -> set:
+    """Return the set of character k-grams of a whitespace-normalized, lowercased text.
+
+    Character shingles work for both Chinese and English text without a tokenizer.
+    """
+    normalized = " ".join(text.lower().split())
+    if len(normalized) <= k:
+        return {normalized} if normalized else set()
+    return {normalized[i : i + k] for i in range(len(normalized) - k + 1)}
+
+
+def jaccard_similarity(a: set, b: set) -> float:
+    """Return the Jaccard similarity of two sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def simhash(text: str, k: int = 3) -> int:
+    """Return a 64-bit SimHash fingerprint of a text's character shingles.
+
+    Near-identical texts get fingerprints that differ in only a few bits.
+    """
+    weights = [0] * 64
+    for shingle in text_shingles(text, k):
+        value = int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Return the number of differing bits between two fingerprints."""
+    return bin(a ^ b).count("1")
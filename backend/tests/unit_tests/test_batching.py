@@ -0,0 +1,135 @@
+import asyncio
+
+from agent import batching
+from agent.batching import MicroBatcher
+
+
+async def echo(items):
+    return [f"summary of {item}" for item in items]
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_batch_flushes_once_every_branch_submitted():
+    calls = []
+
+    async def process(items):
+        calls.append(list(items))
+        return await echo(items)
+
+    async def main():
+        batcher = MicroBatcher()
+        results = await asyncio.gather(
+            *(batcher.submit("fanout", 3, item, 60, 10, process) for item in "abc")
+        )
+        return batcher, results
+
+    batcher, results = run(main())
+    assert results == ["summary of a", "summary of b", "summary of c"]
+    assert calls == [["a", "b", "c"]]
+    assert batcher.stats()["open_batches"] == 0
+    assert batcher.stats()["open_fanouts"] == 0
+
+
+def test_skipped_branch_releases_the_batch():
+    async def main():
+        batcher = MicroBatcher()
+        batcher.skip("fanout", 3)
+        task = asyncio.ensure_future(batcher.submit("fanout", 3, "a", 60, 10, echo))
+        await asyncio.sleep(0)
+        batcher.skip("fanout", 3)
+        return batcher, await task
+
+    batcher, result = run(main())
+    assert result == "summary of a"
+    assert batcher.stats()["skipped"] == 2
+    assert batcher.stats()["open_fanouts"] == 0
+
+
+def test_fanout_where_every_branch_skips_leaves_nothing_open():
+    batcher = MicroBatcher()
+    for _ in range(3):
+        batcher.skip("fanout", 3)
+    assert batcher.stats()["open_fanouts"] == 0
+    assert batcher.stats()["open_batches"] == 0
+
+
+def test_window_expiry_flushes_and_late_branches_fall_back():
+    async def main():
+        batcher = MicroBatcher()
+        early = await asyncio.gather(
+            *(batcher.submit("fanout", 4, item, 0.05, 10, echo) for item in "ab")
+        )
+        late = await batcher.submit("fanout", 4, "c", 0.05, 10, echo)
+        batcher.skip("fanout", 4)
+        return batcher, early, late
+
+    batcher, early, late = run(main())
+    assert early == ["summary of a", "summary of b"]
+    assert late is None
+    stats = batcher.stats()
+    assert stats["fallbacks"] == 1
+    assert stats["skipped"] == 0
+    assert stats["open_batches"] == 0
+    assert stats["open_fanouts"] == 0
+
+
+def test_expired_fanouts_are_bounded(monkeypatch):
+    monkeypatch.setattr(batching, "EXPIRED_FANOUTS_MAX", 2)
+
+    async def main():
+        batcher = MicroBatcher()
+        for key in ("a", "b", "c"):
+            await batcher.submit(key, 2, "item", 0.01, 10, echo)
+        return batcher
+
+    batcher = run(main())
+    assert list(batcher._expired) == ["b", "c"]
+
+
+def test_flush_splits_items_into_chunks():
+    calls = []
+
+    async def process(items):
+        calls.append(len(items))
+        return await echo(items)
+
+    async def main():
+        batcher = MicroBatcher()
+        return await asyncio.gather(
+            *(batcher.submit("fanout", 5, item, 60, 2, process) for item in "abcde")
+        )
+
+    assert run(main()) == [f"summary of {item}" for item in "abcde"]
+    assert sorted(calls) == [1, 2, 2]
+
+
+def test_short_result_list_falls_back_for_the_missing_items():
+    async def process(items):
+        return ["only one"]
+
+    async def main():
+        batcher = MicroBatcher()
+        return await asyncio.gather(
+            *(batcher.submit("fanout", 2, item, 60, 10, process) for item in "ab")
+        )
+
+    assert run(main()) == ["only one", None]
+
+
+def test_failed_batch_call_falls_back_to_single_calls():
+    async def process(items):
+        raise RuntimeError("provider unavailable")
+
+    async def main():
+        batcher = MicroBatcher()
+        results = await asyncio.gather(
+            *(batcher.submit("fanout", 2, item, 60, 10, process) for item in "ab")
+        )
+        return batcher, results
+
+    batcher, results = run(main())
+    assert results == [None, None]
+    assert batcher.stats()["fallbacks"] == 2
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from agent import cache as cache_module
+from agent import llm
+from agent.cache import TTLCache, make_llm_key, make_search_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def test_memory_tier_evicts_the_least_recently_used_entry():
+    async def main():
+        cache = TTLCache("test", max_entries=2)
+        await cache.aset("a", 1)
+        await cache.aset("b", 2)
+        await cache.aget("a")
+        await cache.aset("c", 3)
+        return cache, [await cache.aget(key) for key in "abc"]
+
+    cache, values = asyncio.run(main())
+    assert values == [1, None, 3]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_entries_expire_after_their_ttl(clock):
+    async def main():
+        cache = TTLCache("test", ttl_seconds=10)
+        await cache.aset("a", 1)
+        await cache.aset("b", 2, ttl_seconds=60)
+        clock.now += 30
+        return cache, await cache.aget("a"), await cache.aget("b")
+
+    cache, a, b = asyncio.run(main())
+    assert (a, b) == (None, 2)
+    assert cache.stats()["expirations"] == 1
+
+
+def test_sqlite_tier_survives_a_fresh_instance(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+
+    async def main():
+        await TTLCache("search", sqlite_path=path).aset("key", {"results": ["x"]})
+        fresh = TTLCache("search", sqlite_path=path)
+        first = await fresh.aget("key")
+        second = await fresh.aget("key")
+        other_namespace = await TTLCache("llm", sqlite_path=path).aget("key")
+        clock.now += 7200
+        expired = await TTLCache("search", sqlite_path=path).aget("key")
+        return fresh, first, second, other_namespace, expired
+
+    fresh, first, second, other_namespace, expired = asyncio.run(main())
+    assert first == second == {"results": ["x"]}
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.stats()["memory_hits"] == 1
+    assert other_namespace is None
+    assert expired is None
+
+
+def test_stats_count_hits_and_misses():
+    async def main():
+        cache = TTLCache("test")
+        await cache.aget("missing")
+        await cache.aset("a", 1)
+        await cache.aget("a")
+        await cache.aget("a")
+        return cache.stats()
+
+    stats = asyncio.run(main())
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_search_key_normalizes_the_query_only():
+    assert make_search_key("Python  AI", 5, "basic") == make_search_key(
+        "python ai", 5, "basic"
+    )
+    assert make_search_key("python ai", 5, "basic") != make_search_key(
+        "python ai", 10, "basic"
+    )
+    assert make_search_key("python ai", 5, "basic") != make_search_key(
+        "python ai", 5, "advanced"
+    )
+
+
+def test_llm_key_replaces_the_current_date_with_a_placeholder(monkeypatch):
+    monkeypatch.setattr(llm, "get_current_date", lambda: "2026年01月01日")
+    key = llm._response_cache_key("deepseek-chat", 0.0, "今天是2026年01月01日。", None)
+    assert key == make_llm_key("deepseek-chat", 0.0, "今天是{current_date}。")
+    monkeypatch.setattr(llm, "get_current_date", lambda: "2026年01月02日")
+    assert (
+        llm._response_cache_key("deepseek-chat", 0.0, "今天是2026年01月02日。", None)
+        == key
+    )
+
+
+def test_llm_key_depends_on_model_temperature_and_schema():
+    key = make_llm_key("deepseek-chat", 0.0, "prompt")
+    assert key != make_llm_key("deepseek-reasoner", 0.0, "prompt")
+    assert key != make_llm_key("deepseek-chat", 0.7, "prompt")
+    assert key != make_llm_key("deepseek-chat", 0.0, "prompt", '{"type": "object"}')
@@ -0,0 +1,64 @@
+from agent.citations import CitationRegistry, citation_id, citation_marker
+
+
+def test_citation_id_is_stable_across_url_spellings():
+    assert citation_id("https://example.com/a") == citation_id(
+        "http://www.example.com/a/?utm_source=x"
+    )
+    assert citation_id("https://example.com/a") != citation_id("https://example.com/b")
+
+
+def test_resolve_markers_numbers_sources_by_first_appearance():
+    first = {"value": "https://example.com/a"}
+    second = {"value": "https://example.com/b"}
+    registry = CitationRegistry([first, second])
+    text = (
+        f"B {citation_marker(second['value'])}, A {citation_marker(first['value'])}, "
+        f"B again {citation_marker(second['value'])}."
+    )
+    resolved, cited = registry.resolve_markers(text)
+    assert resolved == (
+        "B [1](https://example.com/b), A [2](https://example.com/a), "
+        "B again [1](https://example.com/b)."
+    )
+    assert cited == [second, first]
+
+
+def test_resolve_markers_keeps_link_targets_bare():
+    registry = CitationRegistry([{"value": "https://example.com/a"}])
+    resolved, _ = registry.resolve_markers(
+        f"[Example]({citation_marker('https://example.com/a')})"
+    )
+    assert resolved == "[Example](https://example.com/a)"
+
+
+def test_resolve_markers_maps_aliases_to_the_canonical_source():
+    canonical = {
+        "value": "https://example.com/a",
+        "aliases": ["https://mirror.example.org/a"],
+    }
+    registry = CitationRegistry([canonical])
+    resolved, cited = registry.resolve_markers(
+        f"Copy {citation_marker('https://mirror.example.org/a')}"
+    )
+    assert resolved == "Copy [1](https://example.com/a)"
+    assert cited == [canonical]
+
+
+def test_resolve_markers_leaves_unknown_markers():
+    registry = CitationRegistry()
+    text = f"Unknown {citation_marker('https://example.com/missing')}"
+    assert registry.resolve_markers(text) == (text, [])
+
+
+def test_replace_urls_round_trips_through_resolve_markers():
+    registry = CitationRegistry()
+    registry.register("https://example.com/a", {"value": "https://example.com/a"})
+    marked = registry.replace_urls(
+        "See https://example.com/a and example.com.",
+        {"example.com": "https://example.com/a"},
+    )
+    assert marked.count(citation_marker("https://example.com/a")) == 2
+    resolved, cited = registry.resolve_markers(marked)
+    assert resolved == "See [1](https://example.com/a) and [1](https://example.com/a)."
+    assert len(cited) == 1
@@ -0,0 +1,119 @@
+import random
+
+from agent.citations import CitationRegistry, citation_marker
+from agent.compaction import (
+    CITATION_PATTERN,
+    RELEVANCE_WEIGHT,
+    estimate_tokens,
+    rank_sections,
+    ranked_sections,
+    render_context,
+    section_ranking,
+    split_sections,
+    truncate_preserving_citations,
+)
+from agent.utils import jaccard_similarity, text_shingles
+
+RESULTS = [
+    "Solar panel efficiency rose to 24% in 2024.\n\nInstallation costs fell by a third.",
+    "Solar panel efficiency rose to 24% in 2024.\n\nWind power capacity also grew.",
+]
+
+
+def reference_ranking(results, topic):
+    """The ranking recomputed from scratch at every step, as rank_sections once did."""
+    topic_shingles = text_shingles(topic, 2)
+    candidates = []
+    for section in split_sections(results):
+        bigrams = text_shingles(section["text"], 2)
+        relevance = (
+            len(topic_shingles & bigrams) / len(topic_shingles)
+            if topic_shingles
+            else 0.0
+        )
+        candidates.append((section, text_shingles(section["text"]), relevance))
+    ranked, picked = [], []
+    while candidates:
+        best_index, best_score = 0, float("-inf")
+        for index, (_, shingles, relevance) in enumerate(candidates):
+            redundancy = max(
+                (jaccard_similarity(shingles, other) for other in picked), default=0.0
+            )
+            score = (RELEVANCE_WEIGHT * relevance + 1 - RELEVANCE_WEIGHT) * (
+                1 - redundancy
+            )
+            if score > best_score:
+                best_index, best_score = index, score
+        section, shingles, _ = candidates.pop(best_index)
+        picked.append(shingles)
+        ranked.append((section["position"], round(best_score, 4)))
+    return ranked
+
+
+def test_rank_sections_ranks_restatements_last():
+    ranked = rank_sections(RESULTS, "solar panel efficiency")
+    assert ranked[0]["text"] == "Solar panel efficiency rose to 24% in 2024."
+    assert ranked[-1]["position"] == 2
+    assert ranked[-1]["score"] == 0
+
+
+def test_rank_sections_matches_the_reference_ranking():
+    rng = random.Random(7)
+    words = "solar wind grid battery cost policy storage demand price supply".split()
+    results = [
+        "\n\n".join(" ".join(rng.choice(words) for _ in range(12)) for _ in range(6))
+        for _ in range(8)
+    ]
+    ranked = rank_sections(results, "battery storage cost")
+    assert [(s["position"], s["score"]) for s in ranked] == reference_ranking(
+        results, "battery storage cost"
+    )
+
+
+def test_section_ranking_round_trips():
+    ranked = rank_sections(RESULTS, "solar panel efficiency")
+    ranking = section_ranking(ranked)
+    assert all(len(entry) == 2 for entry in ranking)
+    assert ranked_sections(RESULTS, ranking) == ranked
+
+
+def test_ranked_sections_ignores_positions_of_missing_sections():
+    ranking = section_ranking(rank_sections(RESULTS, "solar"))
+    assert len(ranked_sections(RESULTS[:1], ranking)) == 2
+
+
+def test_render_context_keeps_original_order_within_budget():
+    ranked = rank_sections(RESULTS, "solar panel efficiency")
+    context = render_context(ranked, budget=10_000)
+    assert context == (
+        "Solar panel efficiency rose to 24% in 2024.\n\nInstallation costs fell by a third."
+        "\n\n---\n\nWind power capacity also grew."
+    )
+
+
+def test_truncate_preserving_citations_never_splits_a_link():
+    text = (
+        "First finding [Source](https://example.com/a-very-long-path). Second finding."
+    )
+    cut = truncate_preserving_citations(text, 20)
+    assert cut.count("(") == cut.count(")")
+    assert cut.count("[") == cut.count("]")
+
+
+def test_citation_pattern_protects_registry_markers():
+    marker = citation_marker("https://example.com/a")
+    assert [
+        match.group(0) for match in CITATION_PATTERN.finditer(f"Finding {marker}.")
+    ] == [marker]
+
+
+def test_truncate_preserving_citations_keeps_a_marker_with_its_sentence():
+    url = "https://example.com/a"
+    marker = citation_marker(url)
+    first = f"第一个发现。{marker}"
+    text = first + "第二个发现的篇幅要长得多，无法放进预算。"
+    cut = truncate_preserving_citations(text, estimate_tokens(first))
+    assert cut == first
+    resolved, cited = CitationRegistry([{"value": url}]).resolve_markers(cut)
+    assert resolved == f"第一个发现。[1]({url})"
+    assert cited == [{"value": url}]
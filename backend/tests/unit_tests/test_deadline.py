@@ -0,0 +1,101 @@
+import asyncio
+import importlib
+
+import pytest
+
+from agent import deadline
+from agent.configuration import Configuration
+from agent.deadline import (
+    call_timeout,
+    remaining_seconds,
+    skip_for_deadline,
+    start_deadline,
+)
+
+# The module, not the compiled graph that agent/__init__.py exports as agent.graph
+graph = importlib.import_module("agent.graph")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(deadline.time, "time", clock)
+    return clock
+
+
+def test_no_deadline_by_default(clock):
+    configurable = Configuration()
+    assert start_deadline(configurable) is None
+    assert remaining_seconds({"deadline_at": None}) is None
+    assert call_timeout({}, 30) == 30
+    assert skip_for_deadline("reflection", {}, configurable) is None
+
+
+def test_call_timeout_is_capped_at_the_time_left(clock):
+    state = {"deadline_at": start_deadline(Configuration(deadline_seconds=60))}
+    assert call_timeout(state) == 60
+    assert call_timeout(state, 30) == 30
+    clock.now += 45
+    assert call_timeout(state, 30) == 15
+    clock.now += 30
+    assert remaining_seconds(state) == -15
+    assert call_timeout(state, 30) == 0
+
+
+def test_optional_stages_are_skipped_near_the_deadline(clock):
+    configurable = Configuration(deadline_seconds=120, deadline_min_stage_seconds=20)
+    state = {"deadline_at": start_deadline(configurable)}
+    assert skip_for_deadline("reflection", state, configurable) is None
+    clock.now += 105
+    assert skip_for_deadline("reflection", state, configurable) == {
+        "stage": "reflection",
+        "reason": "deadline",
+        "remaining_seconds": 15.0,
+        "deadline_seconds": 120,
+    }
+    # Stages that are not optional always run
+    assert skip_for_deadline("finalize_answer", state, configurable) is None
+    clock.now += 60
+    assert (
+        skip_for_deadline("reflection", state, configurable)["remaining_seconds"] == 0.0
+    )
+
+
+def test_invoke_before_deadline_records_a_call_cut_short_by_the_deadline():
+    configurable = Configuration(deadline_seconds=1)
+
+    async def main():
+        state = {"deadline_at": start_deadline(configurable) - 0.95}
+        slow = await graph.invoke_before_deadline(
+            asyncio.sleep(1, result="late"), state, configurable, "reflection"
+        )
+        fresh = {"deadline_at": start_deadline(configurable)}
+        fast = await graph.invoke_before_deadline(
+            asyncio.sleep(0, result="done"), fresh, configurable, "reflection"
+        )
+        return slow, fast
+
+    (result, skipped), fast = asyncio.run(main())
+    assert result is None
+    assert [entry["stage"] for entry in skipped] == ["reflection"]
+    assert fast == ("done", [])
+
+
+def test_a_call_s_own_timeout_is_not_recorded_as_the_deadline():
+    configurable = Configuration(deadline_seconds=60)
+
+    async def main():
+        state = {"deadline_at": start_deadline(configurable)}
+        return await graph.invoke_before_deadline(
+            asyncio.sleep(1), state, configurable, "assess_relevance", timeout=0.01
+        )
+
+    assert asyncio.run(main()) == (None, [])
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from agent import export
+from agent.export import (
+    RENDERERS,
+    chunked,
+    export_cache_key,
+    report_from_content,
+    report_from_state,
+    stream_export,
+)
+
+CONTENT = (
+    "## 结论\n\n"
+    '量子计算取得了**重要**进展，见 [Nature](https://example.com/nature) 的 "报道"。\n\n'
+    "- 第一点 `qubit`\n"
+    "- 第二点 <script>\n\n"
+    "---\n"
+    "1. 编号一"
+)
+
+
+def report():
+    return report_from_content(CONTENT, "量子计算")
+
+
+def render(export_format, include_sources=True, include_metadata=True):
+    return "".join(
+        RENDERERS[export_format](report(), include_sources, include_metadata)
+    )
+
+
+def test_report_from_content_collects_distinct_links():
+    assert report()["sources"] == [
+        {"label": "Nature", "url": "https://example.com/nature"}
+    ]
+    assert report_from_content("", "")["title"] == "研究报告"
+
+
+def test_markdown_export():
+    markdown = render("markdown")
+    assert markdown.startswith("# 量子计算\n\n## 结论\n")
+    assert "\n## 参考来源\n\n1. [Nature](https://example.com/nature)\n" in markdown
+    assert "- source_count: 1\n" in markdown
+    assert "参考来源" not in render("markdown", include_sources=False)
+    assert "报告元数据" not in render("markdown", include_metadata=False)
+
+
+def test_html_export_converts_the_markdown_subset_and_escapes_text():
+    page = render("html")
+    assert "<h2>结论</h2>" in page
+    assert "<strong>重要</strong>" in page
+    assert '<a href="https://example.com/nature">Nature</a>' in page
+    assert (
+        "<ul>\n<li>第一点 <code>qubit</code></li>\n<li>第二点 &lt;script&gt;</li>\n</ul>"
+        in page
+    )
+    assert "<hr>" in page
+    assert "<ol>\n<li>编号一</li>\n</ol>" in page
+    assert "<script>" not in page
+    assert page.endswith("</body>\n</html>\n")
+
+
+@pytest.mark.parametrize("include_sources", [True, False])
+@pytest.mark.parametrize("include_metadata", [True, False])
+def test_json_export_parses(include_sources, include_metadata):
+    data = json.loads(render("json", include_sources, include_metadata))
+    assert data["title"] == "量子计算"
+    assert data["content"] == CONTENT
+    assert ("sources" in data) == include_sources
+    assert ("metadata" in data) == include_metadata
+    if include_sources:
+        assert data["sources"] == [
+            {"label": "Nature", "url": "https://example.com/nature"}
+        ]
+
+
+def test_chunked_coalesces_small_pieces():
+    assert list(chunked(["ab", "cd", "e"], size=3)) == ["abcd", "e"]
+
+
+def test_report_from_state_uses_the_final_answer_and_cited_sources():
+    values = {
+        "messages": [
+            {"type": "human", "content": "量子计算"},
+            {"type": "ai", "content": "答案见 [A](https://example.com/a)"},
+        ],
+        "sources_gathered": [
+            {"label": "A", "value": "https://example.com/a"},
+            {"label": "B", "value": "https://example.com/b"},
+        ],
+        "search_query": ["q1", "q2"],
+    }
+    exported = report_from_state(values)
+    assert exported["title"] == "量子计算"
+    assert exported["sources"] == [{"label": "A", "url": "https://example.com/a"}]
+    assert exported["metadata"]["queries_run"] == 2
+    assert report_from_state({"messages": [{"type": "human", "content": "x"}]}) is None
+
+
+async def collect(key, exported, export_format="markdown"):
+    return b"".join(
+        [
+            chunk
+            async for chunk in stream_export(key, exported, export_format, True, False)
+        ]
+    )
+
+
+def test_stream_export_serves_a_repeated_export_from_the_cache():
+    key = export_cache_key(uuid.uuid4().hex)
+
+    async def main():
+        first = await collect(key, report())
+        # The report is only read on a cache miss
+        second = await collect(key, None)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert first.decode("utf-8").startswith("# 量子计算")
+
+
+def test_stream_export_does_not_cache_oversized_exports(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CACHE_MAX_CHARS", 10)
+    key = export_cache_key(uuid.uuid4().hex)
+
+    async def main():
+        streamed = await collect(key, report())
+        cache = export.get_cache(
+            "export",
+            max_entries=export.EXPORT_CACHE_MAX_ENTRIES,
+            ttl_seconds=export.EXPORT_CACHE_TTL_SECONDS,
+        )
+        return streamed, await cache.aget(key)
+
+    streamed, cached = asyncio.run(main())
+    assert streamed.decode("utf-8") == render("markdown", include_metadata=False)
+    assert cached is None
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+from agent import prefetch as prefetch_module
+from agent.configuration import Configuration
+from agent.prefetch import PrefetchStore
+
+TTL = 600
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prefetch_module.time, "time", clock)
+    return clock
+
+
+def research(results):
+    async def factory(query):
+        await asyncio.sleep(0)
+        return {"web_research_result": [f"research on {query}"], **results}
+
+    return factory
+
+
+async def forever(query):
+    await asyncio.Event().wait()
+
+
+def test_start_skips_queries_in_flight_and_caps_each_thread():
+    async def main():
+        store = PrefetchStore()
+        first = store.start("t1", ["a", "b"], forever, max_queries=3, ttl_seconds=TTL)
+        second = store.start(
+            "t1", ["A ", "c", "d"], forever, max_queries=3, ttl_seconds=TTL
+        )
+        stats = store.stats()
+        store.cancel("t1")
+        return first, second, stats
+
+    first, second, stats = asyncio.run(main())
+    assert (first, second) == (2, 1)
+    assert stats["started"] == 3
+    assert stats["pending"] == 3
+
+
+def test_get_matches_normalized_queries_and_discard_makes_it_single_use():
+    async def main():
+        store = PrefetchStore()
+        store.start("t1", ["Python AI"], research({}), max_queries=3, ttl_seconds=TTL)
+        task = store.get("t1", "python  ai", TTL)
+        result = await task
+        store.discard("t1", "python ai", task)
+        return store, result, store.get("t1", "python ai", TTL)
+
+    store, result, again = asyncio.run(main())
+    assert result == {"web_research_result": ["research on Python AI"]}
+    assert again is None
+    assert store.stats()["reused"] == 1
+
+
+def test_discard_keeps_a_newer_task_for_the_same_query():
+    async def main():
+        store = PrefetchStore()
+        store.start("t1", ["a"], forever, max_queries=3, ttl_seconds=TTL)
+        old = store.get("t1", "a", TTL)
+        store.cancel("t1")
+        store.start("t1", ["a"], forever, max_queries=3, ttl_seconds=TTL)
+        store.discard("t1", "a", old)
+        kept = store.get("t1", "a", TTL)
+        store.cancel("t1")
+        return old, kept
+
+    old, kept = asyncio.run(main())
+    assert kept is not None and kept is not old
+
+
+def test_stale_prefetches_expire_and_are_cancelled(clock):
+    async def main():
+        store = PrefetchStore()
+        store.start("t1", ["a"], forever, max_queries=3, ttl_seconds=TTL)
+        task = store.get("t1", "a", TTL)
+        clock.now += TTL + 1
+        expired = store.get("t1", "a", TTL)
+        await asyncio.sleep(0)
+        return store, task, expired
+
+    store, task, expired = asyncio.run(main())
+    assert expired is None
+    assert task.cancelled()
+    assert store.stats()["cancelled"] == 1
+
+
+def test_cancel_drops_only_that_thread():
+    async def main():
+        store = PrefetchStore()
+        store.start("t1", ["a", "b"], forever, max_queries=3, ttl_seconds=TTL)
+        store.start("t2", ["a"], forever, max_queries=3, ttl_seconds=TTL)
+        tasks = [store.get("t1", "a", TTL), store.get("t1", "b", TTL)]
+        store.cancel("t1")
+        await asyncio.sleep(0)
+        remaining = store.get("t2", "a", TTL)
+        store.cancel("t2")
+        return store, tasks, remaining
+
+    store, tasks, remaining = asyncio.run(main())
+    assert all(task.cancelled() for task in tasks)
+    assert remaining is not None
+    assert store.stats()["threads"] == 0
+
+
+def test_retain_cancels_queries_the_user_edited_away():
+    async def main():
+        store = PrefetchStore()
+        store.start("t1", ["a", "b"], forever, max_queries=3, ttl_seconds=TTL)
+        dropped = store.get("t1", "b", TTL)
+        store.retain("t1", ["a", "c"])
+        await asyncio.sleep(0)
+        kept = store.get("t1", "a", TTL)
+        store.cancel("t1")
+        return dropped, kept
+
+    dropped, kept = asyncio.run(main())
+    assert dropped.cancelled()
+    assert kept is not None
+
+
+def test_least_recently_used_thread_is_evicted():
+    async def main():
+        store = PrefetchStore(max_threads=2)
+        for thread_id in ("t1", "t2"):
+            store.start(thread_id, ["a"], forever, max_queries=3, ttl_seconds=TTL)
+        evicted = store.get("t1", "a", TTL)
+        store.start("t2", ["b"], forever, max_queries=3, ttl_seconds=TTL)
+        store.start("t3", ["a"], forever, max_queries=3, ttl_seconds=TTL)
+        await asyncio.sleep(0)
+        survivors = [
+            store.get(thread_id, "a", TTL) is not None
+            for thread_id in ("t1", "t2", "t3")
+        ]
+        for thread_id in ("t2", "t3"):
+            store.cancel(thread_id)
+        return evicted, survivors
+
+    evicted, survivors = asyncio.run(main())
+    assert evicted.cancelled()
+    assert survivors == [False, True, True]
+
+
+def test_await_prefetch_uses_a_result_once():
+    from agent.graph import await_prefetch, prefetch_store
+
+    configurable = Configuration()
+
+    async def main():
+        prefetch_store.start(
+            "test-thread", ["a"], research({"token_usage": {"n": 1}}), 3, TTL
+        )
+        first = await await_prefetch("test-thread", "a", configurable)
+        second = await await_prefetch("test-thread", "a", configurable)
+        prefetch_store.cancel("test-thread")
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first["token_usage"] == {"n": 1}
+    assert second is None
+
+
+def test_await_prefetch_forgets_a_failed_prefetch():
+    from agent.graph import await_prefetch, prefetch_store
+
+    async def failing(query):
+        raise RuntimeError("search failed")
+
+    async def main():
+        prefetch_store.start("test-thread", ["a"], failing, 3, TTL)
+        result = await await_prefetch("test-thread", "a", Configuration())
+        left = prefetch_store.get("test-thread", "a", TTL)
+        prefetch_store.cancel("test-thread")
+        return result, left
+
+    assert asyncio.run(main()) == (None, None)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from agent import providers
+from agent.configuration import Configuration
+from agent.providers import (
+    FixtureNotFoundError,
+    RecordReplayTransport,
+    fixture_key,
+    tavily_search,
+)
+
+BODY = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def configuration(tmp_path, mode, **overrides):
+    return Configuration(
+        provider_mode=mode,
+        provider_fixture_path=str(tmp_path),
+        replay_latency="none",
+        **overrides,
+    )
+
+
+@pytest.fixture(autouse=True)
+def fresh_stores(monkeypatch):
+    monkeypatch.setattr(providers, "_stores", {})
+
+
+def upstream(status_code=200):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(
+            status_code,
+            json={"choices": [{"message": {"content": "hello"}}]},
+            headers={"x-request-id": "abc", "retry-after": "1"},
+        )
+
+    return httpx.MockTransport(handler), calls
+
+
+async def post(transport, body=BODY):
+    async with httpx.AsyncClient(transport=transport) as client:
+        return await client.post(
+            "https://api.deepseek.com/chat/completions",
+            json=body,
+            headers={"Authorization": "Bearer secret"},
+        )
+
+
+def test_recorded_response_replays_without_the_network(tmp_path):
+    mock, calls = upstream()
+    recorded = asyncio.run(
+        post(RecordReplayTransport("deepseek", configuration(tmp_path, "record"), mock))
+    )
+    replayed = asyncio.run(
+        post(RecordReplayTransport("deepseek", configuration(tmp_path, "replay")))
+    )
+
+    assert len(calls) == 1
+    assert replayed.status_code == recorded.status_code == 200
+    assert (
+        replayed.json()
+        == recorded.json()
+        == {"choices": [{"message": {"content": "hello"}}]}
+    )
+    assert replayed.headers["retry-after"] == "1"
+    assert "x-request-id" not in replayed.headers
+
+    fixture_files = list((tmp_path / "deepseek").glob("*.json"))
+    assert len(fixture_files) == 1
+    fixture = json.loads(fixture_files[0].read_text(encoding="utf-8"))
+    assert fixture["request"]["body"] == BODY
+    assert "secret" not in fixture_files[0].read_text(encoding="utf-8")
+
+
+def test_replay_miss_raises(tmp_path):
+    transport = RecordReplayTransport("deepseek", configuration(tmp_path, "replay"))
+    with pytest.raises(FixtureNotFoundError):
+        asyncio.run(post(transport, {**BODY, "temperature": 0.5}))
+
+
+def test_server_errors_are_not_recorded(tmp_path):
+    mock, _ = upstream(status_code=503)
+    response = asyncio.run(
+        post(RecordReplayTransport("deepseek", configuration(tmp_path, "record"), mock))
+    )
+    assert response.status_code == 503
+    assert not (tmp_path / "deepseek").exists()
+
+
+def test_fixture_key_ignores_the_current_date(monkeypatch):
+    monkeypatch.setattr(providers, "get_current_date", lambda: "2026年01月01日")
+    key = fixture_key({"prompt": "今天是2026年01月01日"})
+    monkeypatch.setattr(providers, "get_current_date", lambda: "2026年01月02日")
+    assert fixture_key({"prompt": "今天是2026年01月02日"}) == key
+
+
+def test_tavily_search_records_and_replays(tmp_path, monkeypatch):
+    class FakeTavily:
+        calls = 0
+
+        async def ainvoke(self, query):
+            FakeTavily.calls += 1
+            return {"results": [{"url": "https://example.com", "content": query}]}
+
+    monkeypatch.setattr(providers, "get_tavily_search", FakeTavily)
+    recorded = asyncio.run(tavily_search("量子计算", configuration(tmp_path, "record")))
+    replayed = asyncio.run(tavily_search("量子计算", configuration(tmp_path, "replay")))
+    assert replayed == recorded
+    assert FakeTavily.calls == 1
+    with pytest.raises(FixtureNotFoundError):
+        asyncio.run(tavily_search("another query", configuration(tmp_path, "replay")))
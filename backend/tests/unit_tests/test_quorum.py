@@ -0,0 +1,128 @@
+import asyncio
+import importlib
+
+import pytest
+
+from agent.configuration import Configuration
+from agent.prefetch import prefetch_store
+from agent.quorum import QuorumTracker
+
+# The module, not the compiled graph that agent/__init__.py exports as agent.graph
+graph = importlib.import_module("agent.graph")
+
+THREAD = "quorum-test-thread"
+
+
+def test_quorum_releases_once_enough_branches_complete():
+    async def main():
+        tracker = QuorumTracker()
+        quorum = tracker.join("f", 3, 0.5, timeout=0)
+        assert tracker.join("f", 3, 0.5, timeout=0) is quorum
+        quorum.complete()
+        first = quorum.released.is_set()
+        quorum.complete()
+        for _ in range(3):
+            tracker.leave("f")
+        return quorum, first, tracker.stats()
+
+    quorum, first, stats = asyncio.run(main())
+    assert quorum.needed == 2
+    assert not first and quorum.released.is_set()
+    assert stats == {"active_fanouts": 0}
+
+
+def test_quorum_timeout_releases_after_the_first_completion():
+    async def main():
+        quorum = QuorumTracker().join("f", 3, 1.0, timeout=0.01)
+        await asyncio.sleep(0.05)
+        before = quorum.released.is_set()
+        quorum.complete()
+        return quorum, before
+
+    quorum, before = asyncio.run(main())
+    assert not before
+    assert quorum.timed_out and quorum.released.is_set()
+
+
+@pytest.fixture
+def stub_research(monkeypatch):
+    """Searches that finish at once, except for queries waiting on their event."""
+    gates = {}
+
+    async def search_web(query, configurable):
+        if query in gates:
+            await gates[query].wait()
+        return [{"url": f"https://example.com/{query}"}]
+
+    async def summarize_search_results(query, results, configurable, fanout=None):
+        return {
+            "search_query": [query],
+            "web_research_result": [f"research on {query}"],
+        }
+
+    monkeypatch.setattr(graph, "search_web", search_web)
+    monkeypatch.setattr(graph, "summarize_search_results", summarize_search_results)
+    yield gates
+    prefetch_store.cancel(THREAD)
+
+
+def test_deferred_straggler_is_not_cut_off_when_dispatched_again(stub_research):
+    gates = stub_research
+    configurable = Configuration(research_quorum=0.5, straggler_policy="defer")
+
+    def branches(queries, resumed=()):
+        return [
+            send.arg for send in graph.fan_out_web_research(queries, resumed=resumed)
+        ]
+
+    async def run_fanout(states):
+        return await asyncio.gather(
+            *(
+                graph.research_with_quorum(
+                    state["search_query"], state, THREAD, configurable
+                )
+                for state in states
+            )
+        )
+
+    async def main():
+        gates["slow"] = asyncio.Event()
+        first = await run_fanout(branches(["fast", "slow"]))
+        # The next loop dispatches the deferred query with a new follow-up;
+        # the follow-up meets the quorum before the straggler finishes
+        second_states = branches(["slow", "follow-up"], resumed=["slow"])
+        asyncio.get_running_loop().call_later(0.05, gates["slow"].set)
+        second = await run_fanout(second_states)
+        return first, second_states, second
+
+    first, second_states, second = asyncio.run(main())
+    assert first[0]["web_research_result"] == ["research on fast"]
+    assert first[1]["deferred_queries"] == ["slow"]
+    assert first[1]["straggler_stats"][0]["action"] == "deferred"
+    assert [state["resumed_straggler"] for state in second_states] == [True, False]
+    assert second[0]["web_research_result"] == ["research on slow"]
+    assert second[1]["web_research_result"] == ["research on follow-up"]
+    # Its result was used, so nothing is left behind in the prefetch store
+    assert prefetch_store.get(THREAD, "slow", configurable.prefetch_ttl_seconds) is None
+
+
+def test_straggler_is_cancelled_without_defer(stub_research):
+    gates = stub_research
+    configurable = Configuration(research_quorum=0.5, straggler_policy="cancel")
+
+    async def main():
+        gates["slow"] = asyncio.Event()
+        states = [send.arg for send in graph.fan_out_web_research(["fast", "slow"])]
+        return await asyncio.gather(
+            *(
+                graph.research_with_quorum(s["search_query"], s, THREAD, configurable)
+                for s in states
+            )
+        )
+
+    fast, slow = asyncio.run(main())
+    assert fast["web_research_result"] == ["research on fast"]
+    assert slow == {
+        "straggler_stats": [{**slow["straggler_stats"][0], "action": "cancelled"}]
+    }
+    assert "web_research_result" not in slow
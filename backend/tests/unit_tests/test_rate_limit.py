@@ -0,0 +1,176 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from agent import rate_limit
+from agent.configuration import Configuration
+from agent.rate_limit import (
+    ProviderHTTPError,
+    ProviderLimiter,
+    TokenBucket,
+    backoff_delay,
+    call_with_limits,
+    get_retry_after,
+    is_retryable,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(rate_limit, "_unshared_warned", set())
+
+
+def test_token_bucket_serves_a_burst_then_queues_callers(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Later callers are told to wait in turn, half a second per token
+    assert [bucket.reserve() for _ in range(2)] == [
+        pytest.approx(0.5),
+        pytest.approx(1.0),
+    ]
+
+
+def test_token_bucket_refills_up_to_its_capacity(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    for _ in range(3):
+        bucket.reserve()
+    clock.now += 1.0
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() > 0
+
+
+def test_token_bucket_without_a_rate_never_waits():
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+
+
+def test_retry_after_headers_are_parsed():
+    def error(headers):
+        return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+    assert get_retry_after(error({"retry-after": "7"})) == 7.0
+    assert get_retry_after(error({"retry-after-ms": "1500"})) == 1.5
+    assert (
+        get_retry_after(error({"retry-after": "Thu, 01 Jan 1970 00:00:00 GMT"})) == 0.0
+    )
+    assert get_retry_after(error({})) is None
+    assert get_retry_after(ProviderHTTPError("tavily", 429, retry_after=3)) == 3.0
+
+
+def test_backoff_delay_honors_retry_after_up_to_the_cap():
+    assert backoff_delay(0, ProviderHTTPError("tavily", 429, retry_after=4), 30) == 4
+    assert backoff_delay(0, ProviderHTTPError("tavily", 429, retry_after=90), 30) == 30
+
+
+def test_backoff_delay_is_exponential_with_jitter():
+    error = ProviderHTTPError("tavily", 503)
+    for attempt, ceiling in [(0, 1), (2, 4), (10, 30)]:
+        assert ceiling / 2 <= backoff_delay(attempt, error, 30) <= ceiling
+
+
+def test_only_transient_failures_are_retried():
+    assert is_retryable(ProviderHTTPError("tavily", 429))
+    assert is_retryable(ProviderHTTPError("tavily", 503))
+    assert is_retryable(httpx.ConnectError("refused"))
+    assert not is_retryable(ProviderHTTPError("tavily", 401))
+    assert not is_retryable(ValueError("bad schema"))
+
+
+def test_call_with_limits_retries_a_429_after_its_retry_after():
+    attempts = []
+
+    async def call():
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) == 1:
+            raise ProviderHTTPError("tavily", 429, retry_after=0.05)
+        return "ok"
+
+    configurable = Configuration(rate_limit_max_retries=2)
+    assert asyncio.run(call_with_limits("tavily", configurable, call)) == "ok"
+    assert attempts[1] - attempts[0] >= 0.05
+    stats = rate_limit.rate_limit_stats()["tavily"]
+    assert stats["retries"] == 1
+    assert stats["throttled"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_call_with_limits_gives_up_after_max_retries():
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ProviderHTTPError("tavily", 429, retry_after=0)
+
+    configurable = Configuration(rate_limit_max_retries=2)
+    with pytest.raises(ProviderHTTPError):
+        asyncio.run(call_with_limits("tavily", configurable, call))
+    assert len(attempts) == 3
+
+
+def test_call_with_limits_does_not_retry_once_can_retry_is_false():
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ProviderHTTPError("deepseek", 503)
+
+    with pytest.raises(ProviderHTTPError):
+        asyncio.run(
+            call_with_limits("deepseek", Configuration(), call, can_retry=lambda: False)
+        )
+    assert len(attempts) == 1
+
+
+def test_redis_outage_is_reported_once_per_limiter(monkeypatch, capsys):
+    class FailingRedis:
+        async def eval(self, *args):
+            raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(
+        rate_limit,
+        "redis_asyncio",
+        SimpleNamespace(from_url=lambda uri: FailingRedis()),
+    )
+    limiter = ProviderLimiter(
+        "tavily", rate=100, burst=10, max_concurrency=4, redis_uri="redis://unreachable"
+    )
+
+    async def main():
+        for _ in range(5):
+            async with limiter.slot():
+                pass
+
+    asyncio.run(main())
+    assert limiter.stats()["redis_errors"] == 5
+    assert capsys.readouterr().out.count("Warning") == 1
+
+
+def test_unshared_limits_are_reported_once_per_provider(monkeypatch, capsys):
+    monkeypatch.delenv("REDIS_URI", raising=False)
+    for rate in (1.0, 2.0, 3.0):
+        rate_limit.get_limiter(
+            "tavily",
+            Configuration(shared_rate_limits=True, tavily_requests_per_second=rate),
+        )
+    assert capsys.readouterr().out.count("Warning") == 1
@@ -0,0 +1,87 @@
+from agent.state import merge_sources, merge_token_usage
+
+ARTICLE = (
+    "Retrieval-augmented generation grounds a language model's answer in documents "
+    "fetched at query time, which keeps answers current and lets them cite sources."
+)
+
+
+def source(url, content="", queries=("q1",)):
+    return {"label": url, "value": url, "content": content, "queries": list(queries)}
+
+
+def test_merge_sources_collapses_tracking_variants():
+    merged = merge_sources(
+        [source("https://example.com/post")],
+        [source("http://www.example.com/post/?utm_source=feed", queries=["q2"])],
+    )
+    assert len(merged) == 1
+    assert merged[0]["value"] == "https://example.com/post"
+    assert merged[0]["queries"] == ["q1", "q2"]
+    # Spellings of the same normalized URL are not aliases
+    assert merged[0]["aliases"] == []
+
+
+def test_merge_sources_collapses_syndicated_copies():
+    merged = merge_sources([], [source("https://example.com/a", ARTICLE)])
+    merged = merge_sources(
+        merged, [source("https://mirror.example.org/b", ARTICLE, queries=["q2"])]
+    )
+    assert len(merged) == 1
+    assert merged[0]["fingerprint"]
+    assert merged[0]["queries"] == ["q1", "q2"]
+    assert merged[0]["aliases"] == ["https://mirror.example.org/b"]
+
+
+def test_merge_sources_keeps_distinct_sources_in_order():
+    merged = merge_sources(
+        [source("https://example.com/a", ARTICLE)],
+        [
+            source(
+                "https://example.com/b", "An unrelated page about sourdough baking " * 4
+            )
+        ],
+    )
+    assert [s["value"] for s in merged] == [
+        "https://example.com/a",
+        "https://example.com/b",
+    ]
+
+
+def test_merge_sources_does_not_mutate_its_inputs():
+    existing = [source("https://example.com/a")]
+    new = [source("https://example.com/a?utm_medium=x", queries=["q2"])]
+    merge_sources(existing, new)
+    assert existing == [source("https://example.com/a")]
+    assert new == [source("https://example.com/a?utm_medium=x", queries=["q2"])]
+
+
+def test_merge_sources_is_idempotent():
+    merged = merge_sources([], [source("https://example.com/a", ARTICLE)])
+    assert merge_sources(merged, merged) == merged
+
+
+def test_merge_token_usage_adds_counts_per_node_and_model():
+    existing = {"reflection": {"deepseek-chat": {"calls": 1, "input_tokens": 100}}}
+    new = {
+        "reflection": {
+            "deepseek-chat": {"calls": 1, "input_tokens": 50, "output_tokens": 5}
+        },
+        "web_research": {"deepseek-chat": {"calls": 2}},
+    }
+    assert merge_token_usage(existing, new) == {
+        "reflection": {
+            "deepseek-chat": {"calls": 2, "input_tokens": 150, "output_tokens": 5}
+        },
+        "web_research": {"deepseek-chat": {"calls": 2}},
+    }
+    assert existing == {
+        "reflection": {"deepseek-chat": {"calls": 1, "input_tokens": 100}}
+    }
+
+
+def test_merge_token_usage_handles_missing_values():
+    usage = {"finalize_answer": {"deepseek-reasoner": {"calls": 1}}}
+    assert merge_token_usage(None, usage) == usage
+    assert merge_token_usage(usage, None) == usage
+    assert merge_token_usage(None, None) == {}
@@ -0,0 +1,82 @@
+import asyncio
+
+from agent.state import merge_token_usage
+from agent.usage import (
+    collect_usage,
+    record_usage,
+    run_skipped_stages,
+    run_token_usage,
+    start_run_usage,
+    tokens_used,
+)
+
+
+def usage(calls, input_tokens, output_tokens):
+    return {
+        "calls": calls,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_input_tokens": 0,
+    }
+
+
+def test_run_usage_excludes_earlier_runs_on_the_thread():
+    earlier = {"reflection": {"deepseek-chat": usage(1, 1000, 100)}}
+    state = {"token_usage": earlier, "skipped_stages": [{"stage": "reflection"}]}
+    state.update(start_run_usage(state))
+    state["token_usage"] = merge_token_usage(
+        state["token_usage"],
+        {
+            "reflection": {"deepseek-chat": usage(1, 200, 20)},
+            "web_research": {"deepseek-chat": usage(2, 300, 30)},
+        },
+    )
+    state["skipped_stages"] = state["skipped_stages"] + [{"stage": "verify_facts"}]
+
+    assert run_token_usage(state) == {
+        "reflection": {"deepseek-chat": usage(1, 200, 20)},
+        "web_research": {"deepseek-chat": usage(2, 300, 30)},
+    }
+    assert tokens_used(state) == 550
+    assert run_skipped_stages(state) == [{"stage": "verify_facts"}]
+
+
+def test_start_run_usage_copies_the_baseline():
+    state = {"token_usage": {"reflection": {"deepseek-chat": usage(1, 10, 1)}}}
+    baseline = start_run_usage(state)["usage_baseline"]
+    state["token_usage"]["reflection"]["deepseek-chat"]["input_tokens"] += 5
+    assert baseline["reflection"]["deepseek-chat"]["input_tokens"] == 10
+
+
+def test_first_run_without_baseline_counts_everything():
+    state = {"token_usage": {"reflection": {"deepseek-chat": usage(1, 10, 1)}}}
+    assert tokens_used(state) == 11
+    assert run_skipped_stages({}) == []
+
+
+def test_collect_usage_records_calls_in_its_own_ledger():
+    async def call():
+        record_usage(
+            "deepseek-chat",
+            {
+                "input_tokens": 7,
+                "output_tokens": 3,
+                "input_token_details": {"cache_read": 2},
+            },
+        )
+        return "done"
+
+    result, ledger = asyncio.run(collect_usage(call()))
+    assert result == "done"
+    assert ledger == {
+        "deepseek-chat": {
+            "calls": 1,
+            "input_tokens": 7,
+            "output_tokens": 3,
+            "cached_input_tokens": 2,
+        }
+    }
+
+
+def test_record_usage_outside_a_tracked_scope_is_ignored():
+    record_usage("deepseek-chat", {"input_tokens": 7, "output_tokens": 3})
@@ -0,0 +1,45 @@
+from agent.cache import make_search_key
+from agent.utils import dedupe_queries, normalize_query, normalize_url, warn_once
+
+
+def test_normalize_url_drops_tracking_and_cosmetic_differences():
+    assert (
+        normalize_url("HTTP://www.Example.com:80/path/?utm_source=x&b=2&a=1#top")
+        == "https://example.com/path?a=1&b=2"
+    )
+
+
+def test_normalize_query_folds_width_case_and_whitespace():
+    assert normalize_query("  Ｐython\tAI   2024 ") == "python ai 2024"
+
+
+def test_dedupe_agrees_with_the_search_cache_key():
+    kept, skipped = dedupe_queries(
+        ["Python  AI", "python ai agents"], ["python ai"], threshold=1.1
+    )
+    assert make_search_key("Python  AI", 5, "basic") == make_search_key(
+        "python ai", 5, "basic"
+    )
+    assert kept == ["python ai agents"]
+    assert skipped == [
+        {"query": "Python  AI", "similar_to": "python ai", "similarity": 1.0}
+    ]
+
+
+def test_dedupe_skips_near_duplicates_among_candidates():
+    kept, skipped = dedupe_queries(
+        ["量子计算最新进展", "量子计算的最新进展", "光伏发电成本"], [], threshold=0.6
+    )
+    assert kept == ["量子计算最新进展", "光伏发电成本"]
+    assert [record["query"] for record in skipped] == ["量子计算的最新进展"]
+
+
+def test_warn_once_prints_each_cause_once(capsys):
+    for _ in range(3):
+        warn_once("test:first", "first cause")
+    warn_once("test:second", "second cause")
+    printed = capsys.readouterr().out.splitlines()
+    assert [line.split(" (")[0] for line in printed] == [
+        "Warning: first cause",
+        "Warning: second cause",
+    ]
@@ -16,6 +16,9 @@ import { ExportReport } from "@/components/ExportReport";
 =======
 >>>>>>> 8083b3d4cfc2aa893afff703d2400dd84278e214
 
+// 每次运行（包括确认后的恢复）使用的配置：逐字流式输出优化后的摘要
+const RUN_CONFIG = { configurable: { stream_summary: true } };
+
 interface Conversation {
   id: string;
   title: string;
@@ -95,7 +98,7 @@ export default function App() {
       const timestamp = new Date();
       
       if (event.generate_query) {
-        const queries = event.generate_query?.search_query || [];
+        const queries = event.generate_query?.generated_queries || [];
         setGeneratedQueries(queries);
         
         // 检查是否需要用户确认
@@ -129,10 +132,13 @@ export default function App() {
           rawData: event
         };
       } else if (event.reflection) {
+        const skippedQueries = (event.reflection?.skipped_queries || []).map((s: any) => s.query);
         processedEvent = {
           id: eventId,
           title: "反思分析",
-          data: "分析网络研究结果，评估信息充分性",
+          data: skippedQueries.length > 0
+            ? `分析网络研究结果，评估信息充分性。跳过重复查询：${skippedQueries.join(", ")}`
+            : "分析网络研究结果，评估信息充分性",
           timestamp,
           status: "completed",
           rawData: event
@@ -484,7 +490,7 @@ export default function App() {
         initial_search_query_count: initial_search_query_count,
         max_research_loops: max_research_loops,
         reasoning_model: model,
-      });
+      }, { config: RUN_CONFIG });
     },
     [thread, generateConversationTitle]
   );
@@ -552,36 +558,16 @@ export default function App() {
   // 处理用户查询确认
   const handleQueryConfirmation = useCallback(async (action: 'confirm' | 'modify' | 'cancel', queries?: string[]) => {
     try {
-      if (action === 'cancel') {
-        // 取消整个流程
-        thread.stop();
-        setShowQueryConfirmation(false);
-        return;
-      }
-
       const finalQueries = action === 'modify' && queries ? queries : generatedQueries;
-      
-      // 停止当前流程
-      thread.stop();
-      
-      // 清除当前的事件时间线
-      setProcessedEventsTimeline([]);
-      
-      // 延迟一下，然后开始新的搜索，跳过查询生成步骤
-      setTimeout(() => {
-        const confirmMessage: Message = {
-          type: "human",
-          content: `[查询已确认] ${finalQueries.join(" | ")}`,
-          id: Date.now().toString(),
-        };
 
-        thread.submit({
-          messages: [...thread.messages, confirmMessage],
-          initial_search_query_count: finalQueries.length,
-          max_research_loops: 3,
-          reasoning_model: "deepseek-chat",
-        });
-      }, 100);
+      // 运行在 wait_for_user_confirmation 处中断，以用户的决定从检查点恢复，
+      // 直接进入网络搜索而不是重新从查询生成开始
+      thread.submit(undefined, {
+        command: {
+          resume: { action, queries: action === 'cancel' ? [] : finalQueries },
+        },
+        config: RUN_CONFIG,
+      });
 
       setShowQueryConfirmation(false);
     } catch (error) {
@@ -33,7 +33,7 @@ export function StepDetailModal({ isOpen, onClose, event }: StepDetailModalProps
 
     // 根据不同的步骤类型渲染不同的详细信息
     if (event.title === "生成搜索查询") {
-      const queries = rawData.generate_query?.search_query || [];
+      const queries = rawData.generate_query?.generated_queries || [];
       return (
         <div className="space-y-6">
           <div>